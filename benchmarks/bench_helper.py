@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+''' Benchmarks for message log parsing, header access and filtering.
+
+    python3 -m benchmarks.bench_helper --messages 100000 --output logs/bench.json
+    python3 -m benchmarks.bench_helper --messages 100000 --compare logs/bench.json
+
+Every benchmark runs in a fresh worker process so that its peak RSS is its own.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sippft.parser import SIPpMessage, SIPpMessageStore
+
+BODY_CODECS = ['PCMU/8000', 'PCMA/8000', 'G729/8000', 'telephone-event/8000']
+DISPLAY_NAMES = ['Alice', 'Bob', 'Jörg', '山田太郎', 'Zoë', 'Ελένη']
+
+def generateLogfile(filepath, messages, seed=0):
+    ''' Writes a synthetic -trace_msg log of INVITE/180/200/ACK/BYE/200 calls with
+        folded Via headers, multi-byte UTF-8 display names and SDP bodies,
+        and mixed UDP/TCP transport.
+    '''
+    rand = random.Random(seed)
+    timestamp = datetime(2019, 6, 29, 19, 42, 16)
+    written = 0
+    call_number = 0
+    with open(filepath, 'wb', buffering=1024 * 1024) as f:
+        while written < messages:
+            call_number += 1
+            protocol = 'UDP' if rand.random() < 0.7 else 'TCP'
+            name = rand.choice(DISPLAY_NAMES)
+            call_id = '{}-{}@127.0.0.1'.format(call_number, rand.getrandbits(32))
+            for start_line, cseq, direction, with_body in (
+                    ('INVITE sip:0312341234@127.0.0.1:5062 SIP/2.0', '1 INVITE', 'sent', True),
+                    ('SIP/2.0 180 Ringing', '1 INVITE', 'received', False),
+                    ('SIP/2.0 200 OK', '1 INVITE', 'received', True),
+                    ('ACK sip:0312341234@127.0.0.1:5062 SIP/2.0', '1 ACK', 'sent', False),
+                    ('BYE sip:0312341234@127.0.0.1:5062 SIP/2.0', '2 BYE', 'sent', False),
+                    ('SIP/2.0 200 OK', '2 BYE', 'received', False)):
+                if written >= messages:
+                    break
+                body = ''
+                if with_body:
+                    body = ('v=0\r\n'
+                            'o={} 53655765 2353687637 IN IP4 127.0.0.1\r\n'
+                            's=-\r\n'
+                            'c=IN IP4 127.0.0.1\r\n'
+                            't=0 0\r\n'
+                            'm=audio {} RTP/AVP 0\r\n'
+                            'a=rtpmap:0 {}\r\n').format(name, rand.randrange(10000, 60000, 2),
+                                                        rand.choice(BODY_CODECS))
+                message = ('{}\r\n'
+                           'Via: SIP/2.0/{} 127.0.0.1:5062;branch=z9hG4bK-{}-{}\r\n'
+                           ' ;received=127.0.0.1\r\n'
+                           'From: {} <sip:user1@127.0.0.1:5062>;tag={}\r\n'
+                           'To: 0312341234 <sip:0312341234@127.0.0.1:5062>\r\n'
+                           'Call-ID: {}\r\n'
+                           'CSeq: {}\r\n'
+                           'Contact: sip:user1@127.0.0.1:5062\r\n'
+                           'Max-Forwards: 70\r\n'
+                           'Content-Type: application/sdp\r\n'
+                           'Content-Length: {}\r\n'
+                           '\r\n'
+                           '{}').format(start_line, protocol, call_number, cseq.split()[0], name,
+                                        call_number, call_id, cseq, len(body.encode('utf-8')), body)
+                msg = SIPpMessage()
+                msg.datetime = timestamp
+                msg.protocol = protocol
+                msg.direction = direction
+                msg.message = message
+                f.write(msg.toLogEntry())
+                timestamp += timedelta(microseconds=rand.randrange(50, 5000))
+                written += 1
+
+def _peakRSS():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def _timeParse(filepath, parse):
+    size = os.path.getsize(filepath)
+    rss_before = _peakRSS()
+    started = time.perf_counter()
+    count = parse(filepath)
+    elapsed = time.perf_counter() - started
+    return {'seconds': elapsed, 'messages': count,
+            'mb_per_s': size / elapsed / 1e6, 'msgs_per_s': count / elapsed,
+            'peak_rss_bytes': _peakRSS(), 'rss_growth_bytes': _peakRSS() - rss_before}
+
+def _parseStreaming(filepath):
+    count = 0
+    for msg in SIPpMessage.iterMessagesFromLogfile(filepath):
+        count += 1
+    return count
+
+def _parseList(filepath):
+    return len(SIPpMessage.parseMessagesFromLogfile(filepath))
+
+def _parseStore(filepath):
+    with SIPpMessageStore(filepath) as store:
+        return len(store)
+
+def _benchHeaders(filepath, lookups=20):
+    messages = SIPpMessage.parseMessagesFromLogfile(filepath)
+    started = time.perf_counter()
+    for msg in messages:
+        msg.getHeaderValues('From')
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(lookups):
+        for msg in messages:
+            msg.getHeaderValues('from')
+    cached = time.perf_counter() - started
+    return {'messages': len(messages),
+            'first_lookup_us': first / len(messages) * 1e6,
+            'cached_lookup_us': cached / (len(messages) * lookups) * 1e6,
+            'peak_rss_bytes': _peakRSS()}
+
+def _benchFilter(filepath):
+    messages = SIPpMessage.parseMessagesFromLogfile(filepath)
+    result = {'messages': len(messages)}
+    started = time.perf_counter()
+    SIPpMessage.messagesFilter(messages, direction='received', status_code=180)
+    result['messagesFilter_first_ms'] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    SIPpMessage.messagesFilter(messages, direction='received', status_code=180)
+    result['messagesFilter_ms'] = (time.perf_counter() - started) * 1000
+    try:
+        from sippft.table import MessageTable
+    except ImportError:
+        return result
+    started = time.perf_counter()
+    table = MessageTable.fromMessages(messages, keep_messages=False)
+    result['table_build_ms'] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    table.mask(direction='received', status_code=180)
+    result['table_mask_ms'] = (time.perf_counter() - started) * 1000
+    result['peak_rss_bytes'] = _peakRSS()
+    return result
+
+BENCHMARKS = {
+    'parse_streaming': (_timeParse, _parseStreaming),
+    'parse_list': (_timeParse, _parseList),
+    'parse_store': (_timeParse, _parseStore),
+    'header_lookup': (_benchHeaders, None),
+    'filter': (_benchFilter, None),
+}
+
+def _runOne(name, filepath):
+    function, argument = BENCHMARKS[name]
+    if argument is None:
+        return function(filepath)
+    return function(filepath, argument)
+
+def runBenchmarks(filepath, names=None):
+    results = {}
+    for name in names or BENCHMARKS:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results[name] = executor.submit(_runOne, name, filepath).result()
+    return results
+
+def _gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+# metric name suffix -> True when larger is better
+DIRECTIONS = {'mb_per_s': True, 'msgs_per_s': True, 'seconds': False, '_us': False,
+              '_ms': False, 'peak_rss_bytes': False}
+
+def compareResults(baseline, current, threshold=0.1):
+    ''' Returns (benchmark, metric, baseline, current, change) for every
+        metric that got worse by more than threshold.
+    '''
+    regressions = []
+    for name, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            before = baseline['results'].get(name, {}).get(metric)
+            higher_is_better = next((better for suffix, better in DIRECTIONS.items()
+                                     if metric.endswith(suffix)), None)
+            if higher_is_better is None or not before:
+                continue
+            change = (value - before) / before
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append((name, metric, before, value, change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--logfile', help='use this log instead of generating one')
+    parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS))
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    filepath = args.logfile
+    if not filepath:
+        filepath = 'logs/bench_{}.log'.format(uuid.uuid4())
+        generateLogfile(filepath, args.messages, seed=args.seed)
+    try:
+        report = {
+            'commit': _gitCommit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'messages': args.messages,
+            'logfile_bytes': os.path.getsize(filepath),
+            'results': runBenchmarks(filepath, args.benchmark),
+        }
+    finally:
+        if not args.logfile:
+            os.remove(filepath)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compareResults(json.load(f), report, args.threshold)
+        for name, metric, before, value, change in regressions:
+            print('REGRESSION {}.{}: {:.4g} -> {:.4g} ({:+.1%})'.format(name, metric, before, value, change),
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+class TestBenchHelper(unittest.TestCase):
+    def setUp(self):
+        self.logfile = './logs/{}'.format(str(uuid.uuid4()))
+        self.addCleanup(lambda: os.path.isfile(self.logfile) and os.remove(self.logfile))
+
+    def test_generateLogfile(self):
+        generateLogfile(self.logfile, 20)
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        self.assertEqual(len(messages), 20)
+        self.assertEqual(messages[0].getMethod(), 'INVITE')
+        self.assertEqual(messages[1].getStatusCode(), 180)
+        self.assertIn(';received=127.0.0.1', messages[0].getHeaderValues('Via')[0])
+        self.assertEqual(messages[2].getBody().encode('utf-8'),
+                         messages[2].getRawMessage().split(b'\r\n\r\n', 1)[1])
+        self.assertEqual(set(msg.protocol for msg in messages) <= {'UDP', 'TCP'}, True)
+
+    def test_runBenchmarks(self):
+        generateLogfile(self.logfile, 12)
+        results = runBenchmarks(self.logfile, ['parse_streaming', 'header_lookup'])
+        self.assertEqual(results['parse_streaming']['messages'], 12)
+        self.assertGreater(results['parse_streaming']['msgs_per_s'], 0)
+        self.assertGreater(results['header_lookup']['cached_lookup_us'], 0)
+
+    def test_compareResults(self):
+        baseline = {'results': {'parse_list': {'msgs_per_s': 1000.0, 'seconds': 1.0, 'messages': 10}}}
+        current = {'results': {'parse_list': {'msgs_per_s': 800.0, 'seconds': 1.05, 'messages': 10}}}
+        regressions = compareResults(baseline, current, threshold=0.1)
+        self.assertEqual([(name, metric) for name, metric, before, value, change in regressions],
+                         [('parse_list', 'msgs_per_s')])
+
+if __name__ == '__main__':
+    sys.exit(main())
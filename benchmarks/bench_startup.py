@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+''' Cold start of the sippft modules in fresh interpreters.
+
+    python3 -m benchmarks.bench_startup --runs 20 --target-ms 40
+
+Every import is timed in a new python process, the fastest of runs is kept and
+the time of a bare interpreter is subtracted. Exits 1 when one of them is
+over the target.
+'''
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+# name -> (python arguments, whether it is held to the target)
+STARTUPS = {
+    'import sippft': (['-c', 'import sippft'], True),
+    'import sippft.parser': (['-c', 'import sippft.parser'], True),
+    'import sippft.runner': (['-c', 'import sippft.runner'], True),
+    'import sippft.shard': (['-c', 'import sippft.shard'], True),
+    'import sippft.injection': (['-c', 'import sippft.injection'], True),
+    'python -m sippft --help': (['-m', 'sippft', '--help'], True),
+    'import tests.helper': (['-c', 'import tests.helper'], False),
+}
+
+# modules a parsing or running worker must not import
+HEAVY_MODULES = ('asyncio', 'unittest', 'csv', 'uuid', 'tempfile', 'gzip', 'bz2', 'lzma',
+                 'concurrent.futures', 'xml.etree.ElementTree', 'socket', 'argparse')
+
+def coldStartMs(arguments, runs=10):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, check=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def importedHeavyModules(code):
+    ''' The HEAVY_MODULES that are loaded after running code in a fresh interpreter.
+    '''
+    check = '{}\nimport sys\nprint(" ".join(m for m in {!r} if m in sys.modules))'.format(code, HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', check], stdout=subprocess.PIPE, text=True, check=True).stdout
+    return output.split()
+
+def runBenchmarks(runs=10):
+    bare = coldStartMs(['-c', 'pass'], runs)
+    return {'python_ms': bare,
+            'startup_ms': {name: coldStartMs(arguments, runs) - bare for name, (arguments, held) in STARTUPS.items()}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0].strip("' "))
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=40)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    report = runBenchmarks(args.runs)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+    over = [name for name, (arguments, held) in STARTUPS.items()
+            if held and report['startup_ms'][name] > args.target_ms]
+    for name in over:
+        print('OVER TARGET {}: {:.1f} ms > {:.1f} ms'.format(name, report['startup_ms'][name], args.target_ms),
+              file=sys.stderr)
+    return 1 if over else 0
+
+class TestBenchStartup(unittest.TestCase):
+    def test_heavy_modules(self):
+        self.assertEqual(importedHeavyModules('import sippft'), [])
+        self.assertEqual(importedHeavyModules('import sippft.parser'), [])
+        self.assertEqual(importedHeavyModules('import sippft.runner'), [])
+        self.assertEqual(importedHeavyModules('import sippft.shard'), [])
+        # the check itself notices an import
+        self.assertEqual(importedHeavyModules('import tests.helper')[:2], ['asyncio', 'unittest'])
+
+    def test_main(self):
+        # the target is only enforced by main(): timings of a busy test machine are no test result
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                contextlib.redirect_stderr(devnull):
+            self.assertEqual(main(['--runs', '1', '--target-ms', '60000']), 0)
+            self.assertEqual(main(['--runs', '1', '--target-ms', '-1']), 1)
+
+if __name__ == '__main__':
+    sys.exit(main())
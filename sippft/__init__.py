@@ -0,0 +1,66 @@
+''' Running SIPp functional tests and reading their message logs.
+
+    runner       SIPp command lines and runs (SIPp, SIPpLogPipe)
+    parser       message logs (SIPpMessage, SIPpMessageParser, SIPpMessageStore, SIPHeaders, SDPSession)
+    injection    injection files
+    scenario     scenario XML checks
+    shard        parsing a log on several processes
+    pcap         SIP messages out of pcap/pcapng captures
+    dialog       per-call dialogs and transactions (DialogIndex)
+    table        NumPy message and media tables (MessageTable, MediaTable)
+    cache        parsed logs cached as NumPy files (ParsedLogCache)
+    follow       checks on a log while SIPp writes it (MessageLogFollower)
+    segments     time windows over rotated logs (RotatedMessageLog)
+    signature    run-to-run comparison of call flows (SignatureHistogram)
+    pool         SIPp processes in parallel (SIPpPool)
+    load         load runs with live statistics (SIPpLoadRunner, LoadResult)
+    capacity     the highest sustainable call rate (CapacitySearch, SIPpControl)
+    session      one SIPp process for many test cases (SIPpSession)
+    peer         an asyncio SIP peer that stands in for sipp (SIPPeer)
+    distributed  load runs over several agents (SIPpAgent, SIPpCoordinator)
+    instrument   timing of the helper API in test runs (Instrumentation)
+
+The submodules are imported when one of their names is first used, so that
+CLI runs and worker processes only pay for what they touch.
+'''
+
+_exports = {
+    'SIPp': 'runner',
+    'SIPpLogPipe': 'runner',
+    'SIPpMessage': 'parser',
+    'SIPpMessageParser': 'parser',
+    'SIPpMessageStore': 'parser',
+    'SIPHeaders': 'parser',
+    'SDPSession': 'parser',
+    'SDPMedia': 'parser',
+    'Scenario': 'scenario',
+    'DialogIndex': 'dialog',
+    'MessageTable': 'table',
+    'MediaTable': 'table',
+    'ParsedLogCache': 'cache',
+    'MessageLogFollower': 'follow',
+    'RotatedMessageLog': 'segments',
+    'SignatureHistogram': 'signature',
+    'SIPpPool': 'pool',
+    'SIPpLoadRunner': 'load',
+    'LoadResult': 'load',
+    'CapacitySearch': 'capacity',
+    'SIPpControl': 'capacity',
+    'SIPpSession': 'session',
+    'SIPPeer': 'peer',
+    'SIPpAgent': 'distributed',
+    'SIPpCoordinator': 'distributed',
+    'Instrumentation': 'instrument',
+}
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -0,0 +1,114 @@
+''' Command line of the sippft package.
+
+    python3 -m sippft parse logs/sip_msg.log --direction received --status-code 200
+    python3 -m sippft stats logs/sip_msg.log --processes 4
+    python3 -m sippft run --scenario-file tests/scenarios/uac-uas.xml --remote-host localhost:5062 --count 10
+'''
+import sys
+
+def _filtered(messages, direction=None, method=None, status_code=None):
+    for msg in messages:
+        # every given criterion has to match, as in SIPpMessage.messagesFilter
+        if direction is not None and msg.direction != direction:
+            continue
+        if method is not None and msg.getMethod() != method:
+            continue
+        if status_code is not None and msg.getStatusCode() != status_code:
+            continue
+        yield msg
+
+def parse(args):
+    from .parser import SIPpMessage
+    messages = SIPpMessage.iterMessagesFromLogfile(args.logfile, local_addresses=args.local_address)
+    for msg in _filtered(messages, args.direction, args.method, args.status_code):
+        print('{} {} {} {}'.format(msg.datetime.isoformat(' ', 'microseconds') if msg.datetime else '-',
+                                   msg.direction or '-', msg.protocol, msg.getStartLine()))
+    return 0
+
+def stats(args):
+    import json
+    from collections import Counter
+    from .parser import SIPpMessage
+    head = b''
+    if args.processes:
+        with open(args.logfile, 'rb') as f:
+            head = f.read(6)
+    if args.processes and SIPpMessage.detectLogCompression(head) is None \
+            and head[:4] not in SIPpMessage.capture_magics:
+        # only the counts come back from the worker processes, calls, first and last are null
+        from .shard import aggregateMessagesInShards
+        aggregate = aggregateMessagesInShards(args.logfile, processes=args.processes)
+        report = {'messages': sum(aggregate['direction'].values()), 'calls': None, 'first': None, 'last': None}
+    else:
+        aggregate = {'direction': Counter(), 'method': Counter(), 'status_code': Counter()}
+        call_ids = set()
+        first = last = None
+        for msg in SIPpMessage.iterMessagesFromLogfile(args.logfile, local_addresses=args.local_address):
+            aggregate['direction'][msg.direction] += 1
+            status_code = msg.getStatusCode()
+            if status_code is None:
+                aggregate['method'][msg.getMethod()] += 1
+            else:
+                aggregate['status_code'][status_code] += 1
+            call_ids.add(msg.getHeaders().getFirst('Call-ID'))
+            first = first or msg.datetime
+            last = msg.datetime or last
+        report = {'messages': sum(aggregate['direction'].values()), 'calls': len(call_ids),
+                  'first': first.isoformat(' ', 'microseconds') if first else None,
+                  'last': last.isoformat(' ', 'microseconds') if last else None}
+    for name, counter in aggregate.items():
+        report[name] = {str(key): count for key, count in sorted(counter.items(), key=lambda item: str(item[0]))}
+    print(json.dumps(report, indent=2))
+    return 0
+
+def run(args):
+    from .runner import SIPp
+    kwargs = {name: value for name, value in vars(args).items()
+              if name not in ('command', 'function') and value is not None}
+    ret, command = SIPp.helper_run_a_sipp(**kwargs)
+    print(command)
+    return ret.returncode
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python3 -m sippft', description=__doc__.split('\n')[0].strip("' "))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parse_parser = commands.add_parser('parse', help='print the messages of a log or capture, one per line')
+    parse_parser.add_argument('logfile')
+    parse_parser.add_argument('--direction', choices=('sent', 'received'))
+    parse_parser.add_argument('--method')
+    parse_parser.add_argument('--status-code', type=int)
+    parse_parser.add_argument('--local-address', action='append', default=[],
+                              help='local address of a pcap capture, decides the direction')
+    parse_parser.set_defaults(function=parse)
+
+    stats_parser = commands.add_parser('stats', help='count the messages of a log or capture as JSON')
+    stats_parser.add_argument('logfile')
+    stats_parser.add_argument('--processes', type=int,
+                              help='count byte ranges of a plain log in parallel; calls, first and last are then null')
+    stats_parser.add_argument('--local-address', action='append', default=[])
+    stats_parser.set_defaults(function=stats)
+
+    run_parser = commands.add_parser('run', help='run sipp like SIPp.helper_run_a_sipp')
+    run_parser.add_argument('--sipp-binary', dest='sipp_binary')
+    run_parser.add_argument('--scenario-file', dest='scenario_file')
+    run_parser.add_argument('--embedded-scenario', dest='embedded_scenario')
+    run_parser.add_argument('--injection-file', dest='injection_file')
+    run_parser.add_argument('--remote-host', dest='remote_host')
+    run_parser.add_argument('--request-service', dest='request_service')
+    run_parser.add_argument('--bind-sip-addr', dest='bind_sip_addr')
+    run_parser.add_argument('--bind-sip-port', dest='bind_sip_port', type=int)
+    run_parser.add_argument('--call-rate', dest='call_rate')
+    run_parser.add_argument('--count', type=int)
+    run_parser.add_argument('--duration-msec', dest='duration_msec', type=int)
+    run_parser.add_argument('--timeout-s', dest='timeout_s')
+    run_parser.add_argument('--logfile-path', dest='logfile_path')
+    run_parser.add_argument('--log-compression', dest='log_compression', choices=('gzip', 'bz2', 'xz', 'zstd'))
+    run_parser.set_defaults(function=run)
+
+    args = parser.parse_args(argv)
+    return args.function(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
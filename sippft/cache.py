@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+''' Parsed message logs cached as NumPy files.
+'''
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import tempfile
+
+from .parser import SIPpMessage, SIPpMessageStore
+from .table import MessageTable, np, requireNumpy
+
+class CachedMessageLog():
+    ''' A parsed message log loaded from ParsedLogCache.
+        table holds the MessageTable columns; messages are created on access
+        from the byte offsets into a memory map of the log.
+    '''
+    def __init__(self, filepath, table, offsets):
+        self.filepath = filepath
+        self.table = table
+        self.offsets = offsets
+        self._file = open(filepath, 'rb')
+        if len(offsets):
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mmap = b''
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        table = self.table
+        msg = SIPpMessage()
+        msg.datetime = table.timestamp[index].item()
+        # code -1 is a direction or protocol the table does not know
+        direction = table.direction[index]
+        protocol = table.protocol[index]
+        msg.direction = table.directions[direction] if direction >= 0 else None
+        msg.protocol = table.protocols[protocol] if protocol >= 0 else None
+        msg.length = int(table.length[index])
+        msg.setBuffer(self._mmap, int(self.offsets[index]))
+        return msg
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class ParsedLogCache():
+    ''' Size-bounded directory of parsed message logs in NumPy .npz files.
+        An entry is keyed by the absolute log path and is only used while the
+        log size, mtime and a hash of sampled blocks still match.
+        By default the cache directory is .sipp_cache next to the log.
+    '''
+    version = 1
+
+    def __init__(self, cache_dir=None, max_bytes=1024 * 1024 * 1024, sample_size=64 * 1024):
+        requireNumpy('ParsedLogCache')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sample_size = sample_size
+
+    def _cacheDir(self, filepath):
+        return self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(filepath)), '.sipp_cache')
+
+    def entryPath(self, filepath):
+        key = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self._cacheDir(filepath), key + '.npz')
+
+    def fingerprint(self, filepath):
+        stat = os.stat(filepath)
+        digest = hashlib.sha1()
+        # hash the head, middle and tail instead of reading a multi-GB log
+        with open(filepath, 'rb') as f:
+            for pos in sorted(set([0, max(0, stat.st_size // 2 - self.sample_size // 2),
+                                   max(0, stat.st_size - self.sample_size)])):
+                f.seek(pos)
+                digest.update(f.read(self.sample_size))
+        return {'version': self.version, 'path': os.path.abspath(filepath), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'sample_sha1': digest.hexdigest()}
+
+    def load(self, filepath):
+        ''' Returns the cached log, or None when there is no valid entry.
+            A stale entry is removed.
+        '''
+        entry_path = self.entryPath(filepath)
+        if not os.path.isfile(entry_path):
+            return None
+        try:
+            with np.load(entry_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta['fingerprint'] != self.fingerprint(filepath):
+                    raise ValueError('stale cache entry')
+                columns = {name: data[name] for name in MessageTable.columns}
+                offsets = data['offsets']
+        except (OSError, KeyError, ValueError):
+            os.remove(entry_path)
+            return None
+        # mtime is the last use time for eviction
+        os.utime(entry_path)
+        return CachedMessageLog(filepath, MessageTable(columns, meta['method_names']), offsets)
+
+    def store(self, filepath):
+        ''' Parses the log and writes its cache entry.
+        '''
+        fingerprint = self.fingerprint(filepath)
+        with SIPpMessageStore(filepath) as store:
+            table = MessageTable.fromMessages(store, keep_messages=False)
+            offsets = np.array([msg.getOffset() for msg in store], dtype=np.int64)
+
+        entry_path = self.entryPath(filepath)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(json.dumps({'fingerprint': fingerprint,
+                                                   'method_names': table.method_names})),
+                 offsets=offsets, **{name: getattr(table, name) for name in MessageTable.columns})
+        # write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, entry_path)
+        self.evict(os.path.dirname(entry_path), keep=entry_path)
+        return CachedMessageLog(filepath, table, offsets)
+
+    def open(self, filepath):
+        cached = self.load(filepath)
+        if cached is None:
+            cached = self.store(filepath)
+        return cached
+
+    def evict(self, cache_dir, keep=None):
+        ''' Removes the least recently used entries until the directory fits max_bytes.
+        '''
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(cache_dir, name)))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
+
+    def clear(self, filepath=None):
+        cache_dir = self._cacheDir(filepath) if filepath else self.cache_dir
+        if cache_dir and os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+''' The highest call rate a scenario sustains, searched over the SIPp control port.
+'''
+import socket
+import time
+
+from .load import LoadResult, SIPpLoadRunner
+from .pool import SIPpPool
+
+class SIPpControl():
+    ''' Sends commands to the remote control UDP port (-cp) of a running SIPp.
+        The commands are the keyboard commands; 'c' prefixes a command line.
+    '''
+    def __init__(self, port=8888, addr='127.0.0.1'):
+        self.port = port
+        self.addr = addr
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, command):
+        self._socket.sendto(command.encode('utf-8'), (self.addr, self.port))
+
+    def setRate(self, rate):
+        self.send('cset rate {}'.format(rate))
+
+    def pause(self):
+        self.send('p')
+
+    def quit(self):
+        self.send('q')
+
+    def close(self):
+        self._socket.close()
+
+class CapacityResult():
+    ''' max_rate is the highest call rate that met the thresholds, or None.
+        curve holds one measured point (a dict) per step in the order run.
+    '''
+    def __init__(self, max_rate, curve, load_result=None):
+        self.max_rate = max_rate
+        self.curve = curve
+        self.load_result = load_result
+
+class CapacitySearch():
+    ''' Finds the highest sustainable call rate of a scenario.
+        The rate grows by growth until a step misses a threshold and is then
+        bisected between the last good and first bad rates. All steps run in
+        one SIPp process whose rate is changed over its control port.
+    '''
+    def __init__(self, start_rate=10, max_rate=10000, growth=2.0, precision=0.05,
+                 max_failure_ratio=0.01, percentile=99, max_response_time_ms=None,
+                 step_s=5, settle_s=1, max_steps=20, poll_interval_s=0.1):
+        self.start_rate = start_rate
+        self.max_rate = max_rate
+        self.growth = growth
+        self.precision = precision
+        self.max_failure_ratio = max_failure_ratio
+        self.percentile = percentile
+        self.max_response_time_ms = max_response_time_ms
+        self.step_s = step_s
+        self.settle_s = settle_s
+        self.max_steps = max_steps
+        self.poll_interval_s = poll_interval_s
+
+    def isSustainable(self, point):
+        if point['failure_ratio'] is None or point['failure_ratio'] > self.max_failure_ratio:
+            return False
+        if self.max_response_time_ms is not None:
+            response_time = point['response_time_ms']
+            if response_time is None or response_time > self.max_response_time_ms:
+                return False
+        return True
+
+    def search(self, measure):
+        ''' Runs measure(rate) -> point for each step and returns the CapacityResult.
+        '''
+        curve = []
+        good = None
+        bad = None
+        rate = self.start_rate
+        for step in range(self.max_steps):
+            point = measure(rate)
+            point['sustainable'] = self.isSustainable(point)
+            curve.append(point)
+            if point['sustainable']:
+                good = rate if good is None else max(good, rate)
+            else:
+                bad = rate if bad is None else min(bad, rate)
+
+            if bad is None:
+                if rate >= self.max_rate:
+                    break
+                next_rate = min(self.max_rate, int(rate * self.growth))
+            elif good is None:
+                if rate <= 1:
+                    break
+                next_rate = max(1, int(rate / self.growth))
+            else:
+                if bad - good <= max(1, self.precision * bad):
+                    break
+                next_rate = (good + bad) // 2
+            if next_rate == rate:
+                break
+            rate = next_rate
+        return CapacityResult(good, curve)
+
+    def summarizeStep(self, rate, rows, samples):
+        successful = sum(int(row.get('SuccessfulCall(P)') or 0) for row in rows)
+        failed = sum(int(row.get('FailedCall(P)') or 0) for row in rows)
+        call_rates = [float(row['CallRate(P)']) for row in rows if row.get('CallRate(P)')]
+        response_times = {}
+        for rtd, value in samples:
+            response_times.setdefault(rtd, []).append(value)
+        step = LoadResult(None, None, rows, response_times, [])
+        return {
+            'rate': rate,
+            'calls_per_second': sum(call_rates) / len(call_rates) if call_rates else None,
+            'successful_calls': successful,
+            'failed_calls': failed,
+            'failure_ratio': failed / (successful + failed) if successful + failed else None,
+            'response_time_ms': step.percentile(self.percentile),
+        }
+
+    def measureStep(self, runner, control, rate):
+        control.setRate(rate)
+        # drop what was measured while the rate was changing
+        time.sleep(self.settle_s)
+        runner.poll()
+        rows = []
+        samples = []
+        deadline = time.monotonic() + self.step_s
+        while time.monotonic() < deadline and runner.proc.poll() is None:
+            time.sleep(self.poll_interval_s)
+            new_rows, new_samples = runner.poll()
+            rows += new_rows
+            samples += new_samples
+        return self.summarizeStep(rate, rows, samples)
+
+    def run(self, control_port=None, stat_frequency_s=1, **kwargs):
+        ''' Runs the search against SIPp started with the kwargs of
+            SIPp.helper_run_a_sipp.
+        '''
+        control_port = control_port or SIPpPool.findFreePort()
+        kwargs.setdefault('timeout_s', self.max_steps * (self.step_s + self.settle_s) + 30)
+        # run until told to quit
+        kwargs['count'] = 0
+        runner = SIPpLoadRunner(poll_interval_s=self.poll_interval_s)
+        runner.start(call_rate=self.start_rate, control_port=control_port,
+                     stat_frequency_s=stat_frequency_s, **kwargs)
+        control = SIPpControl(control_port, kwargs.get('bind_sip_addr') or '127.0.0.1')
+        try:
+            result = self.search(lambda rate: self.measureStep(runner, control, rate))
+            control.quit()
+        finally:
+            control.close()
+            load_result = runner.finish()
+        result.load_result = load_result
+        return result
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+''' Per-call dialogs and transactions of parsed messages.
+'''
+import re
+
+class SIPTransaction():
+    ''' Requests and responses sharing a top Via branch and a CSeq.
+    '''
+    __slots__ = ('branch', 'cseq', 'method', 'requests', 'responses')
+
+    def __init__(self, branch, cseq, method):
+        self.branch = branch
+        self.cseq = cseq
+        self.method = method
+        self.requests = []
+        self.responses = []
+
+class SIPDialog():
+    ''' All transactions of one Call-ID in the order they were seen.
+        First-message lookups are kept in dicts while messages are added,
+        so queries do not walk the message lists.
+    '''
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.messages = []
+        # (branch, cseq number, cseq method) -> SIPTransaction
+        self.transactions = {}
+        # (method, direction) -> first request
+        self._first_requests = {}
+        # (cseq method, status code or class, direction) -> first response
+        self._first_responses = {}
+        # (cseq method, direction) -> first final (>= 200) response in arrival order
+        self._first_final_responses = {}
+        # status class (1..6) -> responses
+        self._responses_by_class = {}
+
+    def add(self, msg, transaction_key):
+        self.messages.append(msg)
+        transaction = self.transactions.get(transaction_key)
+        if transaction is None:
+            transaction = SIPTransaction(*transaction_key)
+            self.transactions[transaction_key] = transaction
+
+        status_code = msg.getStatusCode()
+        if status_code is None:
+            transaction.requests.append(msg)
+            method = msg.getMethod()
+            self._first_requests.setdefault((method, None), msg)
+            self._first_requests.setdefault((method, msg.direction), msg)
+        else:
+            transaction.responses.append(msg)
+            status_class = status_code // 100
+            self._responses_by_class.setdefault(status_class, []).append(msg)
+            for direction in (None, msg.direction):
+                self._first_responses.setdefault((transaction.method, status_code, direction), msg)
+                self._first_responses.setdefault((transaction.method, 'class', status_class, direction), msg)
+                if status_code >= 200:
+                    self._first_final_responses.setdefault((transaction.method, direction), msg)
+        return transaction
+
+    def getTransactions(self, method=None):
+        return [transaction for transaction in self.transactions.values()
+                if method is None or transaction.method == method]
+
+    def firstRequest(self, method, direction=None):
+        return self._first_requests.get((method, direction))
+
+    def firstResponse(self, method, status_code=None, status_class=None, direction=None):
+        if status_code is not None:
+            return self._first_responses.get((method, status_code, direction))
+        return self._first_responses.get((method, 'class', status_class, direction))
+
+    def firstProvisionalResponse(self, method='INVITE', direction=None):
+        return self.firstResponse(method, status_class=1, direction=direction)
+
+    def firstFinalResponse(self, method='INVITE', direction=None):
+        return self._first_final_responses.get((method, direction))
+
+    def getResponses(self, status_class):
+        return list(self._responses_by_class.get(status_class, ()))
+
+class DialogIndex():
+    ''' Call-ID -> SIPDialog index built in one pass over parsed messages.
+        messages may be a list or a generator such as iterMessagesFromLogfile.
+    '''
+    re_branch=re.compile(r';\s*branch\s*=\s*([^;,\s]+)', re.IGNORECASE)
+
+    def __init__(self, messages=None):
+        self.dialogs = {}
+        if messages is not None:
+            self.addMessages(messages)
+
+    @staticmethod
+    def transactionKey(msg):
+        headers = msg.getHeaders()
+        match_branch = DialogIndex.re_branch.search(headers.getFirst('Via', ''))
+        cseq = headers.getFirst('CSeq', '').split()
+        return (match_branch.group(1) if match_branch else None,
+                int(cseq[0]) if cseq and cseq[0].isdigit() else None,
+                cseq[1] if len(cseq) > 1 else None)
+
+    def add(self, msg):
+        call_id = msg.getHeaders().getFirst('Call-ID')
+        dialog = self.dialogs.get(call_id)
+        if dialog is None:
+            dialog = SIPDialog(call_id)
+            self.dialogs[call_id] = dialog
+        dialog.add(msg, self.transactionKey(msg))
+        return dialog
+
+    def addMessages(self, messages):
+        for msg in messages:
+            self.add(msg)
+
+    def get(self, call_id):
+        return self.dialogs.get(call_id)
+
+    def getDialogs(self):
+        return list(self.dialogs.values())
+
+    def __getitem__(self, call_id):
+        return self.dialogs[call_id]
+
+    def __contains__(self, call_id):
+        return call_id in self.dialogs
+
+    def __iter__(self):
+        return iter(self.dialogs.values())
+
+    def __len__(self):
+        return len(self.dialogs)
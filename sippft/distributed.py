@@ -0,0 +1,313 @@
+#!/usr/bin/python3
+''' Distributed SIPp load runs.
+
+    python3 -m sippft.distributed --addr 0.0.0.0 --port 7070 --sipp-binary /usr/local/bin/sipp
+
+starts an agent on a load box. SIPpCoordinator then fans a call rate out
+across the agents and merges the statistics and message logs they stream back.
+'''
+import argparse
+import heapq
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .load import LoadResult, SIPpLoadRunner
+from .parser import SIPpMessage
+from .pool import SIPpPool
+
+class FrameConnection():
+    ''' JSON header line followed by header['size'] bytes of payload.
+    '''
+    def __init__(self, sock):
+        self.sock = sock
+        self._rfile = sock.makefile('rb')
+
+    def send(self, header, payload=b''):
+        header['size'] = len(payload)
+        self.sock.sendall(json.dumps(header).encode('utf-8') + b'\n' + payload)
+
+    def receive(self):
+        ''' Returns (header, payload), or (None, b'') when the peer closed the connection.
+        '''
+        line = self._rfile.readline()
+        if not line:
+            return None, b''
+        header = json.loads(line)
+        payload = self._rfile.read(header.get('size', 0))
+        if len(payload) < header.get('size', 0):
+            raise ConnectionError('connection closed in the middle of a frame')
+        return header, payload
+
+    def sendChunks(self, header, chunks):
+        for chunk in chunks:
+            self.send(dict(header), chunk)
+
+    def close(self):
+        self._rfile.close()
+        self.sock.close()
+
+def iterFileChunks(path, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def iterInjectionPart(path, index, parts, chunk_size=64 * 1024):
+    ''' The header line of an injection file and every parts-th row from
+        index on, in chunks, so each agent gets its own users.
+    '''
+    chunk = []
+    size = 0
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f):
+            if number == 0 or (number - 1) % parts == index:
+                chunk.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    yield b''.join(chunk)
+                    chunk = []
+                    size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+class SIPpAgent():
+    ''' Accepts run specs over TCP, runs SIPp with SIPpLoadRunner and streams
+        back its statistics, response times and message log.
+        The SIPp binary is the agent's own; kwargs outside allowed_kwargs are
+        refused, files are only those sent with the spec, and SIP/media
+        ports that are not given are allocated from free local ports.
+    '''
+    file_kwargs = ('scenario_file', 'injection_file')
+    allowed_kwargs = ('timeout_s', 'remote_host', 'request_service', 'duration_msec', 'embedded_scenario',
+                      'bind_sip_addr', 'bind_sip_port', 'bind_media_addr', 'bind_media_port', 'call_rate',
+                      'count', 'stat_frequency_s', 'rtt_frequency', 'validate_scenario')
+
+    def __init__(self, addr='127.0.0.1', port=0, sipp_binary='sipp', poll_interval_s=0.5, chunk_size=64 * 1024):
+        self.addr = addr
+        self.port = port
+        self.sipp_binary = sipp_binary
+        self.poll_interval_s = poll_interval_s
+        self.chunk_size = chunk_size
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        agent = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                connection = FrameConnection(self.request)
+                try:
+                    agent.handle(connection)
+                # OSError covers a broken connection and the runner failing
+                # to start, e.g. on an address the agent can not bind
+                except (OSError, ValueError) as e:
+                    try:
+                        connection.send({'type': 'error', 'message': str(e)})
+                    except OSError:
+                        pass
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((self.addr, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.1},
+                                        daemon=True)
+        self._thread.start()
+        return self.addr, self.port
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def handle(self, connection):
+        with tempfile.TemporaryDirectory(prefix='sipp_agent_') as workdir:
+            files = {}
+            while True:
+                header, payload = connection.receive()
+                if header is None:
+                    return
+                if header['type'] == 'run':
+                    break
+                if header['type'] != 'file' or header.get('name') not in self.file_kwargs:
+                    raise ValueError('unexpected frame: {}'.format(header))
+                files[header['name']] = os.path.join(workdir, header['name'])
+                with open(files[header['name']], 'ab') as f:
+                    f.write(payload)
+
+            kwargs = header.get('kwargs', {})
+            refused = sorted(set(kwargs) - set(self.allowed_kwargs))
+            if refused:
+                raise ValueError('refused kwargs: {}'.format(', '.join(refused)))
+            kwargs.update(files)
+            addr = kwargs.get('bind_sip_addr') or '127.0.0.1'
+            for name in ('bind_sip_port', 'bind_media_port'):
+                if not kwargs.get(name):
+                    kwargs[name] = SIPpPool.findFreePort(addr)
+            if header.get('message_log'):
+                kwargs['logfile_path'] = os.path.join(workdir, 'messages.log')
+
+            runner = SIPpLoadRunner(
+                output_dir=workdir, poll_interval_s=self.poll_interval_s,
+                on_stat=lambda row: connection.send({'type': 'stat', 'row': row}),
+                on_response_time=lambda rtd, value: connection.send({'type': 'rtt', 'rtd': rtd, 'value': value}))
+            result = runner.run(sipp_binary=self.sipp_binary, **kwargs)
+
+            if kwargs.get('logfile_path') and os.path.isfile(kwargs['logfile_path']):
+                connection.sendChunks({'type': 'log'}, iterFileChunks(kwargs['logfile_path'], self.chunk_size))
+            connection.send({'type': 'result', 'returncode': result.ret.returncode, 'command': result.command,
+                             'errors': result.errors})
+
+class DistributedResult(LoadResult):
+    ''' LoadResult of all agents: counters and rates are summed over the
+        agents and response times are merged. results holds the LoadResult
+        of each agent and logfiles the message logs they sent.
+    '''
+    def __init__(self, results, logfiles):
+        failed = [result.ret for result in results if result.ret.returncode != 0]
+        response_times = {}
+        for result in results:
+            for rtd, values in result.response_times.items():
+                response_times.setdefault(rtd, []).extend(values)
+        super().__init__(failed[0] if failed else results[0].ret,
+                         '\n'.join(result.command for result in results),
+                         [row for result in results for row in result.stats],
+                         response_times,
+                         [error for result in results for error in result.errors])
+        self.results = results
+        self.logfiles = logfiles
+
+    def _lastStat(self, name, cast=int):
+        values = [result._lastStat(name, cast) for result in self.results]
+        values = [value for value in values if value is not None]
+        return sum(values) if values else None
+
+    def iterMessages(self):
+        ''' Messages of all agents' logs in time order.
+        '''
+        return heapq.merge(*(SIPpMessage.iterMessagesFromLogfile(path) for path in self.logfiles if path),
+                           key=lambda msg: msg.datetime)
+
+class SIPpCoordinator():
+    ''' Fans a run out across agents given as (host, port) pairs.
+        call_rate and count are divided between the agents and, with
+        split_injection, the rows of the injection file too.
+    '''
+    def __init__(self, agents, connect_timeout_s=10, chunk_size=64 * 1024):
+        self.agents = list(agents)
+        self.connect_timeout_s = connect_timeout_s
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def splitCount(total, parts):
+        return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+    def createSpecs(self, call_rate=None, count=1, **kwargs):
+        parts = len(self.agents)
+        counts = self.splitCount(count, parts) if count else [count] * parts
+        specs = []
+        for index in range(parts):
+            spec = dict(kwargs, count=counts[index])
+            if call_rate:
+                spec['call_rate'] = call_rate / parts
+            specs.append(spec)
+        return specs
+
+    def run(self, call_rate=None, count=1, logfile_dir=None, split_injection=True,
+            on_stat=None, on_response_time=None, **kwargs):
+        ''' Runs SIPp on every agent at once and returns the DistributedResult.
+            The message logs are written to logfile_dir as agent-<n>.log when it is given.
+        '''
+        specs = self.createSpecs(call_rate, count, **kwargs)
+        with ThreadPoolExecutor(max_workers=len(self.agents)) as executor:
+            futures = [executor.submit(self._runAgent, index, spec, logfile_dir, split_injection,
+                                       on_stat, on_response_time)
+                       for index, spec in enumerate(specs)]
+            runs = [future.result() for future in futures]
+        return DistributedResult([result for result, logfile in runs], [logfile for result, logfile in runs])
+
+    def _runAgent(self, index, kwargs, logfile_dir, split_injection, on_stat, on_response_time):
+        address = self.agents[index]
+        files = {name: kwargs.pop(name) for name in SIPpAgent.file_kwargs if kwargs.get(name)}
+        sock = socket.create_connection(address, timeout=self.connect_timeout_s)
+        # the run lasts as long as SIPp does
+        sock.settimeout(None)
+        connection = FrameConnection(sock)
+        logfile = None
+        log = None
+        try:
+            for name, path in files.items():
+                if name == 'injection_file' and split_injection:
+                    chunks = iterInjectionPart(path, index, len(self.agents), self.chunk_size)
+                else:
+                    chunks = iterFileChunks(path, self.chunk_size)
+                connection.sendChunks({'type': 'file', 'name': name}, chunks)
+            connection.send({'type': 'run', 'kwargs': kwargs, 'message_log': logfile_dir is not None})
+
+            stats = []
+            response_times = {}
+            while True:
+                header, payload = connection.receive()
+                if header is None:
+                    raise ConnectionError('agent {}:{} closed the connection'.format(*address))
+                if header['type'] == 'stat':
+                    stats.append(header['row'])
+                    if on_stat:
+                        on_stat(index, header['row'])
+                elif header['type'] == 'rtt':
+                    response_times.setdefault(header['rtd'], []).append(header['value'])
+                    if on_response_time:
+                        on_response_time(index, header['rtd'], header['value'])
+                elif header['type'] == 'log':
+                    if log is None:
+                        logfile = os.path.join(logfile_dir, 'agent-{}.log'.format(index))
+                        log = open(logfile, 'wb')
+                    log.write(payload)
+                elif header['type'] == 'result':
+                    ret = subprocess.CompletedProcess(header['command'].split(), header['returncode'])
+                    return LoadResult(ret, header['command'], stats, response_times, header['errors']), logfile
+                elif header['type'] == 'error':
+                    raise ValueError('agent {}:{}: {}'.format(address[0], address[1], header['message']))
+        finally:
+            if log is not None:
+                log.close()
+            connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--addr', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7070)
+    parser.add_argument('--sipp-binary', default='sipp')
+    parser.add_argument('--poll-interval-s', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    agent = SIPpAgent(args.addr, args.port, args.sipp_binary, args.poll_interval_s)
+    agent.start()
+    print('agent listening on {}:{}'.format(agent.addr, agent.port), flush=True)
+    try:
+        agent._thread.join()
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+''' Checks on a message log while SIPp writes it.
+'''
+import os
+import subprocess
+import time
+
+from .parser import SIPpMessageParser
+from .runner import SIPp
+
+class MessageLogFollower():
+    ''' Tails a SIPp -message_file while it is written and hands every new
+        message to the registered checks.
+        A check fails when it raises AssertionError or returns False.
+    '''
+    def __init__(self, filepath, chunk_size=64 * 1024, offset=0):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        # byte offset to start at; a message cut by it is skipped
+        self.offset = offset
+        self.message_count = 0
+        self.failures = []
+        self._checks = []
+        self._file = None
+        self._partial = b''
+        self._parser = SIPpMessageParser()
+
+    def addCheck(self, check, name=None):
+        self._checks.append((name or getattr(check, '__name__', repr(check)), check))
+
+    def _runChecks(self, msg):
+        for name, check in self._checks:
+            try:
+                if check(msg) is False:
+                    self.failures.append((name, msg, 'check returned False'))
+            except AssertionError as e:
+                self.failures.append((name, msg, str(e)))
+
+    def poll(self):
+        ''' Reads what was appended since the last poll and returns the
+            messages completed by it.
+        '''
+        if self._file is None:
+            # SIPp creates the log with the first message
+            if not os.path.isfile(self.filepath):
+                return []
+            self._file = open(self.filepath, 'rb')
+            self._file.seek(self.offset)
+
+        messages = []
+        while True:
+            data = self._file.read(self.chunk_size)
+            if not data:
+                break
+            lines = (self._partial + data).split(b'\n')
+            # keep the unterminated last line until the rest of it is written
+            self._partial = lines.pop()
+            for line in lines:
+                msg = self._parser.feedLine(line + b'\n')
+                if msg is not None:
+                    messages.append(msg)
+
+        for msg in messages:
+            self.message_count += 1
+            self._runChecks(msg)
+        return messages
+
+    def finish(self):
+        ''' Polls the rest of the log and returns the remaining messages,
+            including one cut short by the end of the log.
+        '''
+        messages = self.poll()
+        rest = []
+        if self._partial:
+            msg = self._parser.feedLine(self._partial)
+            self._partial = b''
+            if msg is not None:
+                rest.append(msg)
+        msg = self._parser.flush()
+        if msg is not None:
+            rest.append(msg)
+        for msg in rest:
+            self.message_count += 1
+            self._runChecks(msg)
+        return messages + rest
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def run(self, poll_interval_s=0.05, stop_on_failure=True, **kwargs):
+        ''' Runs SIPp with the kwargs of SIPp.helper_run_a_sipp, following
+            its logfile_path, and terminates it at the first failed check.
+            The log is read while SIPp writes it, so it can not be compressed.
+        '''
+        if kwargs.get('log_compression'):
+            raise ValueError('log_compression can not be used with a followed message log')
+        kwargs['logfile_path'] = self.filepath
+        runnable, command = SIPp.helper_create_command(**kwargs)
+        proc = subprocess.Popen(runnable, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while proc.poll() is None:
+                self.poll()
+                if stop_on_failure and self.failures:
+                    # the timeout command passes the signal on to sipp
+                    proc.terminate()
+                    proc.wait()
+                    break
+                time.sleep(poll_interval_s)
+            self.finish()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            self.close()
+        return subprocess.CompletedProcess(runnable, proc.returncode), " ".join(command)
+
+    def assertPassed(self):
+        if self.failures:
+            name, msg, error = self.failures[0]
+            raise AssertionError('{} failed on message at {}: {} ({} failures)'.format(
+                name, msg.datetime, error, len(self.failures)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
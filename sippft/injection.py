@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+''' SIPp injection files (-inf): a header line with the read mode and
+    optional PRINTF settings, then one ';' separated row of fields per line.
+'''
+
+def createInjection(mode="SEQUENTIAL", printf=None, printfmultiple=None, printfoffset=None, content=None):
+    header = createInjectionHeader(mode, printf, printfmultiple, printfoffset)
+    if header is None:
+        return None
+
+    lines = [header]
+    if content:
+        lines.extend(createInjectionLine(a_line) for a_line in content)
+    return "\n".join(lines).strip()
+
+def createInjectionHeader(mode="SEQUENTIAL", printf=None, printfmultiple=None, printfoffset=None):
+    if not printf and (printfmultiple or printfoffset):
+        return None
+
+    header = [str(mode)]
+    if printf:
+        header.append('PRINTF={}'.format(str(printf)))
+    if printfmultiple:
+        header.append('PRINTFMULTIPLE={}'.format(str(printfmultiple)))
+    if printfoffset:
+        header.append('PRINTFOFFSET={}'.format(str(printfoffset)))
+    return ",".join(header)
+
+def createInjectionLine(fields):
+    # sipp reads "\;" as a literal semicolon inside a field
+    return ";".join(str(field).replace(';', '\\;') for field in fields)
+
+def injectionRange(template, start, stop, step=1):
+    ''' Yields one row per number in range(start, stop, step), with the
+        number formatted into every template field that has a % conversion,
+        e.g. ['user%08d', 'example.com'].
+    '''
+    template = list(template)
+    templated = [index for index, field in enumerate(template) if '%' in field]
+    for number in range(start, stop, step):
+        row = template[:]
+        for index in templated:
+            row[index] = template[index] % number
+        yield row
+
+def writeInjectionRows(rows, path_to_file, mode="SEQUENTIAL", printf=None, printfmultiple=None, printfoffset=None,
+                       buffer_size=1024 * 1024):
+    ''' Streams rows (any iterable of field lists) to an injection file
+        through a write buffer and returns the number of rows written.
+    '''
+    header = createInjectionHeader(mode, printf, printfmultiple, printfoffset)
+    if header is None:
+        return None
+
+    counter = [0]
+
+    def lines():
+        yield header + '\n'
+        for row in rows:
+            counter[0] += 1
+            try:
+                line = ';'.join(row)
+            except TypeError:
+                row = [str(field) for field in row]
+                line = ';'.join(row)
+            # only escape the rare rows with a ';' inside a field
+            if line.count(';') != len(row) - 1:
+                line = createInjectionLine(row)
+            yield line + '\n'
+
+    with open(path_to_file, 'w', buffering=buffer_size, newline='\n') as f:
+        f.writelines(lines())
+    return counter[0]
+
+def writeInjectionFile(content_as_str, path_to_file):
+    with open(path_to_file, 'w') as f:
+        f.write(content_as_str)
@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+''' Opt-in timing and profiling of the helper API.
+
+    python3 -m sippft.instrument --sink jsonl:logs/profile.jsonl tests.helper tests.sip_test_scenario
+
+runs the given unittest modules with the helpers instrumented and prints a
+summary of where the time went at the end of the run.
+'''
+import argparse
+import asyncio
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+import unittest
+
+from .parser import SIPpMessage
+from .runner import SIPp
+
+class MemorySink():
+    ''' Keeps the records in a list.
+    '''
+    def __init__(self):
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+class JsonLinesSink():
+    ''' Writes one JSON object per record and line.
+    '''
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = open(filepath, 'a')
+
+    def record(self, record):
+        self._file.write(json.dumps(record, sort_keys=True, default=str) + '\n')
+
+    def close(self):
+        self._file.close()
+
+class Instrumentation():
+    ''' Replaces the helper functions with wrappers that measure each call
+        while installed, and puts the originals back on uninstall, so the
+        helpers cost nothing extra when instrumentation is not used.
+        Detailed functions send one record per call to the sink; the header
+        getters are called per message and are only counted in the summary.
+        With profile the outermost detailed calls run under cProfile, with
+        trace_memory their tracemalloc peak is recorded.
+    '''
+    detailed = [
+        (SIPp, 'helper_run_a_sipp'),
+        (SIPp, 'helper_run_a_sipp_async'),
+        (SIPpMessage, 'parseMessagesFromLogfile'),
+        (SIPpMessage, 'messagesFilter'),
+    ]
+    counted = [
+        (SIPpMessage, 'getStartLine'),
+        (SIPpMessage, 'getHeaders'),
+        (SIPpMessage, 'getBody'),
+        (SIPpMessage, 'getStatusCode'),
+        (SIPpMessage, 'getStatusPhrease'),
+        (SIPpMessage, 'getMethod'),
+        (SIPpMessage, 'getRequstURI'),
+        (SIPpMessage, 'getHeaderValues'),
+    ]
+
+    def __init__(self, sink=None, profile=False, trace_memory=False, profile_lines=20):
+        self.sink = sink if sink is not None else MemorySink()
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_lines = profile_lines
+        # the test the calls are made for, set by InstrumentedTestResult
+        self.context = None
+        # name -> {'calls', 'wall_s', 'cpu_s', 'bytes', 'messages'}
+        self.totals = {}
+        self._originals = []
+        self._depth = 0
+
+    def install(self):
+        if self._originals:
+            return self
+        for owner, name in self.detailed + self.counted:
+            original = owner.__dict__[name]
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(owner, name, original, (owner, name) in self.detailed))
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return self
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+        self.sink.close()
+
+    def _wrap(self, owner, name, original, detailed):
+        function = original.__func__ if isinstance(original, staticmethod) else original
+        qualname = '{}.{}'.format(owner.__name__, name)
+
+        if not detailed:
+            totals = self.totals.setdefault(qualname, {'calls': 0, 'wall_s': 0.0})
+
+            @functools.wraps(function)
+            def counting(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    totals['calls'] += 1
+                    totals['wall_s'] += time.perf_counter() - started
+            wrapper = counting
+        elif asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def measuring_async(*args, **kwargs):
+                started = self._start()
+                result = None
+                try:
+                    result = await function(*args, **kwargs)
+                    return result
+                finally:
+                    self._finish(qualname, started, args, kwargs, result)
+            wrapper = measuring_async
+        else:
+            @functools.wraps(function)
+            def measuring(*args, **kwargs):
+                started = self._start()
+                result = None
+                try:
+                    result = function(*args, **kwargs)
+                    return result
+                finally:
+                    self._finish(qualname, started, args, kwargs, result)
+            wrapper = measuring
+        return staticmethod(wrapper) if isinstance(original, staticmethod) else wrapper
+
+    def _start(self):
+        self._depth += 1
+        profiler = None
+        if self.profile and self._depth == 1:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        memory = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return time.perf_counter(), time.process_time(), profiler, memory
+
+    def _finish(self, qualname, started, args, kwargs, result):
+        wall_started, cpu_started, profiler, memory = started
+        record = {'name': qualname, 'test': self.context,
+                  'wall_s': time.perf_counter() - wall_started,
+                  'cpu_s': time.process_time() - cpu_started}
+        self._depth -= 1
+        if profiler is not None:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(self.profile_lines)
+            record['profile'] = output.getvalue()
+        if memory is not None:
+            record['memory_peak_bytes'] = tracemalloc.get_traced_memory()[1] - memory
+
+        record['bytes'] = self.measureBytes(qualname, args, kwargs)
+        if isinstance(result, list):
+            record['messages'] = len(result)
+        elif isinstance(result, tuple) and len(result) == 2 and hasattr(result[0], 'returncode'):
+            record['returncode'] = result[0].returncode
+
+        totals = self.totals.setdefault(qualname, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                   'bytes': 0, 'messages': 0})
+        totals['calls'] += 1
+        totals['wall_s'] += record['wall_s']
+        totals['cpu_s'] += record['cpu_s']
+        totals['bytes'] += record['bytes'] or 0
+        totals['messages'] += record.get('messages', 0)
+        self.sink.record(record)
+
+    @staticmethod
+    def measureBytes(qualname, args, kwargs):
+        # bytes read by a parse, or the message log written by a sipp run
+        if qualname == 'SIPpMessage.parseMessagesFromLogfile':
+            filepath = args[0] if args else kwargs.get('filepath')
+        else:
+            filepath = kwargs.get('logfile_path')
+        # a file object given to the parser has no size to look up
+        if isinstance(filepath, (str, bytes, os.PathLike)) and os.path.isfile(filepath):
+            return os.path.getsize(filepath)
+        return None
+
+    def recordTest(self, test_id, wall_s, outcome):
+        self.sink.record({'name': 'test', 'test': test_id, 'wall_s': wall_s, 'outcome': outcome})
+        totals = self.totals.setdefault('test', {'calls': 0, 'wall_s': 0.0})
+        totals['calls'] += 1
+        totals['wall_s'] += wall_s
+
+    def summary(self):
+        ''' The totals per function as text, slowest first.
+        '''
+        lines = ['{:<40} {:>8} {:>10} {:>10} {:>12} {:>10}'.format(
+            'function', 'calls', 'wall s', 'cpu s', 'bytes', 'messages')]
+        for name, totals in sorted(self.totals.items(), key=lambda item: -item[1]['wall_s']):
+            if not totals['calls']:
+                continue
+            lines.append('{:<40} {:>8} {:>10.3f} {:>10} {:>12} {:>10}'.format(
+                name, totals['calls'], totals['wall_s'],
+                '{:.3f}'.format(totals['cpu_s']) if 'cpu_s' in totals else '-',
+                totals.get('bytes', '-'), totals.get('messages', '-')))
+        return '\n'.join(lines)
+
+class InstrumentedTestResult(unittest.TextTestResult):
+    ''' Tells the instrumentation which test is running and records the
+        time of every test, so the time outside the helpers shows up too.
+    '''
+    instrumentation = None
+
+    def startTest(self, test):
+        self.instrumentation.context = test.id()
+        self._test_started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.instrumentation.recordTest(test.id(), time.perf_counter() - self._test_started, self._outcome(test))
+        self.instrumentation.context = None
+
+    def _outcome(self, test):
+        for outcome, tests in (('error', self.errors), ('failure', self.failures), ('skipped', self.skipped)):
+            if any(failed is test for failed, reason in tests):
+                return outcome
+        return 'success'
+
+def createSink(description):
+    ''' 'memory' or 'jsonl:<path>'.
+    '''
+    if description.startswith('jsonl:'):
+        return JsonLinesSink(description[len('jsonl:'):])
+    if description == 'memory':
+        return MemorySink()
+    raise ValueError('unknown sink: {}'.format(description))
+
+def discoverTestNames(start_dir='tests'):
+    ''' Module names of the .py files in start_dir. tests/ is not a package, so
+        unittest discovery would import the files without their parent and
+        their relative imports would fail; loading them by name does not.
+    '''
+    package = os.path.basename(os.path.normpath(start_dir))
+    return ['{}.{}'.format(package, name[:-3]) for name in sorted(os.listdir(start_dir))
+            if name.endswith('.py') and name != '__init__.py']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--sink', default='memory', help="'memory' or 'jsonl:<path>'")
+    parser.add_argument('--profile', action='store_true', help='run the helper calls under cProfile')
+    parser.add_argument('--trace-memory', action='store_true', help='record the tracemalloc peak of helper calls')
+    parser.add_argument('tests', nargs='*', help='unittest names, every module in tests/ when none are given')
+    args = parser.parse_args(argv)
+
+    instrumentation = Instrumentation(createSink(args.sink), profile=args.profile, trace_memory=args.trace_memory)
+    loader = unittest.TestLoader()
+    suite = loader.loadTestsFromNames(args.tests or discoverTestNames())
+    result_class = type('Result', (InstrumentedTestResult,), {'instrumentation': instrumentation})
+    with instrumentation:
+        result = unittest.TextTestRunner(resultclass=result_class).run(suite)
+    print(instrumentation.summary(), file=sys.stderr)
+    return 0 if result.wasSuccessful() else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+''' Load runs whose statistics and response times are read while SIPp runs.
+'''
+import bisect
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from .runner import SIPp
+
+class CsvFollower():
+    ''' Reads rows of a ';' separated SIPp statistics file as they are appended.
+        The first line is the header; rows are returned as dicts.
+    '''
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.header = None
+        self._file = None
+        self._partial = b''
+
+    def poll(self):
+        if self._file is None:
+            if self.filepath is None or not os.path.isfile(self.filepath):
+                return []
+            self._file = open(self.filepath, 'rb')
+
+        data = self._file.read()
+        if not data:
+            return []
+        lines = (self._partial + data).split(b'\n')
+        # keep the unterminated last line until the rest of it is written
+        self._partial = lines.pop()
+        rows = []
+        for line in lines:
+            fields = line.decode('utf-8', errors='replace').rstrip('\r').split(';')
+            if fields[-1] == '':
+                # SIPp ends every line with a separator
+                fields.pop()
+            if not fields:
+                continue
+            if self.header is None:
+                self.header = fields
+            else:
+                rows.append(dict(zip(self.header, fields)))
+        return rows
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class LoadResult():
+    ''' Statistics of one SIPp load run.
+        stats holds the -trace_stat rows, response_times maps a response time
+        (rtd) name to its -trace_rtt samples in milliseconds.
+    '''
+    def __init__(self, ret, command, stats, response_times, errors):
+        self.ret = ret
+        self.command = command
+        self.stats = stats
+        self.response_times = response_times
+        self.errors = errors
+
+    def _lastStat(self, name, cast=int):
+        for row in reversed(self.stats):
+            value = row.get(name, '').strip()
+            if value:
+                return cast(value)
+        return None
+
+    @property
+    def calls_per_second(self):
+        return self._lastStat('CallRate(C)', float)
+
+    @property
+    def total_calls(self):
+        return self._lastStat('TotalCallCreated')
+
+    @property
+    def successful_calls(self):
+        return self._lastStat('SuccessfulCall(C)')
+
+    @property
+    def failed_calls(self):
+        return self._lastStat('FailedCall(C)')
+
+    def getResponseTimes(self, rtd=None):
+        if rtd is None:
+            return sorted(value for values in self.response_times.values() for value in values)
+        return sorted(self.response_times.get(str(rtd), ()))
+
+    def percentile(self, q, rtd=None):
+        ''' Nearest-rank percentile of the response times in milliseconds.
+        '''
+        values = self.getResponseTimes(rtd)
+        if not values:
+            return None
+        rank = max(1, -(-len(values) * q // 100))
+        return values[int(rank) - 1]
+
+    def histogram(self, bounds=(10, 20, 30, 40, 50, 100, 150, 200), rtd=None):
+        ''' Counts of response times below each bound and above the last one,
+            like SIPp's ResponseTimeRepartition.
+        '''
+        counts = [0] * (len(bounds) + 1)
+        for value in self.getResponseTimes(rtd):
+            counts[bisect.bisect_left(bounds, value)] += 1
+        return counts
+
+class SIPpLoadRunner():
+    ''' Runs SIPp with its statistics outputs enabled and reads the CSV files
+        while it runs. Takes the kwargs of SIPp.helper_run_a_sipp.
+        SIPp writes the -trace_rtt file into its working directory, so it is
+        run in output_dir with the file paths made absolute.
+    '''
+    path_kwargs = ('scenario_file', 'injection_file', 'logfile_path')
+
+    def __init__(self, output_dir=None, poll_interval_s=0.5, on_stat=None, on_response_time=None):
+        self.output_dir = output_dir
+        self.poll_interval_s = poll_interval_s
+        self.on_stat = on_stat
+        self.on_response_time = on_response_time
+
+    def start(self, stat_frequency_s=1, rtt_frequency=1, **kwargs):
+        ''' Starts SIPp; poll() then reads its statistics until finish().
+        '''
+        self._created_dir = self.output_dir is None
+        if self._created_dir:
+            self.output_dir = tempfile.mkdtemp(prefix='sipp_load_')
+        for name in self.path_kwargs:
+            if kwargs.get(name):
+                kwargs[name] = os.path.abspath(kwargs[name])
+        kwargs['stat_file'] = os.path.join(os.path.abspath(self.output_dir), 'stat.csv')
+        kwargs['error_file'] = os.path.join(os.path.abspath(self.output_dir), 'errors.log')
+        kwargs['trace_rtt'] = True
+        self._log_pipe = SIPp.helper_open_log_pipe(kwargs)
+        try:
+            self._runnable, self._command = SIPp.helper_create_command(stat_frequency_s=stat_frequency_s,
+                                                                       rtt_frequency=rtt_frequency, **kwargs)
+            self.proc = subprocess.Popen(self._runnable, cwd=self.output_dir,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except BaseException:
+            if self._log_pipe:
+                self._log_pipe.close()
+            raise
+
+        self.error_file = kwargs['error_file']
+        self.stats = []
+        self.response_times = {}
+        self._stat_follower = CsvFollower(kwargs['stat_file'])
+        self._rtt_followers = {}
+        return self.proc
+
+    def poll(self):
+        ''' Reads the statistics written since the last poll and returns the
+            new stat rows and (rtd, milliseconds) response times.
+        '''
+        rows = self._stat_follower.poll()
+        for row in rows:
+            self.stats.append(row)
+            if self.on_stat:
+                self.on_stat(row)
+
+        for path in glob.glob(os.path.join(self.output_dir, '*_rtt.csv')):
+            if path not in self._rtt_followers:
+                self._rtt_followers[path] = CsvFollower(path)
+        samples = []
+        for follower in self._rtt_followers.values():
+            for row in follower.poll():
+                rtd = row.get('rtd_no', row.get('rtd_name', '1'))
+                value = float(row.get('response_time_ms', 0))
+                self.response_times.setdefault(rtd, []).append(value)
+                samples.append((rtd, value))
+                if self.on_response_time:
+                    self.on_response_time(rtd, value)
+        return rows, samples
+
+    def finish(self):
+        ''' Waits for SIPp to end, reads the rest of its statistics and returns the LoadResult.
+        '''
+        try:
+            while True:
+                finished = self.proc.poll() is not None
+                self.poll()
+                if finished:
+                    break
+                time.sleep(self.poll_interval_s)
+        finally:
+            if self.proc.poll() is None:
+                self.proc.kill()
+                self.proc.wait()
+            self._stat_follower.close()
+            for follower in self._rtt_followers.values():
+                follower.close()
+            if self._log_pipe:
+                self._log_pipe.close()
+
+        errors = []
+        if os.path.isfile(self.error_file):
+            with open(self.error_file, errors='replace') as f:
+                errors = [line.rstrip('\n') for line in f if line.strip()]
+        if self._created_dir:
+            shutil.rmtree(self.output_dir)
+            self.output_dir = None
+
+        return LoadResult(subprocess.CompletedProcess(self._runnable, self.proc.returncode),
+                          " ".join(self._command), self.stats, self.response_times, errors)
+
+    def run(self, **kwargs):
+        self.start(**kwargs)
+        return self.finish()
@@ -0,0 +1,571 @@
+#!/usr/bin/python3
+''' SIPp -trace_msg message logs: SIPpMessage and its headers and SDP body,
+    and the readers that turn a log into messages.
+'''
+import io
+import mmap
+import os
+import re
+from datetime import datetime
+
+class SIPHeaders():
+    ''' Case-insensitive multi-dict of SIP headers in message order.
+        Compact header forms (RFC 3261 7.3.3) are stored under their long name.
+    '''
+    compact_forms = {'i': 'call-id', 'm': 'contact', 'e': 'content-encoding',
+                     'l': 'content-length', 'c': 'content-type', 'f': 'from',
+                     's': 'subject', 'k': 'supported', 't': 'to', 'v': 'via'}
+
+    __slots__ = ('_items', '_index')
+
+    def __init__(self):
+        self._items = []
+        self._index = {}
+
+    @staticmethod
+    def canonicalName(header_name):
+        key = header_name.strip().lower()
+        return SIPHeaders.compact_forms.get(key, key)
+
+    def add(self, header_name, value):
+        self._items.append((header_name, value))
+        self._index.setdefault(SIPHeaders.canonicalName(header_name), []).append(value)
+
+    def getValues(self, header_name):
+        return list(self._index.get(SIPHeaders.canonicalName(header_name), ()))
+
+    def getFirst(self, header_name, default=None):
+        values = self._index.get(SIPHeaders.canonicalName(header_name))
+        if values:
+            return values[0]
+        return default
+
+    def __contains__(self, header_name):
+        return SIPHeaders.canonicalName(header_name) in self._index
+
+    def __getitem__(self, header_name):
+        values = self._index.get(SIPHeaders.canonicalName(header_name))
+        if not values:
+            raise KeyError(header_name)
+        return values[0]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+class SDPMedia():
+    ''' One m= section of an SDP body.
+        rtpmap and fmtp map a payload format to its a=rtpmap / a=fmtp value;
+        connection is the c= address of the section or of the session.
+    '''
+    __slots__ = ('media', 'port', 'port_count', 'proto', 'formats', 'connection', 'attributes', 'rtpmap', 'fmtp')
+
+    def __init__(self, media, port, port_count, proto, formats, connection=None):
+        self.media = media
+        self.port = port
+        self.port_count = port_count
+        self.proto = proto
+        self.formats = formats
+        self.connection = connection
+        self.attributes = []
+        self.rtpmap = {}
+        self.fmtp = {}
+
+    def getAttribute(self, name, default=None):
+        for attribute_name, value in self.attributes:
+            if attribute_name == name:
+                return value
+        return default
+
+    def getCodecs(self):
+        ''' Encoding names ('PCMU/8000') of the formats in offer order.
+        '''
+        return [self.rtpmap.get(fmt) or SDPSession.static_payload_types.get(fmt, fmt) for fmt in self.formats]
+
+    def getDirection(self):
+        for attribute_name, value in self.attributes:
+            if attribute_name in SDPSession.directions:
+                return attribute_name
+        return None
+
+class SDPSession():
+    ''' Session description of a message body (RFC 4566).
+        Fields are kept as their text; media holds the m= sections in order.
+    '''
+    __slots__ = ('version', 'origin', 'session_name', 'connection', 'timing', 'attributes', 'media')
+
+    # RTP/AVP payload types with a static encoding (RFC 3551)
+    static_payload_types = {'0': 'PCMU/8000', '3': 'GSM/8000', '4': 'G723/8000', '8': 'PCMA/8000',
+                            '9': 'G722/8000', '13': 'CN/8000', '18': 'G729/8000'}
+    directions = ('sendrecv', 'sendonly', 'recvonly', 'inactive')
+
+    def __init__(self):
+        self.version = None
+        self.origin = None
+        self.session_name = None
+        self.connection = None
+        self.timing = None
+        self.attributes = []
+        self.media = []
+
+    @staticmethod
+    def parse(body):
+        sdp = SDPSession()
+        media = None
+        for line in body.split('\n'):
+            line = line.strip()
+            if len(line) < 2 or line[1] != '=':
+                continue
+            kind, value = line[0], line[2:]
+            if kind == 'm':
+                fields = value.split()
+                if len(fields) < 3:
+                    continue
+                port, _, port_count = fields[1].partition('/')
+                media = SDPMedia(fields[0], int(port) if port.isdigit() else None,
+                                 int(port_count) if port_count.isdigit() else 1,
+                                 fields[2], fields[3:], sdp.connection)
+                sdp.media.append(media)
+            elif kind == 'c':
+                # c=IN IP4 192.0.2.1
+                address = value.split()[-1] if value.split() else None
+                if media is None:
+                    sdp.connection = address
+                else:
+                    media.connection = address
+            elif kind == 'a':
+                name, _, attribute_value = value.partition(':')
+                if media is None:
+                    sdp.attributes.append((name, attribute_value))
+                    continue
+                media.attributes.append((name, attribute_value))
+                if name in ('rtpmap', 'fmtp'):
+                    fmt, _, parameters = attribute_value.partition(' ')
+                    getattr(media, name)[fmt] = parameters.strip()
+            elif media is None:
+                if kind == 'v':
+                    sdp.version = value
+                elif kind == 'o':
+                    sdp.origin = value
+                elif kind == 's':
+                    sdp.session_name = value
+                elif kind == 't':
+                    sdp.timing = value
+        return sdp
+
+    def getMedia(self, media='audio'):
+        for section in self.media:
+            if section.media == media:
+                return section
+        return None
+
+    def getDirection(self):
+        for name, value in self.attributes:
+            if name in self.directions:
+                return name
+        return 'sendrecv'
+
+class SIPpMessage():
+    # a message is either its decoded text (_message) or a slice of a byte buffer
+    # (_buffer[_offset:_offset + length]) that is decoded on first access.
+    # _parsed caches (start line fields, SIPHeaders, body offset) once built,
+    # _sdp the SDPSession of the body (False when the body is not SDP).
+    __slots__ = ('_message', '_buffer', '_offset', '_parsed', '_sdp',
+                 'datetime', 'direction', 'protocol', 'length')
+
+    re_blank_line=re.compile(r'\n[ \t\r]*(?:\n|$)')
+
+    def __init__(self):
+        self._message = ''
+        self._buffer = None
+        self._offset = 0
+        self._parsed = None
+        self._sdp = None
+        self.datetime = None
+        self.direction = None
+        self.protocol = None
+        self.length = 0
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = self.getRawMessage().decode('utf-8', errors='replace')
+        return self._message
+
+    @message.setter
+    def message(self, value):
+        self._message = value
+        self._buffer = None
+        self._offset = 0
+        self._parsed = None
+        self._sdp = None
+
+    def setBuffer(self, buffer, offset=0):
+        self._message = None
+        self._buffer = buffer
+        self._offset = offset
+        self._parsed = None
+        self._sdp = None
+
+    def getOffset(self):
+        return self._offset
+
+    def getRawMessage(self):
+        if self._buffer is None:
+            return self.message.encode('utf-8')
+        return bytes(self._buffer[self._offset:self._offset + self.length])
+
+    def _parse(self):
+        if self._parsed is not None:
+            return self._parsed
+
+        message = self.message
+        match_blank = self.re_blank_line.search(message)
+        if match_blank:
+            head = message[:match_blank.start()]
+            body_offset = match_blank.end()
+        else:
+            head = message
+            body_offset = len(message)
+
+        lines = head.split('\n')
+        start_line = lines[0].strip().split(' ')
+        headers = SIPHeaders()
+        header_name = None
+        value = ''
+        for line in lines[1:]:
+            # folded line continues the previous header value
+            if header_name is not None and line[:1] in (' ', '\t'):
+                value += line.strip()
+                continue
+            if header_name is not None:
+                headers.add(header_name, value)
+            kv = line.split(':', 1)
+            kv.append('')
+            header_name = kv[0].strip()
+            value = kv[1].strip()
+        if header_name is not None:
+            headers.add(header_name, value)
+
+        self._parsed = (start_line, headers, body_offset)
+        return self._parsed
+
+    def getStartLine(self):
+        return " ".join(self._parse()[0])
+
+    def getHeaders(self):
+        return self._parse()[1]
+
+    def getBody(self):
+        return self.message[self._parse()[2]:]
+
+    def getSDP(self):
+        ''' The parsed SDP body, or None when the body is not SDP.
+        '''
+        if self._sdp is None:
+            self._sdp = False
+            body = self.getBody()
+            content_type = self.getHeaders().getFirst('Content-Type', '').split(';')[0].strip().lower()
+            if body.strip() and (content_type == 'application/sdp'
+                                 or not content_type and body.lstrip().startswith('v=')):
+                self._sdp = SDPSession.parse(body)
+        return self._sdp or None
+
+    def getStatusCode(self):
+        start_line = self._parse()[0]
+        try:
+            return int(start_line[1])
+        except (ValueError, IndexError):
+            pass
+        return None
+
+    def getStatusPhrease(self):
+        return " ".join(self._parse()[0][2:])
+
+    def getMethod(self):
+        return self._parse()[0][0]
+
+    def getRequstURI(self):
+        return self._parse()[0][1]
+
+    def getHeaderValues(self, header_name):
+        return self._parse()[1].getValues(header_name)
+
+    def toLogEntry(self):
+        ''' Formats the message the way SIPp writes it with -trace_msg.
+        '''
+        raw = self.getRawMessage()
+        if self.direction == 'sent':
+            head = '{} message sent ({} bytes):'.format(self.protocol, len(raw))
+        else:
+            head = '{} message received [{}] bytes :'.format(self.protocol, len(raw))
+        return ('----------------------------------------------- {}\n{}\n\n'.format(
+                    self.datetime.isoformat(' ', 'microseconds'), head).encode('utf-8')
+                + raw + b'\n\n')
+
+    def __str__(self):
+        msg=''
+        arrow = '<'
+        if self.direction == 'sent':
+            arrow = '>'
+        msg += '-- {}\n'.format(self.datetime)
+        for line in self.message.split('\n'):
+            msg+='{} {}\n'.format(arrow, line)
+        return msg
+
+    # leading bytes of the compressed formats a log can be archived in
+    log_magics = [(b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'), (b'\x28\xb5\x2f\xfd', 'zstd')]
+    # leading bytes of pcap (both byte orders, micro- and nanoseconds) and pcapng captures
+    capture_magics = (b'\xd4\xc3\xb2\xa1', b'\xa1\xb2\xc3\xd4', b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d', b'\x0a\x0d\x0d\x0a')
+
+    @staticmethod
+    def detectLogCompression(head):
+        for magic, compression in SIPpMessage.log_magics:
+            if head.startswith(magic):
+                return compression
+        return None
+
+    @staticmethod
+    def openLogfile(filepath, chunk_size=1024 * 1024):
+        ''' Opens a message log for reading bytes. filepath is a path or a binary
+            file-like object; gzip, bz2, xz and zstd logs are decompressed as they
+            are read. zstd needs the zstandard package.
+        '''
+        if hasattr(filepath, 'read'):
+            f = filepath
+            if not hasattr(f, 'peek'):
+                f = io.BufferedReader(_SIPpRawReader(f), buffer_size=chunk_size)
+            compression = SIPpMessage.detectLogCompression(f.peek(6)[:6])
+        else:
+            f = open(filepath, 'rb', buffering=chunk_size)
+            compression = SIPpMessage.detectLogCompression(f.peek(6)[:6])
+            if compression in ('gzip', 'bz2', 'xz'):
+                # reopened by name so that closing the decompressor closes the file
+                f.close()
+                f = filepath
+        # the decompressors are only imported when a log needs them
+        if compression == 'gzip':
+            import gzip
+            return gzip.open(f, 'rb')
+        if compression == 'bz2':
+            import bz2
+            return bz2.open(f, 'rb')
+        if compression == 'xz':
+            import lzma
+            return lzma.open(f, 'rb')
+        if compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                if f is not filepath:
+                    f.close()
+                raise ValueError('reading a zstd compressed log needs the zstandard package')
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f), buffer_size=chunk_size)
+        return f
+
+    @staticmethod
+    def iterMessagesFromLogfile(filepath, chunk_size=1024 * 1024, local_addresses=()):
+        ''' Yields the messages of a -trace_msg log or of a pcap/pcapng capture.
+            The direction of a captured message is relative to local_addresses.
+        '''
+        parser = SIPpMessageParser()
+        # read the log as bytes in chunk_size blocks so memory does not grow with the file
+        f = SIPpMessage.openLogfile(filepath, chunk_size)
+        try:
+            if f.peek(4)[:4] in SIPpMessage.capture_magics:
+                from .pcap import iterMessagesFromCapture
+                yield from iterMessagesFromCapture(f, local_addresses)
+                return
+            for line in f:
+                msg = parser.feedLine(line)
+                if msg is not None:
+                    yield msg
+        finally:
+            # a file object given by the caller is left open
+            if f is not filepath:
+                f.close()
+
+        # the log ended before the last message was complete (e.g. SIPp is still writing)
+        msg = parser.flush()
+        if msg is not None:
+            yield msg
+
+    @staticmethod
+    def isCompressedLogfile(filepath):
+        with open(filepath, 'rb') as f:
+            return SIPpMessage.detectLogCompression(f.read(6)) is not None
+
+    @staticmethod
+    def parseMessagesFromLogfile(filepath, processes=None, local_addresses=()):
+        if processes and not hasattr(filepath, 'read'):
+            with open(filepath, 'rb') as f:
+                head = f.read(6)
+            # compressed logs and captures can not be split at byte offsets
+            if SIPpMessage.detectLogCompression(head) is None and head[:4] not in SIPpMessage.capture_magics:
+                # parse byte ranges of the log in a process pool
+                from .shard import parseMessagesInShards
+                return parseMessagesInShards(filepath, processes=processes)
+        return list(SIPpMessage.iterMessagesFromLogfile(filepath, local_addresses=local_addresses))
+
+    @staticmethod
+    def messagesFilter(messages, direction=None, method=None, status_code=None):
+        newmessages=[]
+        for msg in messages:
+            # every given criterion has to match
+            if direction != None and msg.direction != direction:
+                continue
+            if method != None and msg.getMethod() != method:
+                continue
+            if status_code != None and msg.getStatusCode() != status_code:
+                continue
+            newmessages.append(msg)
+        return newmessages
+
+class _SIPpRawReader(io.RawIOBase):
+    # lets an object with only read() be buffered, so its first bytes can be peeked
+    def __init__(self, f):
+        self._f = f
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._f.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+class SIPpMessageParser():
+    ''' Incremental -trace_msg parser fed one log line (bytes) at a time.
+        feedLine returns a SIPpMessage as soon as it is complete.
+    '''
+    #'----------------------------------------------- 2019-06-29 19:42:16.839845'
+    re_delim_and_timestamp=re.compile(rb'^-[-]+ ([\d]{4}-[\d]{2}-[\d]{2}) '
+                                       rb'([\d]{2}:[\d]{2}:[\d]{2}\.[\d]{6})')
+    #'UDP message sent (442 bytes):'
+    re_message_protocol=re.compile(rb'^(UDP|TCP|SCTP) message (sent|received) '
+                                    rb'[^\d]*([\d]+)[^\d]*bytes')
+
+    def __init__(self):
+        self._pointer = None
+        self._parts = []
+        self._remaining = 0
+
+    def feedLine(self, line):
+        pointer = self._pointer
+        # inside a message body: the byte length from the protocol line
+        # tells where it ends, but a delimiter line always starts the next
+        # entry, so a wrong count can not swallow the messages after it
+        if self._remaining > 0 and not (line[:1] == b'-' and self.re_delim_and_timestamp.match(line)):
+            if not self._parts:
+                # skip blank lines between the protocol line and the message
+                line = line.lstrip()
+                if not line:
+                    return None
+            self._parts.append(line)
+            self._remaining -= len(line)
+            if self._remaining <= 0:
+                return self.flush()
+            return None
+
+        if line[:1] == b'-':
+            match_deli = self.re_delim_and_timestamp.match(line)
+            if match_deli:
+                previous = self.flush()
+                pointer = SIPpMessage()
+                pointer.datetime = datetime.fromisoformat('{} {}'.format(
+                    match_deli.group(1).decode('ascii'), match_deli.group(2).decode('ascii')))
+                self._pointer = pointer
+                return previous
+
+        if pointer is not None and pointer.protocol is None:
+            match_prot = self.re_message_protocol.match(line)
+            if match_prot:
+                pointer.protocol = match_prot.group(1).decode('ascii')
+                pointer.direction = match_prot.group(2).decode('ascii')
+                pointer.length = int(match_prot.group(3))
+                self._remaining = pointer.length
+        return None
+
+    def flush(self):
+        ''' Returns the message being parsed, complete or not, and resets the parser.
+        '''
+        pointer = self._pointer
+        if pointer is not None:
+            pointer.setBuffer(b''.join(self._parts)[:pointer.length])
+        self._pointer = None
+        self._parts = []
+        self._remaining = 0
+        return pointer
+
+class SIPpMessageStore():
+    ''' Messages of a -trace_msg log kept as offsets into a read-only memory map.
+        Message text is decoded from the map only when a message is looked at,
+        so the store must stay open while its messages are in use.
+    '''
+    #'----------------------------------------------- 2019-06-29 19:42:16.839845'
+    #'UDP message sent (442 bytes):'
+    re_message_head=re.compile(rb'^-[-]+ ([\d]{4}-[\d]{2}-[\d]{2}) '
+                               rb'([\d]{2}:[\d]{2}:[\d]{2}\.[\d]{6})[^\n]*\n'
+                               rb'(UDP|TCP|SCTP) message (sent|received) '
+                               rb'[^\d\n]*([\d]+)[^\d\n]*bytes[^\n]*\n', re.MULTILINE)
+    re_message_start=re.compile(rb'\S')
+    re_delim_line=re.compile(rb'^-[-]+ [\d]{4}-[\d]{2}-[\d]{2} [\d]{2}:[\d]{2}:[\d]{2}\.[\d]{6}', re.MULTILINE)
+
+    def __init__(self, filepath):
+        self._file = open(filepath, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # an empty file can not be mapped
+            self._mmap = b''
+        self.messages = list(self._scan())
+
+    def _scan(self):
+        buffer = self._mmap
+        size = len(buffer)
+        pos = 0
+        while True:
+            match_head = self.re_message_head.search(buffer, pos)
+            if not match_head:
+                return
+            obj = SIPpMessage()
+            obj.datetime = datetime.fromisoformat('{} {}'.format(
+                match_head.group(1).decode('ascii'), match_head.group(2).decode('ascii')))
+            obj.protocol = match_head.group(3).decode('ascii')
+            obj.direction = match_head.group(4).decode('ascii')
+            obj.length = int(match_head.group(5))
+
+            # skip blank lines between the protocol line and the message
+            match_start = self.re_message_start.search(buffer, match_head.end())
+            start = match_start.start() if match_start else size
+            obj.length = min(obj.length, size - start)
+            # a count that is too large ends at the next delimiter line
+            match_deli = self.re_delim_line.search(buffer, start, start + obj.length)
+            if match_deli:
+                obj.length = match_deli.start() - start
+            obj.setBuffer(buffer, start)
+            yield obj
+            # jump over the message body without scanning it
+            pos = start + obj.length
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
@@ -0,0 +1,390 @@
+#!/usr/bin/python3
+''' SIP messages out of pcap and pcapng captures.
+'''
+import re
+import socket
+import struct
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from .parser import SIPpMessage
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 10 ** 6), b'\xa1\xb2\xc3\xd4': ('>', 10 ** 6),
+    b'\x4d\x3c\xb2\xa1': ('<', 10 ** 9), b'\xa1\xb2\x3c\x4d': ('>', 10 ** 9),
+}
+PCAPNG_MAGIC = b'\x0a\x0d\x0d\x0a'
+
+def isCapture(head):
+    return head[:4] in SIPpMessage.capture_magics
+
+def isCaptureFile(filepath):
+    with open(filepath, 'rb') as f:
+        return isCapture(f.read(4))
+
+class PcapReader():
+    ''' Streams (datetime, linktype, frame) out of a pcap or pcapng capture.
+        Only one record is held in memory at a time.
+    '''
+    def __init__(self, f):
+        self._f = f
+
+    def _read(self, size):
+        data = self._f.read(size)
+        while len(data) < size:
+            more = self._f.read(size - len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    def __iter__(self):
+        magic = self._read(4)
+        if magic == PCAPNG_MAGIC:
+            return self._iterPcapng(magic)
+        if magic in PCAP_MAGICS:
+            return self._iterPcap(magic)
+        raise ValueError('not a pcap or pcapng capture')
+
+    @staticmethod
+    def _datetime(seconds, fraction, units):
+        return datetime.fromtimestamp(seconds) + timedelta(microseconds=fraction * 10 ** 6 // units)
+
+    def _iterPcap(self, magic):
+        endian, units = PCAP_MAGICS[magic]
+        header = self._read(20)
+        linktype = struct.unpack(endian + 'HHiIII', header)[5] & 0x0fffffff
+        while True:
+            record = self._read(16)
+            if len(record) < 16:
+                return
+            seconds, fraction, captured, original = struct.unpack(endian + 'IIII', record)
+            frame = self._read(captured)
+            if len(frame) < captured:
+                return
+            yield self._datetime(seconds, fraction, units), linktype, frame
+
+    def _iterPcapng(self, magic):
+        endian = '<'
+        # interface id -> (linktype, timestamp units per second)
+        interfaces = []
+        block_type = magic
+        while True:
+            head = self._read(8) if block_type is None else block_type + self._read(4)
+            block_type = None
+            if len(head) < 8:
+                return
+            if head[:4] == PCAPNG_MAGIC:
+                # a section header sets the byte order of the blocks after it
+                byte_order = self._read(4)
+                endian = '<' if byte_order == b'\x4d\x3c\x2b\x1a' else '>'
+                length = struct.unpack(endian + 'I', head[4:8])[0]
+                self._read(length - 12)
+                interfaces = []
+                continue
+            kind, length = struct.unpack(endian + 'II', head)
+            body = self._read(length - 8)
+            if len(body) < length - 8:
+                return
+            if kind == 1:
+                linktype = struct.unpack(endian + 'H', body[:2])[0]
+                interfaces.append((linktype, self._tsresol(body[8:-4], endian)))
+            elif kind == 6:
+                interface, high, low, captured, original = struct.unpack(endian + 'IIIII', body[:20])
+                if interface < len(interfaces):
+                    linktype, units = interfaces[interface]
+                    timestamp = (high << 32) | low
+                    yield (self._datetime(timestamp // units, timestamp % units, units), linktype,
+                           body[20:20 + captured])
+            elif kind == 3 and interfaces:
+                original = struct.unpack(endian + 'I', body[:4])[0]
+                # a simple packet block has no timestamp
+                yield None, interfaces[0][0], body[4:4 + original]
+
+    @staticmethod
+    def _tsresol(options, endian):
+        pos = 0
+        while pos + 4 <= len(options):
+            code, length = struct.unpack(endian + 'HH', options[pos:pos + 4])
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                value = options[pos + 4]
+                return 2 ** (value & 0x7f) if value & 0x80 else 10 ** value
+            pos += 4 + (length + 3) // 4 * 4
+        return 10 ** 6
+
+class TcpStream():
+    ''' In-order byte stream of one TCP direction, cut into SIP messages.
+    '''
+    __slots__ = ('next_seq', 'buffer', 'pending', 'pending_bytes', 'synced')
+
+    def __init__(self, next_seq, synced):
+        self.next_seq = next_seq
+        self.buffer = bytearray()
+        # seq -> data of segments that arrived before a gap was filled
+        self.pending = {}
+        self.pending_bytes = 0
+        # False until the stream is known to start at a message boundary
+        self.synced = synced
+
+class SIPPacketDecoder():
+    ''' Turns captured frames into SIPpMessage objects.
+        IPv4 and IPv6 fragments are reassembled, TCP segments are put in
+        order per direction and cut at Content-Length. Pending fragments and
+        out-of-order segments are bounded, so memory does not grow with
+        the capture. A message is dated by the frame that completed it.
+        direction is 'sent' when the source matches local_addresses
+        ('192.0.2.1', '192.0.2.1:5060' or '[2001:db8::1]:5060'), 'received'
+        when the destination does, otherwise None.
+    '''
+    re_start_line = re.compile(rb'(?:[A-Z]+ \S+ SIP/2\.0|SIP/2\.0 \d{3}[ \r\n])')
+    re_message_start = re.compile(rb'(?m)^(?:[A-Z]+ \S+ SIP/2\.0|SIP/2\.0 \d{3}[ \r\n])')
+    re_header_end = re.compile(rb'\r?\n\r?\n')
+    re_content_length = re.compile(rb'(?im)^(?:content-length|l)[ \t]*:[ \t]*(\d+)')
+
+    def __init__(self, local_addresses=(), sip_ports=None, max_fragments=1024, max_pending_bytes=1024 * 1024):
+        self.local_addresses = set(local_addresses)
+        self.sip_ports = set(sip_ports) if sip_ports else None
+        self.max_fragments = max_fragments
+        self.max_pending_bytes = max_pending_bytes
+        # (version, src, dst, id, protocol) -> [protocol, total length, {offset: data}]
+        self._fragments = OrderedDict()
+        # (src, sport, dst, dport) -> TcpStream
+        self._streams = {}
+
+    def decode(self, timestamp, linktype, frame):
+        ''' Returns the messages completed by one captured frame.
+        '''
+        packet = self._linkPayload(linktype, frame)
+        if packet is None or not packet:
+            return []
+        version = packet[0] >> 4
+        if version == 4:
+            decoded = self._ipv4(packet)
+        elif version == 6:
+            decoded = self._ipv6(packet)
+        else:
+            return []
+        if decoded is None:
+            return []
+        protocol, src, dst, payload = decoded
+        if protocol == 17 and len(payload) >= 8:
+            sport, dport = struct.unpack('!HH', payload[:4])
+            if not self._isSipPort(sport, dport) or not self.re_start_line.match(payload, 8):
+                return []
+            return [self._message(timestamp, 'UDP', src, sport, dst, dport, payload[8:])]
+        if protocol == 6 and len(payload) >= 20:
+            return self._tcp(timestamp, src, dst, payload)
+        return []
+
+    def _isSipPort(self, sport, dport):
+        return self.sip_ports is None or sport in self.sip_ports or dport in self.sip_ports
+
+    @staticmethod
+    def _linkPayload(linktype, frame):
+        if linktype == LINKTYPE_ETHERNET:
+            ethertype = struct.unpack('!H', frame[12:14])[0] if len(frame) >= 14 else None
+            pos = 14
+            # 802.1Q and 802.1ad VLAN tags
+            while ethertype in (0x8100, 0x88a8) and len(frame) >= pos + 4:
+                ethertype = struct.unpack('!H', frame[pos + 2:pos + 4])[0]
+                pos += 4
+            return frame[pos:] if ethertype in (0x0800, 0x86dd) else None
+        if linktype == LINKTYPE_RAW:
+            return frame
+        if linktype == LINKTYPE_LINUX_SLL:
+            return frame[16:] if frame[14:16] in (b'\x08\x00', b'\x86\xdd') else None
+        if linktype == LINKTYPE_LINUX_SLL2:
+            return frame[20:] if frame[0:2] in (b'\x08\x00', b'\x86\xdd') else None
+        if linktype == LINKTYPE_NULL:
+            return frame[4:]
+        return None
+
+    def _ipv4(self, packet):
+        header_length = (packet[0] & 0x0f) * 4
+        total_length, identification, flags_offset, _, protocol = struct.unpack('!HHHBB', packet[2:10])
+        src = socket.inet_ntop(socket.AF_INET, packet[12:16])
+        dst = socket.inet_ntop(socket.AF_INET, packet[16:20])
+        payload = packet[header_length:total_length or len(packet)]
+        more_fragments = flags_offset & 0x2000
+        offset = (flags_offset & 0x1fff) * 8
+        if more_fragments or offset:
+            payload = self._reassemble((4, src, dst, identification, protocol), protocol,
+                                       offset, payload, more_fragments)
+            if payload is None:
+                return None
+        return protocol, src, dst, payload
+
+    def _ipv6(self, packet):
+        next_header = packet[6]
+        src = socket.inet_ntop(socket.AF_INET6, packet[8:24])
+        dst = socket.inet_ntop(socket.AF_INET6, packet[24:40])
+        payload_length = struct.unpack('!H', packet[4:6])[0]
+        payload = packet[40:40 + payload_length] if payload_length else packet[40:]
+        # skip extension headers: hop-by-hop, routing, destination options and fragment
+        while next_header in (0, 43, 44, 60) and len(payload) >= 8:
+            if next_header == 44:
+                offset_flags, identification = struct.unpack('!HI', payload[2:8])
+                protocol = payload[0]
+                payload = self._reassemble((6, src, dst, identification, None), protocol,
+                                           offset_flags & 0xfff8, payload[8:], offset_flags & 1)
+                if payload is None:
+                    return None
+                next_header = protocol
+                continue
+            length = (payload[1] + 1) * 8
+            next_header = payload[0]
+            payload = payload[length:]
+        return next_header, src, dst, payload
+
+    def _reassemble(self, key, protocol, offset, data, more_fragments):
+        entry = self._fragments.get(key)
+        if entry is None:
+            entry = self._fragments[key] = [protocol, None, {}]
+            while len(self._fragments) > self.max_fragments:
+                # the oldest datagram lost a fragment
+                self._fragments.popitem(last=False)
+        if offset == 0:
+            entry[0] = protocol
+        entry[2][offset] = data
+        if not more_fragments:
+            entry[1] = offset + len(data)
+        if entry[1] is None:
+            return None
+        position = 0
+        parts = []
+        for fragment_offset in sorted(entry[2]):
+            if fragment_offset > position:
+                return None
+            parts.append(entry[2][fragment_offset][position - fragment_offset:])
+            position = max(position, fragment_offset + len(entry[2][fragment_offset]))
+        if position < entry[1]:
+            return None
+        del self._fragments[key]
+        return b''.join(parts)[:entry[1]]
+
+    def _tcp(self, timestamp, src, dst, segment):
+        sport, dport, seq = struct.unpack('!HHI', segment[:8])
+        if not self._isSipPort(sport, dport):
+            return []
+        data_offset = (segment[12] >> 4) * 4
+        flags = segment[13]
+        data = segment[data_offset:]
+        key = (src, sport, dst, dport)
+        stream = self._streams.get(key)
+        if flags & 0x02:
+            # SYN: the data starts one after its sequence number
+            stream = self._streams[key] = TcpStream((seq + 1) & 0xffffffff, True)
+        elif stream is None:
+            # the capture started in the middle of the connection
+            stream = self._streams[key] = TcpStream(seq, False)
+
+        if data:
+            self._addSegment(stream, seq, data)
+        messages = [self._message(timestamp, 'TCP', src, sport, dst, dport, payload)
+                    for payload in self._cutMessages(stream)]
+        if flags & 0x05:
+            # FIN or RST
+            del self._streams[key]
+        return messages
+
+    def _addSegment(self, stream, seq, data):
+        distance = (seq - stream.next_seq) & 0xffffffff
+        if distance >= 0x80000000:
+            # a retransmission, keep only the part not seen yet
+            overlap = (stream.next_seq - seq) & 0xffffffff
+            if overlap >= len(data):
+                return
+            data = data[overlap:]
+            distance = 0
+        if distance:
+            if seq not in stream.pending:
+                stream.pending[seq] = data
+                stream.pending_bytes += len(data)
+            if stream.pending_bytes > self.max_pending_bytes:
+                # the missing segment was not captured: continue after the gap
+                stream.next_seq = min(stream.pending, key=lambda pending: (pending - stream.next_seq) & 0xffffffff)
+                stream.buffer.clear()
+                stream.synced = False
+            else:
+                return
+        else:
+            stream.buffer += data
+            stream.next_seq = (stream.next_seq + len(data)) & 0xffffffff
+        while stream.next_seq in stream.pending:
+            data = stream.pending.pop(stream.next_seq)
+            stream.pending_bytes -= len(data)
+            stream.buffer += data
+            stream.next_seq = (stream.next_seq + len(data)) & 0xffffffff
+
+    def _cutMessages(self, stream):
+        buffer = stream.buffer
+        messages = []
+        while buffer:
+            if not stream.synced:
+                match = self.re_message_start.search(buffer)
+                if match is None:
+                    # keep a possible partial start line
+                    del buffer[:max(0, len(buffer) - 64)]
+                    break
+                del buffer[:match.start()]
+                stream.synced = True
+            # keep-alive CRLFs between messages
+            stripped = len(buffer) - len(buffer.lstrip(b'\r\n'))
+            if stripped:
+                del buffer[:stripped]
+                continue
+            header_end = self.re_header_end.search(buffer)
+            if header_end is None:
+                break
+            content_length = self.re_content_length.search(buffer, 0, header_end.start())
+            end = header_end.end() + (int(content_length.group(1)) if content_length else 0)
+            if len(buffer) < end:
+                break
+            messages.append(bytes(buffer[:end]))
+            del buffer[:end]
+        return messages
+
+    def _direction(self, src, sport, dst, dport):
+        if not self.local_addresses:
+            return None
+        for address, port, direction in ((src, sport, 'sent'), (dst, dport, 'received')):
+            endpoint = '[{}]:{}'.format(address, port) if ':' in address else '{}:{}'.format(address, port)
+            if address in self.local_addresses or endpoint in self.local_addresses:
+                return direction
+        return None
+
+    def _message(self, timestamp, protocol, src, sport, dst, dport, payload):
+        msg = SIPpMessage()
+        msg.datetime = timestamp
+        msg.protocol = protocol
+        msg.direction = self._direction(src, sport, dst, dport)
+        msg.length = len(payload)
+        msg.setBuffer(bytes(payload))
+        return msg
+
+def iterMessagesFromCapture(f, local_addresses=(), sip_ports=None):
+    decoder = SIPPacketDecoder(local_addresses, sip_ports)
+    for timestamp, linktype, frame in PcapReader(f):
+        yield from decoder.decode(timestamp, linktype, frame)
+
+def iterMessagesFromPcap(filepath, local_addresses=(), sip_ports=None):
+    ''' Streams the SIP messages of a pcap or pcapng capture (a path or a
+        binary file-like object, compressed or not) as SIPpMessage objects.
+    '''
+    f = SIPpMessage.openLogfile(filepath)
+    try:
+        yield from iterMessagesFromCapture(f, local_addresses, sip_ports)
+    finally:
+        if f is not filepath:
+            f.close()
+
+def parseMessagesFromPcap(filepath, local_addresses=(), sip_ports=None):
+    return list(iterMessagesFromPcap(filepath, local_addresses, sip_ports))
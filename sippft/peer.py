@@ -0,0 +1,368 @@
+#!/usr/bin/python3
+''' An asyncio SIP UAC/UAS that stands in for sipp in tests.
+'''
+import argparse
+import asyncio
+import os
+import re
+import signal
+import socket
+import sys
+from datetime import datetime
+
+from .parser import SIPpMessage
+
+class MessageLogWriter():
+    ''' Writes messages in the -trace_msg format of SIPp, so that the log can
+        be read with SIPpMessage.parseMessagesFromLogfile.
+    '''
+    def __init__(self, filepath, protocol='UDP', buffer_size=64 * 1024):
+        self.filepath = filepath
+        self.protocol = protocol
+        self._file = open(filepath, 'wb', buffering=buffer_size)
+
+    def write(self, direction, data, timestamp=None):
+        timestamp = timestamp or datetime.now()
+        if direction == 'sent':
+            head = '{} message sent ({} bytes):'.format(self.protocol, len(data))
+        else:
+            head = '{} message received [{}] bytes :'.format(self.protocol, len(data))
+        self._file.write('----------------------------------------------- {}\n{}\n\n'.format(
+                             timestamp.isoformat(' ', 'microseconds'), head).encode('utf-8')
+                         + data + b'\n\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class SIPPeer(asyncio.DatagramProtocol):
+    ''' Minimal SIP UAC and UAS over UDP for tests that must run without SIPp.
+        As UAS it answers INVITE with 180 Ringing and final_code (200 OK with
+        SDP by default) and BYE with 200 OK. As UAC, call() runs the flow of
+        tests/scenarios/uac-uas.xml: INVITE, 180, 200, ACK, pause, BYE, 200.
+        Calling its own address plays both sides like the loopback scenario.
+        Sent and received messages are written to logfile_path like -trace_msg.
+    '''
+    T1_S = 0.5
+    T2_S = 4.0
+    RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, bind_sip_addr='127.0.0.1', bind_sip_port=5062, logfile_path=None,
+                 final_code=200, ringing=True, media_port=6000, transaction_timeout_s=32):
+        self.bind_sip_addr = bind_sip_addr
+        self.bind_sip_port = bind_sip_port
+        self.final_code = final_code
+        self.ringing = ringing
+        self.media_port = media_port
+        self.transaction_timeout_s = transaction_timeout_s
+        self.log = MessageLogWriter(logfile_path) if logfile_path else None
+        self.transport = None
+        self.answered = 0
+        self.ended = 0
+        self._call_number = 0
+        self._branch_number = 0
+        # (Call-ID, CSeq) -> queue of responses to a request sent by the UAC
+        self._transactions = {}
+        # Call-ID -> (to tag, last response to INVITE) of calls answered by the UAS
+        self._dialogs = {}
+        self._ended_event = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(self.bind_sip_addr, self.bind_sip_port))
+        # port 0 asks the system for a free port
+        self.bind_sip_port = self.transport.get_extra_info('sockname')[1]
+        # a burst of calls must not overflow the default socket buffer
+        self.transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                                           self.RECEIVE_BUFFER_BYTES)
+        self._ended_event = asyncio.Event()
+        return self
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, data, addr):
+        if self.log is not None:
+            self.log.write('sent', data)
+        self.transport.sendto(data, addr)
+
+    def datagram_received(self, data, addr):
+        if self.log is not None:
+            self.log.write('received', data)
+        msg = SIPpMessage()
+        msg.message = data.decode('utf-8', errors='replace')
+        if msg.getStatusCode() is not None:
+            key = (msg.getHeaders().getFirst('Call-ID'), msg.getHeaders().getFirst('CSeq'))
+            queue = self._transactions.get(key)
+            if queue is not None:
+                queue.put_nowait(msg)
+        elif msg.getMethod():
+            self.handleRequest(msg, addr)
+
+    @staticmethod
+    def buildMessage(start_line, headers, body=''):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        lines = [start_line] + ['{}: {}'.format(name, value) for name, value in headers]
+        lines.append('Content-Length: {}'.format(len(body)))
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + body
+
+    def buildSdp(self):
+        return ('v=0\r\n'
+                'o=user1 53655765 2353687637 IN IP4 {0}\r\n'
+                's=-\r\n'
+                'c=IN IP4 {0}\r\n'
+                't=0 0\r\n'
+                'm=audio {1} RTP/AVP 0\r\n'
+                'a=rtpmap:0 PCMU/8000\r\n').format(self.bind_sip_addr, self.media_port)
+
+    def buildResponse(self, request, status_code, reason, to_tag=None, body=''):
+        headers = request.getHeaders()
+        to = headers.getFirst('To', '')
+        if to_tag and ';tag=' not in to:
+            to = '{};tag={}'.format(to, to_tag)
+        response = [('Via', via) for via in headers.getValues('Via')]
+        response += [('From', headers.getFirst('From', '')), ('To', to),
+                     ('Call-ID', headers.getFirst('Call-ID', '')), ('CSeq', headers.getFirst('CSeq', '')),
+                     ('Contact', '<sip:{}:{};transport=UDP>'.format(self.bind_sip_addr, self.bind_sip_port))]
+        if body:
+            response.append(('Content-Type', 'application/sdp'))
+        return self.buildMessage('SIP/2.0 {} {}'.format(status_code, reason), response, body)
+
+    def handleRequest(self, request, addr):
+        method = request.getMethod()
+        call_id = request.getHeaders().getFirst('Call-ID')
+        if method == 'INVITE':
+            if call_id in self._dialogs:
+                # a retransmission gets the final response again
+                if self._dialogs[call_id][1] is not None:
+                    self.send(self._dialogs[call_id][1], addr)
+                return
+            to_tag = str(len(self._dialogs) + 1)
+            if self.ringing:
+                self.send(self.buildResponse(request, 180, 'Ringing', to_tag), addr)
+            if self.final_code == 200:
+                final = self.buildResponse(request, 200, 'OK', to_tag, self.buildSdp())
+            else:
+                final = self.buildResponse(request, self.final_code, 'Busy Here' if self.final_code == 486 else 'Error',
+                                           to_tag)
+            self._dialogs[call_id] = (to_tag, final)
+            self.answered += 1
+            self.send(final, addr)
+            # the final response is repeated until the ACK, like timer G
+            asyncio.get_running_loop().call_later(self.T1_S, self._retransmitFinal, call_id, final, addr, self.T1_S)
+        elif method == 'ACK':
+            if call_id in self._dialogs:
+                self._dialogs[call_id] = (self._dialogs[call_id][0], None)
+        else:
+            to_tag = self._dialogs.pop(call_id, (None, None))[0]
+            self.send(self.buildResponse(request, 200, 'OK', to_tag), addr)
+            if method == 'BYE':
+                self.ended += 1
+                self._ended_event.set()
+
+    def _retransmitFinal(self, call_id, final, addr, interval):
+        if self.transport is None or self._dialogs.get(call_id, (None, None))[1] is not final:
+            return
+        if interval > self.T1_S * 32:
+            return
+        self.send(final, addr)
+        asyncio.get_running_loop().call_later(min(interval * 2, self.T2_S), self._retransmitFinal,
+                                              call_id, final, addr, interval * 2)
+
+    async def waitEnded(self, count):
+        ''' Waits until the UAS has received count BYEs.
+        '''
+        while self.ended < count:
+            self._ended_event.clear()
+            await self._ended_event.wait()
+
+    def _nextBranch(self):
+        self._branch_number += 1
+        return 'z9hG4bK-{}-{}'.format(os.getpid(), self._branch_number)
+
+    async def _request(self, message, addr, key):
+        ''' Sends a request, retransmitting it like timer A until the first
+            response, and yields the responses until the final one.
+        '''
+        queue = self._transactions[key] = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.transaction_timeout_s
+        interval = self.T1_S
+        retransmit = True
+        try:
+            self.send(message, addr)
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    return
+                try:
+                    response = await asyncio.wait_for(queue.get(), min(interval, timeout) if retransmit else timeout)
+                except asyncio.TimeoutError:
+                    if retransmit:
+                        self.send(message, addr)
+                        interval *= 2
+                    continue
+                retransmit = False
+                yield response
+                if response.getStatusCode() >= 200:
+                    return
+        finally:
+            del self._transactions[key]
+
+    async def call(self, remote_host, service='service', fields=('sipp', 'sipp'), pause_ms=0):
+        ''' Places one call to remote_host ('host:port') and returns True when it
+            was answered with 200 and ended with a 200 to BYE.
+        '''
+        remote_ip, _, remote_port = remote_host.rpartition(':')
+        addr = (remote_ip, int(remote_port))
+        field0 = fields[0] if len(fields) > 0 else 'sipp'
+        field1 = fields[1] if len(fields) > 1 else field0
+        self._call_number += 1
+        call_number = self._call_number
+        call_id = '{}-{}@{}'.format(call_number, os.getpid(), self.bind_sip_addr)
+        local = '{}:{}'.format(self.bind_sip_addr, self.bind_sip_port)
+        request_uri = 'sip:{}@{}:{}'.format(service, remote_ip, remote_port)
+        from_ = '{} <sip:{}@{}>;tag={}'.format(field1, field0, local, call_number)
+        to = '{} <{}>'.format(service, request_uri)
+
+        def headers(branch, cseq, contact):
+            return [('Via', 'SIP/2.0/UDP {};branch={}'.format(local, branch)), ('From', from_), ('To', to),
+                    ('Call-ID', call_id), ('CSeq', cseq), ('Contact', 'sip:{}@{}'.format(contact, local)),
+                    ('Max-Forwards', '70'), ('Subject', 'Performance Test')]
+
+        invite_branch = self._nextBranch()
+        invite_headers = headers(invite_branch, '1 INVITE', field1) + [('Content-Type', 'application/sdp')]
+        final = None
+        async for response in self._request(self.buildMessage('INVITE {} SIP/2.0'.format(request_uri),
+                                                              invite_headers, self.buildSdp()),
+                                            addr, (call_id, '1 INVITE')):
+            final = response
+        if final is None or final.getStatusCode() < 200:
+            return False
+        to = final.getHeaders().getFirst('To', to)
+
+        if final.getStatusCode() >= 300:
+            # the ACK of a failed INVITE belongs to the INVITE transaction
+            self.send(self.buildMessage('ACK {} SIP/2.0'.format(request_uri),
+                                        headers(invite_branch, '1 ACK', 'sipp')), addr)
+            return False
+        self.send(self.buildMessage('ACK {} SIP/2.0'.format(request_uri),
+                                    headers(self._nextBranch(), '1 ACK', 'sipp')), addr)
+        if pause_ms:
+            await asyncio.sleep(pause_ms / 1000)
+
+        final = None
+        async for response in self._request(self.buildMessage('BYE {} SIP/2.0'.format(request_uri),
+                                                              headers(self._nextBranch(), '2 BYE', field0)),
+                                            addr, (call_id, '2 BYE')):
+            final = response
+        return final is not None and final.getStatusCode() == 200
+
+    async def runCalls(self, remote_host, count=1, rate=10, service='service', rows=None, pause_ms=0):
+        ''' Starts count calls at rate calls per second, taking the injection
+            fields from rows in turn, and returns (successful, failed).
+        '''
+        rows = rows or [('sipp', 'sipp')]
+        calls = []
+        for index in range(count):
+            calls.append(asyncio.ensure_future(self.call(remote_host, service, rows[index % len(rows)], pause_ms)))
+            if rate and index + 1 < count:
+                await asyncio.sleep(1 / float(rate))
+        results = await asyncio.gather(*calls)
+        return results.count(True), results.count(False)
+
+def readInjectionFile(path_to_file):
+    ''' Returns the rows of a -inf file; a '\\;' in a field is a literal ';'.
+    '''
+    rows = []
+    with open(path_to_file) as f:
+        lines = f.read().splitlines()
+    for line in lines[1:]:
+        if line.strip() and not line.startswith('#'):
+            rows.append([field.replace('\\;', ';') for field in re.split(r'(?<!\\);', line)])
+    return rows
+
+def parseArguments(argv):
+    # the subset of sipp options written by SIPp.helper_create_command
+    parser = argparse.ArgumentParser(prog='peer', description='Python stand-in for sipp', allow_abbrev=False)
+    parser.add_argument('remote_host', nargs='?')
+    parser.add_argument('-sf')
+    parser.add_argument('-sn')
+    parser.add_argument('-inf')
+    parser.add_argument('-s', default='service')
+    parser.add_argument('-d', type=int, default=0)
+    parser.add_argument('-i', default='127.0.0.1')
+    parser.add_argument('-p', type=int, default=5060)
+    parser.add_argument('-mp', type=int, default=6000)
+    parser.add_argument('-trace_msg', action='store_true')
+    parser.add_argument('-message_file')
+    parser.add_argument('-r', type=float, default=10)
+    parser.add_argument('-m', type=int, default=0)
+    # media address, statistics and control options of sipp are accepted and ignored,
+    # they are declared so that their values are not taken for the remote host
+    for option in ('-mi', '-cp', '-stf', '-fd', '-rtt_freq', '-error_file'):
+        parser.add_argument(option, help=argparse.SUPPRESS)
+    for option in ('-trace_stat', '-trace_rtt', '-trace_err'):
+        parser.add_argument(option, action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+async def runPeer(args):
+    peer = SIPPeer(args.i, args.p, args.message_file if args.trace_msg else None, media_port=args.mp)
+    await peer.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        if args.sn == 'uas' or not args.remote_host:
+            ended = asyncio.ensure_future(peer.waitEnded(args.m) if args.m else stop.wait())
+            stopped = asyncio.ensure_future(stop.wait())
+            await asyncio.wait([ended, stopped], return_when=asyncio.FIRST_COMPLETED)
+            ended.cancel()
+            stopped.cancel()
+            return 0
+        rows = readInjectionFile(args.inf) if args.inf else None
+        remote_host = args.remote_host if ':' in args.remote_host else '{}:5060'.format(args.remote_host)
+        remote_ip, _, remote_port = remote_host.rpartition(':')
+        if remote_ip == 'localhost':
+            remote_host = '127.0.0.1:{}'.format(remote_port)
+        successful, failed = await peer.runCalls(remote_host, args.m or 1, args.r, args.s, rows, args.d)
+        # like sipp: 0 when all calls succeeded, 1 when some failed
+        return 0 if not failed else 1
+    finally:
+        peer.close()
+
+def main(argv=None):
+    return asyncio.run(runPeer(parseArguments(sys.argv[1:] if argv is None else argv)))
+
+def createPeerBinary(path_to_file):
+    ''' Writes an executable that runs this peer with sipp options, for the
+        sipp_binary kwarg of SIPp.helper_run_a_sipp.
+        -sf is ignored: a UAC always runs the uac-uas.xml flow and -sn uas answers calls.
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(path_to_file, 'w') as f:
+        f.write('#!/bin/sh\n'
+                'PYTHONPATH="{}${{PYTHONPATH:+:$PYTHONPATH}}" exec "{}" -m {} "$@"\n'.format(
+                    root, sys.executable, __spec__.name))
+    os.chmod(path_to_file, 0o755)
+    return path_to_file
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+''' Independent SIPp processes run in parallel.
+'''
+import os
+import socket
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .runner import SIPp
+
+class SIPpPool():
+    ''' Runs independent SIPp processes side by side.
+        Each submitted run takes the same kwargs as SIPp.helper_run_a_sipp.
+        bind_sip_port and bind_media_port that are not given are allocated
+        from free local ports, and remote_host=SIPpPool.LOOPBACK points the
+        run at its own SIP port (as tests/scenarios/uac-uas.xml expects).
+        Results are futures of the same (ret, command) pair the helper returns.
+    '''
+    LOOPBACK = 'loopback'
+
+    def __init__(self, max_workers=None, bind_sip_addr='127.0.0.1', grace_s=5):
+        self.max_workers = max_workers or os.cpu_count()
+        self.bind_sip_addr = bind_sip_addr
+        # extra time given to the timeout command before the process is killed
+        self.grace_s = grace_s
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._lock = threading.Lock()
+        self._reserved = set()
+
+    @staticmethod
+    def findFreePort(addr='127.0.0.1'):
+        ''' Returns a port that is free for both UDP and TCP on addr.
+        '''
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+                udp.bind((addr, 0))
+                port = udp.getsockname()[1]
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as tcp:
+                    try:
+                        tcp.bind((addr, port))
+                    except OSError:
+                        continue
+                    return port
+
+    @staticmethod
+    def isPortFree(port, addr='127.0.0.1'):
+        ''' True when port can be bound for both UDP and TCP on addr.
+        '''
+        for kind in (socket.SOCK_DGRAM, socket.SOCK_STREAM):
+            with socket.socket(socket.AF_INET, kind) as sock:
+                try:
+                    sock.bind((addr, port))
+                except OSError:
+                    return False
+        return True
+
+    def allocatePort(self, addr=None, span=1):
+        ''' Reserves span consecutive free ports, so ports handed out to runs
+            that are still alive are never reused.
+        '''
+        addr = addr or self.bind_sip_addr
+        while True:
+            port = self.findFreePort(addr)
+            # findFreePort checked the first port, the others of the span may be in use
+            if port + span > 65536 or not all(self.isPortFree(other, addr) for other in range(port + 1, port + span)):
+                continue
+            ports = set(range(port, port + span))
+            with self._lock:
+                if not ports & self._reserved:
+                    self._reserved |= ports
+                    return port
+
+    def releasePort(self, port, span=1):
+        with self._lock:
+            self._reserved -= set(range(port, port + span))
+
+    def submit(self, **kwargs):
+        kwargs = dict(kwargs)
+        allocated = []
+        bind_sip_addr = kwargs.setdefault('bind_sip_addr', self.bind_sip_addr)
+        if kwargs.get('bind_sip_port') is None:
+            kwargs['bind_sip_port'] = self.allocatePort(bind_sip_addr)
+            allocated.append((kwargs['bind_sip_port'], 1))
+        if kwargs.get('bind_media_port') is None:
+            # SIPp uses the media port and the next ports for RTP/RTCP and video
+            kwargs['bind_media_port'] = self.allocatePort(kwargs.get('bind_media_addr') or bind_sip_addr, span=4)
+            allocated.append((kwargs['bind_media_port'], 4))
+        if kwargs.get('remote_host') == self.LOOPBACK:
+            kwargs['remote_host'] = '{}:{}'.format(bind_sip_addr, kwargs['bind_sip_port'])
+
+        return self._executor.submit(self._run, kwargs, allocated)
+
+    def _run(self, kwargs, allocated):
+        log_pipe = None
+        try:
+            log_pipe = SIPp.helper_open_log_pipe(kwargs)
+            runnable, command = SIPp.helper_create_command(**kwargs)
+            proc = subprocess.Popen(runnable, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                returncode = proc.wait(timeout=float(kwargs.get('timeout_s', 10)) + self.grace_s)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                # report it the same way as the timeout command does
+                returncode = 124
+            return subprocess.CompletedProcess(runnable, returncode), " ".join(command)
+        finally:
+            if log_pipe:
+                log_pipe.close()
+            for port, span in allocated:
+                self.releasePort(port, span)
+
+    def map(self, runs):
+        ''' Runs every kwargs dict of runs and returns the results in the same order.
+        '''
+        futures = [self.submit(**kwargs) for kwargs in runs]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
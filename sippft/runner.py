@@ -0,0 +1,283 @@
+#!/usr/bin/python3
+''' Building SIPp command lines and running SIPp.
+'''
+import os
+import subprocess
+
+from . import injection
+
+class SIPp():
+
+    @staticmethod
+    def helper_run_a_sipp(**kwargs):
+        log_pipe = SIPp.helper_open_log_pipe(kwargs)
+        try:
+            runnable, command = SIPp.helper_create_command(**kwargs)
+            # execute sipp program with headless mode
+            ret = subprocess.run(runnable, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            if log_pipe:
+                log_pipe.close()
+
+        # return value of subprocess results and executed command line
+        return ret, " ".join(command)
+
+    @staticmethod
+    async def helper_run_a_sipp_async(on_stdout=None, on_stderr=None, **kwargs):
+        import asyncio
+        # the timeout is handled by the event loop instead of the timeout command
+        timeout_s = float(kwargs.get('timeout_s', 10))
+        log_pipe = SIPp.helper_open_log_pipe(kwargs)
+        try:
+            runnable, command = SIPp.helper_create_command(**kwargs)
+
+            # stream sipp outputs line by line to the callbacks if they are given
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE if on_stdout else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE if on_stderr else asyncio.subprocess.DEVNULL)
+            readers = []
+            if on_stdout:
+                readers.append(SIPp._helper_read_lines(proc.stdout, on_stdout))
+            if on_stderr:
+                readers.append(SIPp._helper_read_lines(proc.stderr, on_stderr))
+
+            tasks = [asyncio.ensure_future(proc.wait())] + [asyncio.ensure_future(reader) for reader in readers]
+            gathering = asyncio.gather(*tasks)
+            try:
+                done, pending = await asyncio.wait([gathering], timeout=timeout_s)
+                if pending:
+                    # report it the same way as the timeout command does
+                    returncode = 124
+                else:
+                    # raises the exception of a callback if there was one
+                    gathering.result()
+                    returncode = proc.returncode
+            finally:
+                # sipp must not outlive a timeout, a cancel or a callback that raised
+                await SIPp._helper_kill(proc)
+                await SIPp._helper_retrieve(gathering, *tasks)
+        finally:
+            if log_pipe:
+                log_pipe.close()
+
+        # return value of subprocess results and executed command line
+        return subprocess.CompletedProcess(command, returncode), " ".join(command)
+
+    @staticmethod
+    def helper_open_log_pipe(kwargs):
+        # with log_compression sipp writes the message log into a FIFO that is compressed to logfile_path
+        log_compression = kwargs.get('log_compression', None)
+        if not log_compression or not kwargs.get('logfile_path'):
+            return None
+        log_pipe = SIPpLogPipe(kwargs['logfile_path'], log_compression)
+        kwargs['logfile_path'] = log_pipe.open()
+        return log_pipe
+
+    @staticmethod
+    async def _helper_read_lines(stream, callback):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            callback(line.decode('utf-8', errors='replace').rstrip('\n'))
+
+    @staticmethod
+    async def _helper_kill(proc):
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    @staticmethod
+    async def _helper_retrieve(*futures):
+        import asyncio
+        # cancel what is still running and fetch every outcome so none is reported as never retrieved
+        for future in futures:
+            future.cancel()
+        await asyncio.wait(futures)
+        for future in futures:
+            if not future.cancelled():
+                future.exception()
+
+    @staticmethod
+    def helper_create_command(**kwargs):
+        timeout_s = kwargs.get('timeout_s', 10)
+        remote_host = kwargs.get('remote_host', 'localhost')
+        scenario_file = kwargs.get('scenario_file', None)
+        request_service = kwargs.get('request_service', None)
+        duration_msec = kwargs.get('duration_msec', None)
+        logfile_path = kwargs.get('logfile_path', None)
+        injection_file = kwargs.get('injection_file', None)
+        embedded_scenario = kwargs.get('embedded_scenario', None)
+        bind_sip_addr = kwargs.get('bind_sip_addr', None)
+        bind_sip_port = kwargs.get('bind_sip_port', None)
+        bind_media_addr = kwargs.get('bind_media_addr', None)
+        bind_media_port = kwargs.get('bind_media_port', None)
+        call_rate = kwargs.get('call_rate', None)
+        count = kwargs.get('count', 1)
+        sipp_binary = kwargs.get('sipp_binary', 'sipp')
+        stat_file = kwargs.get('stat_file', None)
+        stat_frequency_s = kwargs.get('stat_frequency_s', None)
+        trace_rtt = kwargs.get('trace_rtt', False)
+        rtt_frequency = kwargs.get('rtt_frequency', None)
+        error_file = kwargs.get('error_file', None)
+        control_port = kwargs.get('control_port', None)
+        validate_scenario = kwargs.get('validate_scenario', False)
+
+        # with validate_scenario the scenario is checked before starting sipp rather than
+        # finding out from its return code, a missing file is left to sipp to report
+        if scenario_file and validate_scenario and os.path.isfile(str(scenario_file)):
+            from .scenario import Scenario
+            Scenario.load(scenario_file).check(injection_file)
+
+        # create sipp command line
+        command = [str(sipp_binary)]
+        if scenario_file:
+            command.append('-sf')
+            command.append(str(scenario_file))
+        if injection_file:
+            command.append('-inf')
+            command.append(str(injection_file))
+        if request_service:
+            command.append('-s')
+            command.append(str(request_service))
+        if duration_msec:
+            command.append('-d')
+            command.append(str(duration_msec))
+        if bind_sip_addr:
+            command.append('-i')
+            command.append(str(bind_sip_addr))
+        if bind_sip_port:
+            command.append('-p')
+            command.append(str(bind_sip_port))
+        if bind_media_addr:
+            command.append('-mi')
+            command.append(str(bind_media_addr))
+        if bind_media_port:
+            command.append('-mp')
+            command.append(str(bind_media_port))
+        if logfile_path:
+            command.append('-trace_msg')
+            command.append('-message_file')
+            command.append(str(logfile_path))
+        if embedded_scenario:
+            command.append('-sn')
+            command.append(str(embedded_scenario))
+        if call_rate:
+            command.append('-r')
+            command.append(str(call_rate))
+        if count:
+            command.append('-m')
+            command.append(str(count))
+        if stat_file:
+            command.append('-trace_stat')
+            command.append('-stf')
+            command.append(str(stat_file))
+        if stat_frequency_s:
+            command.append('-fd')
+            command.append(str(stat_frequency_s))
+        if trace_rtt:
+            command.append('-trace_rtt')
+        if rtt_frequency:
+            command.append('-rtt_freq')
+            command.append(str(rtt_frequency))
+        if error_file:
+            command.append('-trace_err')
+            command.append('-error_file')
+            command.append(str(error_file))
+        if control_port:
+            command.append('-cp')
+            command.append(str(control_port))
+        command.append(str(remote_host))
+
+        # append in front timeout command
+        runnable = ['timeout', str(timeout_s)] + command
+
+        # return the runnable and sipp command lines
+        return runnable, command
+
+    # injection files, kept as SIPp methods for existing callers
+    helper_create_injection = staticmethod(injection.createInjection)
+    helper_create_injection_header = staticmethod(injection.createInjectionHeader)
+    helper_create_injection_line = staticmethod(injection.createInjectionLine)
+    helper_injection_range = staticmethod(injection.injectionRange)
+    helper_write_injection_rows = staticmethod(injection.writeInjectionRows)
+    helper_write_injection_file = staticmethod(injection.writeInjectionFile)
+
+class SIPpLogPipe():
+    ''' A FIFO for SIPp to write its message log to. A compressor process
+        reads it and writes the compressed log to logfile_path, so -trace_msg
+        does not write the uncompressed log to disk.
+    '''
+    compressors = {
+        'gzip': ['gzip', '-1', '-c'],
+        'bz2': ['bzip2', '-1', '-c'],
+        'xz': ['xz', '-0', '-c'],
+        'zstd': ['zstd', '-q', '-1', '-c'],
+    }
+
+    def __init__(self, logfile_path, compression='gzip'):
+        self.logfile_path = logfile_path
+        self.compression = compression
+        self.fifo_path = None
+        self._directory = None
+        self._writer = None
+        self._output = None
+        self._proc = None
+
+    def open(self):
+        ''' Creates the FIFO, starts the compressor and returns the FIFO path.
+        '''
+        import tempfile
+        self._directory = tempfile.mkdtemp(prefix='sipp_log_')
+        reader = None
+        try:
+            self.fifo_path = os.path.join(self._directory, os.path.basename(self.logfile_path))
+            os.mkfifo(self.fifo_path)
+            # the compressor sees the end of the log only when every writer has closed
+            # the FIFO: hold a writer until close() so that it does not end before SIPp opens it
+            reader = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            self._writer = os.open(self.fifo_path, os.O_WRONLY)
+            os.set_blocking(reader, True)
+            self._output = open(self.logfile_path, 'wb')
+            self._proc = subprocess.Popen(self.compressors[self.compression], stdin=reader, stdout=self._output)
+        except BaseException:
+            # e.g. the compressor is not installed: leave no FIFO, descriptor or empty log behind
+            created_log = self._output is not None
+            self.close()
+            if created_log:
+                os.remove(self.logfile_path)
+            raise
+        finally:
+            if reader is not None:
+                os.close(reader)
+        return self.fifo_path
+
+    def close(self):
+        ''' Waits for the compressor to write the rest of the log and removes the FIFO.
+        '''
+        if self._writer is not None:
+            os.close(self._writer)
+            self._writer = None
+        returncode = None
+        if self._proc is not None:
+            returncode = self._proc.wait()
+            self._proc = None
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+        if self._directory is not None:
+            import shutil
+            shutil.rmtree(self._directory)
+            self._directory = None
+        return returncode
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+''' SIPp scenario XML: the steps of a scenario, checks of injection files
+    against it and of message flows against its steps.
+'''
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+
+class ScenarioStep():
+    ''' One send, recv or pause element of a scenario.
+        A send or recv step expects a request (method) or a response (status_code).
+    '''
+    __slots__ = ('kind', 'index', 'attributes', 'message', 'method', 'status_code', 'optional', 'keywords')
+
+    def __init__(self, kind, index, attributes, message=None):
+        self.kind = kind
+        self.index = index
+        self.attributes = attributes
+        self.message = message
+        self.method = None
+        self.status_code = None
+        self.optional = attributes.get('optional') in ('true', 'global')
+        self.keywords = []
+
+        if kind == 'recv':
+            self.method = attributes.get('request')
+            if attributes.get('response', '').isdigit():
+                self.status_code = int(attributes['response'])
+        elif kind == 'send' and message:
+            start_line = message.split('\n', 1)[0].split()
+            if start_line and start_line[0].startswith('SIP/'):
+                if len(start_line) > 1 and start_line[1].isdigit():
+                    self.status_code = int(start_line[1])
+            elif len(start_line) == 3 and start_line[2].startswith('SIP/'):
+                self.method = start_line[0]
+            # [2001:db8::1] in a Via or URI is an address, not a keyword
+            self.keywords = [keyword for keyword in Scenario.re_keyword.findall(message)
+                             if not Scenario.re_ipv6.match(keyword)]
+
+    @property
+    def direction(self):
+        return {'send': 'sent', 'recv': 'received'}.get(self.kind)
+
+    def matches(self, msg):
+        if msg.direction != self.direction:
+            return False
+        status_code = msg.getStatusCode()
+        if self.status_code is not None:
+            return status_code == self.status_code
+        return status_code is None and msg.getMethod() == self.method
+
+    def __repr__(self):
+        return '{} {}{}'.format(self.kind, self.method or self.status_code or '',
+                                ' (optional)' if self.optional else '')
+
+class Scenario():
+    ''' A parsed SIPp scenario XML.
+        Scenarios are parsed once and cached by path until the file changes.
+        The expected flow is the send/recv steps in file order; jumps through
+        next/label are not followed.
+    '''
+    re_keyword = re.compile(r'\[([^\[\]\s]+)(?:\s[^\[\]]*)?\]')
+    re_field = re.compile(r'field(\d+)$')
+    re_ipv6 = re.compile(r'[0-9a-fA-F.]*:[0-9a-fA-F.]*:[0-9a-fA-F.:]*$')
+    step_kinds = ('send', 'recv', 'pause', 'nop', 'label', 'sendCmd', 'recvCmd')
+    known_keywords = frozenset([
+        'service', 'remote_ip', 'remote_ip_type', 'remote_port', 'transport', 'local_ip', 'local_ip_type',
+        'local_port', 'len', 'call_number', 'call_id', 'cseq', 'media_ip', 'media_ip_type', 'media_port',
+        'auto_media_port', 'rtpstream_audio_port', 'rtpstream_video_port', 'branch', 'client_ip', 'client_port',
+        'server_ip', 'pid', 'peer_tag_param', 'routes', 'next_url', 'authentication', 'clock_tick',
+        'sipp_version', 'tdmmap', 'fill', 'file', 'timestamp', 'users', 'userid', 'dynamic_id',
+        'msg_index',
+    ])
+    _cache = {}
+
+    def __init__(self, path, name, steps):
+        self.path = path
+        self.name = name
+        self.steps = steps
+        self.keywords = OrderedDict()
+        for step in steps:
+            for keyword in step.keywords:
+                self.keywords.setdefault(keyword, []).append(step.index)
+
+    @classmethod
+    def load(cls, path):
+        ''' Returns the parsed scenario, reusing the cached one while the file
+            size and mtime are unchanged. Raises ValueError on a malformed scenario.
+        '''
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = cls._cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        scenario = cls.parse(path)
+        cls._cache[path] = (key, scenario)
+        return scenario
+
+    @classmethod
+    def parse(cls, path):
+        try:
+            root = ElementTree.parse(path).getroot()
+        except ElementTree.ParseError as e:
+            raise ValueError('{}: {}'.format(path, e))
+        if root.tag != 'scenario':
+            raise ValueError('{}: the root element is <{}>, not <scenario>'.format(path, root.tag))
+        steps = []
+        for element in root:
+            if element.tag not in cls.step_kinds:
+                continue
+            message = None
+            if element.tag == 'send':
+                # CDATA is indented like the XML; SIPp strips the leading blanks of every line
+                lines = [line.strip() for line in (element.text or '').strip().split('\n')]
+                message = '\n'.join(lines)
+            steps.append(ScenarioStep(element.tag, len(steps), dict(element.attrib), message))
+        return cls(path, root.get('name'), steps)
+
+    def fieldCount(self):
+        ''' Number of injection fields the scenario uses ([field0] .. [fieldN]).
+        '''
+        indexes = [int(match.group(1)) for match in map(self.re_field.match, self.keywords) if match]
+        return max(indexes) + 1 if indexes else 0
+
+    def isKnownKeyword(self, keyword):
+        if keyword.startswith('$') or keyword.startswith('last_') or self.re_field.match(keyword):
+            return True
+        # [media_port+1], [cseq-1] and the like
+        return re.sub(r'[+-]\d+$', '', keyword) in self.known_keywords
+
+    def validate(self, injection_file=None, sample_rows=1000):
+        ''' Returns the problems found in the scenario, and against the field
+            count of the first sample_rows rows of injection_file when given.
+        '''
+        problems = []
+        if not any(step.kind in ('send', 'recv') for step in self.steps):
+            problems.append('no send or recv step')
+        for step in self.steps:
+            if step.kind == 'recv' and step.method is None and step.status_code is None:
+                problems.append('step {}: recv needs a request or a numeric response'.format(step.index))
+            elif step.kind == 'send' and step.method is None and step.status_code is None:
+                problems.append('step {}: send has no SIP start line'.format(step.index))
+        for keyword, indexes in self.keywords.items():
+            if not self.isKnownKeyword(keyword):
+                problems.append('step {}: unknown keyword [{}]'.format(indexes[0], keyword))
+
+        if injection_file:
+            field_count = self.fieldCount()
+            with open(injection_file) as f:
+                f.readline()
+                for number, line in enumerate(f, 2):
+                    if number > sample_rows + 1:
+                        break
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    fields = len(re.split(r'(?<!\\);', line.rstrip('\r\n')))
+                    if fields < field_count:
+                        problems.append('{} line {}: {} fields, the scenario uses {}'.format(
+                            injection_file, number, fields, field_count))
+                        break
+        return problems
+
+    def check(self, injection_file=None):
+        ''' Raises ValueError listing the problems found by validate().
+        '''
+        problems = self.validate(injection_file)
+        if problems:
+            raise ValueError('{}: {}'.format(self.path, '; '.join(problems)))
+        return self
+
+    def expectedFlow(self):
+        ''' The send and recv steps in the order SIPp runs them.
+        '''
+        return [step for step in self.steps if step.kind in ('send', 'recv')]
+
+    def checkFlow(self, messages):
+        ''' Compares the messages of each Call-ID with the expected flow and
+            returns the mismatches. Optional steps may be missing and a
+            repeat of an already matched step counts as a retransmission.
+        '''
+        calls = OrderedDict()
+        for msg in messages:
+            calls.setdefault(msg.getHeaders().getFirst('Call-ID'), []).append(msg)
+
+        flow = self.expectedFlow()
+        problems = []
+        for call_id, call_messages in calls.items():
+            position = 0
+            for msg in call_messages:
+                matched = self._matchStep(flow, position, msg)
+                if matched is not None:
+                    position = matched + 1
+                elif not any(step.matches(msg) for step in flow[:position]):
+                    expected = flow[position] if position < len(flow) else 'the end of the call'
+                    problems.append('{}: {} {} where {} was expected'.format(
+                        call_id, msg.direction, msg.getStatusCode() or msg.getMethod(), expected))
+                    break
+            else:
+                missing = [step for step in flow[position:] if not step.optional]
+                if missing:
+                    problems.append('{}: missing {}'.format(call_id, missing[0]))
+        return problems
+
+    @staticmethod
+    def _matchStep(flow, position, msg):
+        # the next step, or one after optional steps, that the message matches
+        for index in range(position, len(flow)):
+            if flow[index].matches(msg):
+                return index
+            if not flow[index].optional:
+                return None
+        return None
+
+    def assertFlow(self, messages):
+        problems = self.checkFlow(messages)
+        if problems:
+            raise AssertionError('{} of the calls do not follow {}: {}'.format(
+                len(problems), os.path.basename(self.path), problems[0]))
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+''' Time window queries over rotated message log segments.
+'''
+import bisect
+import collections
+import os
+import re
+from datetime import datetime
+
+from .parser import SIPpMessage
+from .shard import iterMessagesFromRange, re_delim_line
+
+def findLogSegments(logfile_path):
+    ''' The rotated segments of a message log and the log itself.
+        SIPp renames a full log (-max_log_size, -ringbuffer_files) to its
+        name followed by '_' or '.' and numbers, e.g. sip_msg.log_12345_1561805000.
+    '''
+    directory = os.path.dirname(os.path.abspath(logfile_path))
+    name = os.path.basename(logfile_path)
+    re_segment = re.compile(re.escape(name) + r'[._][\d_.]+$')
+    segments = [os.path.join(directory, entry) for entry in os.listdir(directory) if re_segment.match(entry)]
+    if os.path.isfile(logfile_path):
+        segments.append(os.path.abspath(logfile_path))
+    return segments
+
+def _timestamp(match):
+    # the delimiter line ends with 'YYYY-MM-DD HH:MM:SS.ffffff'
+    return datetime.fromisoformat(match.group(0)[-26:].decode('ascii'))
+
+class LogSegmentIndex():
+    ''' Sparse time index of one log segment: the timestamp and byte offset
+        of the first message at or after every interval_bytes. It is built by
+        seeking and reading one delimiter line per interval, not by parsing.
+    '''
+    def __init__(self, filepath, interval_bytes=1024 * 1024, chunk_size=8 * 1024):
+        self.filepath = filepath
+        self.interval_bytes = interval_bytes
+        self.chunk_size = chunk_size
+        self.size = None
+        self.mtime_ns = None
+        self.timestamps = []
+        self.offsets = []
+        self.last = None
+        self.build()
+
+    def isStale(self):
+        stat = os.stat(self.filepath)
+        return (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime_ns)
+
+    def build(self):
+        stat = os.stat(self.filepath)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.timestamps = []
+        self.offsets = []
+        with open(self.filepath, 'rb') as f:
+            pos = 0
+            while pos < self.size:
+                found = self._findDelimiter(f, pos)
+                if found is None:
+                    break
+                offset, timestamp = found
+                if not self.offsets or offset > self.offsets[-1]:
+                    self.offsets.append(offset)
+                    self.timestamps.append(timestamp)
+                pos = max(offset + 1, pos + self.interval_bytes)
+            self.last = self._findLastTimestamp(f)
+
+    def _findDelimiter(self, f, pos):
+        # the first delimiter line that starts at or after pos
+        if pos == 0:
+            f.seek(0)
+            data = f.read(self.chunk_size)
+            match = re_delim_line.match(data)
+            if match:
+                return 0, _timestamp(match)
+            pos = 1
+        f.seek(pos - 1)
+        data = b''
+        while True:
+            chunk = f.read(self.chunk_size)
+            data += chunk
+            match = re_delim_line.search(data, 1)
+            if match:
+                return pos - 1 + match.start(), _timestamp(match)
+            if not chunk:
+                return None
+
+    def _findLastTimestamp(self, f):
+        if not self.offsets:
+            return None
+        end = self.size
+        size = self.chunk_size
+        while True:
+            start = max(self.offsets[-1], end - size)
+            f.seek(start)
+            data = f.read(self.size - start)
+            matches = list(re_delim_line.finditer(data))
+            if matches:
+                return _timestamp(matches[-1])
+            size *= 2
+
+    @property
+    def first(self):
+        return self.timestamps[0] if self.timestamps else None
+
+    def startOffset(self, timestamp):
+        ''' Offset of an indexed message at or before the first message at timestamp.
+        '''
+        index = bisect.bisect_left(self.timestamps, timestamp) - 1
+        return self.offsets[max(index, 0)] if self.offsets else 0
+
+    def endOffset(self, timestamp):
+        ''' Offset of an indexed message after every message at timestamp.
+        '''
+        index = bisect.bisect_right(self.timestamps, timestamp)
+        return self.offsets[index] if index < len(self.offsets) else self.size
+
+class RotatedMessageLog():
+    ''' All segments of a rotated message log, ordered by their first
+        message. Queries seek with the segment indexes and only parse the
+        byte ranges that can hold the wanted messages. An index is rebuilt
+        when its segment has changed, so the live log can be queried while
+        SIPp writes it.
+    '''
+    def __init__(self, logfile_path, interval_bytes=1024 * 1024):
+        self.logfile_path = logfile_path
+        self.interval_bytes = interval_bytes
+        self._indexes = {}
+
+    def getSegments(self):
+        indexes = {}
+        for path in findLogSegments(self.logfile_path):
+            index = self._indexes.get(path)
+            if index is None or index.isStale():
+                index = LogSegmentIndex(path, self.interval_bytes)
+            indexes[path] = index
+        self._indexes = indexes
+        return sorted((index for index in indexes.values() if index.first is not None), key=lambda index: index.first)
+
+    def between(self, start, end):
+        ''' Yields the messages with start <= datetime <= end in time order.
+        '''
+        for index in self.getSegments():
+            if index.last < start or index.first > end:
+                continue
+            for msg in iterMessagesFromRange(index.filepath, index.startOffset(start), index.endOffset(end)):
+                if msg.datetime > end:
+                    break
+                if msg.datetime >= start:
+                    yield msg
+
+    def last(self, count):
+        ''' The last count messages, oldest first.
+        '''
+        messages = collections.deque()
+        for index in reversed(self.getSegments()):
+            # read the segment backwards one index interval at a time
+            end = index.size
+            for offset in reversed(index.offsets):
+                messages.extendleft(reversed(list(iterMessagesFromRange(index.filepath, offset, end))))
+                end = offset
+                if len(messages) >= count:
+                    return list(messages)[len(messages) - count:]
+        return list(messages)
+
+    def __iter__(self):
+        for index in self.getSegments():
+            yield from SIPpMessage.iterMessagesFromLogfile(index.filepath)
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+''' One SIPp process shared by many test cases.
+'''
+import os
+import socket
+import subprocess
+import time
+import unittest
+
+from .capacity import SIPpControl
+from .follow import MessageLogFollower
+from .pool import SIPpPool
+from .runner import SIPp
+from .shard import iterMessagesFromRange
+
+class SIPpSession():
+    ''' One SIPp process kept running for many test cases.
+        It is started without placing calls (rate 0, no call limit) and
+        driven over its control port; each test reads only the part of the
+        message log written since its mark(). A UAS peer can be kept alive the
+        same way and only uses start/stop and the log marks.
+        SIPp reads -inf once at start, so every call of the session takes the
+        next row of the injection file given at start.
+    '''
+    def __init__(self, timeout_s=3600, grace_s=5, **kwargs):
+        if kwargs.get('log_compression'):
+            # getMessages reads the log while SIPp writes it
+            raise ValueError('log_compression can not be used with a session')
+        self.kwargs = kwargs
+        self.timeout_s = timeout_s
+        self.grace_s = grace_s
+        self.logfile = kwargs.get('logfile_path')
+        self.control = None
+        self.proc = None
+        self._mark = 0
+
+    def start(self):
+        kwargs = dict(self.kwargs)
+        kwargs['control_port'] = kwargs.get('control_port') or SIPpPool.findFreePort()
+        # a string so that helper_create_command does not drop rate 0
+        kwargs.setdefault('call_rate', '0')
+        kwargs['count'] = 0
+        kwargs['timeout_s'] = self.timeout_s
+        runnable, command = SIPp.helper_create_command(**kwargs)
+        self.command = " ".join(command)
+        self.proc = subprocess.Popen(runnable, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.control = SIPpControl(kwargs['control_port'], kwargs.get('bind_sip_addr') or '127.0.0.1')
+        self._waitControlPort()
+        return self.proc
+
+    def _waitControlPort(self, poll_interval_s=0.01):
+        # commands sent before SIPp listens on its control port are lost.
+        # The probe sends an empty datagram from a connected socket instead of
+        # binding the port, which would push SIPp to the next one: while nobody
+        # listens, the kernel answers with ECONNREFUSED
+        deadline = time.monotonic() + self.grace_s
+        while time.monotonic() < deadline and self.proc.poll() is None:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+                probe.settimeout(poll_interval_s)
+                try:
+                    probe.connect((self.control.addr, self.control.port))
+                    probe.send(b'')
+                    probe.recv(1)
+                    return True
+                except ConnectionRefusedError:
+                    pass
+                except socket.timeout:
+                    return True
+            time.sleep(poll_interval_s)
+        return False
+
+    def stop(self):
+        if self.proc is None:
+            return None
+        if self.proc.poll() is None:
+            self.control.quit()
+            try:
+                self.proc.wait(timeout=self.grace_s)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.control.close()
+        returncode = self.proc.returncode
+        self.proc = None
+        return returncode
+
+    def isRunning(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def mark(self):
+        ''' Starts a new log slice: later reads only see messages written after this.
+        '''
+        self._mark = os.path.getsize(self.logfile) if self.logfile and os.path.isfile(self.logfile) else 0
+        return self._mark
+
+    def getMessages(self):
+        ''' Messages written to the log since the last mark().
+        '''
+        if not self.logfile or not os.path.isfile(self.logfile):
+            return []
+        return list(iterMessagesFromRange(self.logfile, self._mark, os.path.getsize(self.logfile)))
+
+    @staticmethod
+    def isCallFinished(msg):
+        ''' True for the final response that ends a call: to BYE, or a failed INVITE.
+        '''
+        status_code = msg.getStatusCode()
+        if status_code is None or status_code < 200:
+            return False
+        cseq = msg.getHeaders().getFirst('CSeq', '').split()
+        method = cseq[1] if len(cseq) > 1 else None
+        return method == 'BYE' or method == 'INVITE' and status_code >= 300
+
+    def runCalls(self, count=1, rate=10, timeout_s=10, poll_interval_s=0.02):
+        ''' Lets the session place calls at rate until count INVITEs were sent,
+            pauses it and waits for those calls to finish.
+            At high rates SIPp may start a few calls more before it pauses.
+            Returns the messages of this run, or raises AssertionError on timeout.
+        '''
+        self.mark()
+        follower = MessageLogFollower(self.logfile, offset=self._mark)
+        started = set()
+        finished = set()
+        messages = []
+        deadline = time.monotonic() + timeout_s
+        self.control.setRate(rate)
+        paused = False
+        try:
+            while time.monotonic() < deadline and self.isRunning():
+                for msg in follower.poll():
+                    messages.append(msg)
+                    call_id = msg.getHeaders().getFirst('Call-ID')
+                    if msg.direction == 'sent' and msg.getMethod() == 'INVITE':
+                        started.add(call_id)
+                    elif msg.direction == 'received' and self.isCallFinished(msg):
+                        finished.add(call_id)
+                if not paused and len(started) >= count:
+                    self.control.setRate(0)
+                    paused = True
+                if paused and started <= finished:
+                    return messages
+                time.sleep(poll_interval_s)
+        finally:
+            if not paused:
+                self.control.setRate(0)
+            follower.close()
+        raise AssertionError('{} of {} calls finished in {} seconds'.format(len(finished), count, timeout_s))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+class SIPpSessionTestCase(unittest.TestCase):
+    ''' Shares one SIPpSession between the tests of a class.
+        Subclasses set session_kwargs to the kwargs of SIPp.helper_run_a_sipp.
+    '''
+    session_kwargs = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.session = SIPpSession(**cls.session_kwargs)
+        cls.session.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.assertTrue(self.session.isRunning(), 'the shared sipp process has stopped.')
+        self.session.mark()
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+''' Parsing a message log in byte ranges on several processes.
+'''
+import heapq
+import os
+import re
+from collections import Counter
+
+from .parser import SIPpMessageParser
+
+#'----------------------------------------------- 2019-06-29 19:42:16.839845'
+re_delim_line=re.compile(rb'^-[-]+ [\d]{4}-[\d]{2}-[\d]{2} [\d]{2}:[\d]{2}:[\d]{2}\.[\d]{6}', re.MULTILINE)
+
+def findShardRanges(filepath, shards, chunk_size=64 * 1024):
+    ''' Splits a message log into at most shards (start, end) byte ranges,
+        each starting at a delimiter line so no message spans two ranges.
+    '''
+    size = os.path.getsize(filepath)
+    starts = [0]
+    with open(filepath, 'rb') as f:
+        for i in range(1, shards):
+            pos = size * i // shards
+            if pos <= starts[-1]:
+                # the last range found already reaches past this split point
+                continue
+            # look for the first delimiter line that starts after pos
+            f.seek(pos - 1)
+            data = b''
+            while True:
+                chunk = f.read(chunk_size)
+                data += chunk
+                match_deli = re_delim_line.search(data, 1)
+                if match_deli or not chunk:
+                    break
+            if not match_deli:
+                break
+            start = pos - 1 + match_deli.start()
+            if start > starts[-1]:
+                starts.append(start)
+    return list(zip(starts, starts[1:] + [size]))
+
+def iterMessagesFromRange(filepath, start, end):
+    parser = SIPpMessageParser()
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if pos >= end:
+                break
+            pos += len(line)
+            msg = parser.feedLine(line)
+            if msg is not None:
+                yield msg
+    msg = parser.flush()
+    if msg is not None:
+        yield msg
+
+def _parseShard(args):
+    return list(iterMessagesFromRange(*args))
+
+def _aggregateShard(args):
+    aggregate = {'direction': Counter(), 'method': Counter(), 'status_code': Counter()}
+    for msg in iterMessagesFromRange(*args):
+        aggregate['direction'][msg.direction] += 1
+        status_code = msg.getStatusCode()
+        if status_code is None:
+            aggregate['method'][msg.getMethod()] += 1
+        else:
+            aggregate['status_code'][status_code] += 1
+    return aggregate
+
+def _mapShards(function, filepath, processes, shards):
+    processes = processes or os.cpu_count()
+    ranges = [(filepath, start, end) for start, end in findShardRanges(filepath, shards or processes)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(function, ranges))
+
+def parseMessagesInShards(filepath, processes=None, shards=None):
+    ''' Parses byte ranges of the log in a process pool and merges the
+        messages in timestamp order.
+    '''
+    results = _mapShards(_parseShard, filepath, processes, shards)
+    return list(heapq.merge(*results, key=lambda msg: msg.datetime))
+
+def aggregateMessagesInShards(filepath, processes=None, shards=None):
+    ''' Counts messages by direction, request method and response status code
+        in the worker processes, so only the counts are sent back.
+    '''
+    aggregate = {'direction': Counter(), 'method': Counter(), 'status_code': Counter()}
+    for result in _mapShards(_aggregateShard, filepath, processes, shards):
+        for name, counter in result.items():
+            aggregate[name].update(counter)
+    return aggregate
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+''' Run-to-run comparison of call flows.
+
+    python3 -m sippft.signature logs/baseline.log logs/candidate.log --header Contact
+
+reduces every Call-ID of both logs to a normalised flow signature and reports
+the flows that are new, missing or that occur a different number of times.
+'''
+import argparse
+import collections
+import difflib
+import hashlib
+import re
+import sys
+from datetime import timedelta
+
+from .parser import SIPpMessage
+
+class FlowSignatures():
+    ''' Reduces each Call-ID to a sequence of tokens, one per message:
+        direction, method or status code, CSeq method and the chosen
+        headers with tags, branches and the Call-ID masked. Consecutive
+        identical tokens (retransmissions) count once.
+        Messages are consumed as a stream; a call is finished at the end of
+        the log, or when idle_seconds of log time have passed since its last
+        message, so only the calls in progress are held in memory.
+    '''
+    masks = [(re.compile(r'(;\s*(?:tag|branch)\s*=\s*)[^;,>\s]+', re.IGNORECASE), lambda match: match.group(1) + '*')]
+
+    def __init__(self, headers=(), idle_seconds=None, masks=()):
+        self.headers = tuple(headers)
+        self.idle_seconds = idle_seconds
+        self.masks = FlowSignatures.masks + [(re.compile(pattern), replacement) for pattern, replacement in masks]
+
+    def _mask(self, value, call_id):
+        if call_id:
+            value = value.replace(call_id, '*')
+        for pattern, replacement in self.masks:
+            value = pattern.sub(replacement, value)
+        return value
+
+    def token(self, msg, call_id=None):
+        headers = msg.getHeaders()
+        cseq = headers.getFirst('CSeq', '').split()
+        fields = ['>' if msg.direction == 'sent' else '<',
+                  str(msg.getStatusCode() or msg.getMethod()),
+                  cseq[1] if len(cseq) > 1 else '']
+        for header in self.headers:
+            fields.append('{}: {}'.format(header, self._mask(', '.join(headers.getValues(header)), call_id)))
+        return ' '.join(fields)
+
+    @staticmethod
+    def digest(tokens):
+        return hashlib.blake2b('\n'.join(tokens).encode('utf-8'), digest_size=8).hexdigest()
+
+    def iterFlows(self, messages):
+        ''' Yields (call_id, digest, tokens) for every finished call.
+        '''
+        # call_id -> [tokens, datetime of the last message], least recently seen first
+        calls = collections.OrderedDict()
+        idle = timedelta(seconds=self.idle_seconds) if self.idle_seconds is not None else None
+        for msg in messages:
+            call_id = msg.getHeaders().getFirst('Call-ID')
+            token = self.token(msg, call_id)
+            call = calls.get(call_id)
+            if call is None:
+                call = calls[call_id] = [[], None]
+            else:
+                calls.move_to_end(call_id)
+            if not call[0] or call[0][-1] != token:
+                call[0].append(token)
+            call[1] = msg.datetime
+            if idle is not None and msg.datetime is not None:
+                while calls:
+                    oldest_id, (tokens, last) = next(iter(calls.items()))
+                    if last is None or msg.datetime - last <= idle:
+                        break
+                    del calls[oldest_id]
+                    yield oldest_id, self.digest(tokens), tokens
+        for call_id, (tokens, last) in calls.items():
+            yield call_id, self.digest(tokens), tokens
+
+class SignatureHistogram():
+    ''' Number of calls per flow signature, with the token sequence and up to
+        examples Call-IDs of each signature.
+    '''
+    def __init__(self, examples=3):
+        self.examples = examples
+        self.counts = collections.Counter()
+        self.flows = {}
+        self.call_ids = {}
+
+    def add(self, call_id, digest, tokens):
+        self.counts[digest] += 1
+        if digest not in self.flows:
+            self.flows[digest] = tokens
+            self.call_ids[digest] = []
+        if len(self.call_ids[digest]) < self.examples:
+            self.call_ids[digest].append(call_id)
+
+    @staticmethod
+    def fromMessages(messages, signatures=None, examples=3):
+        histogram = SignatureHistogram(examples)
+        for flow in (signatures or FlowSignatures()).iterFlows(messages):
+            histogram.add(*flow)
+        return histogram
+
+    @staticmethod
+    def fromLogfile(filepath, signatures=None, examples=3, local_addresses=()):
+        return SignatureHistogram.fromMessages(
+            SIPpMessage.iterMessagesFromLogfile(filepath, local_addresses=local_addresses), signatures, examples)
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def diff(self, candidate):
+        return FlowDiff(self, candidate)
+
+class FlowDiff():
+    ''' Differences of two signature histograms.
+        added: signatures only seen in the candidate run
+        missing: signatures only seen in the baseline run
+        changed: signatures of both runs, digest -> (baseline count, candidate count)
+    '''
+    def __init__(self, baseline, candidate):
+        self.baseline = baseline
+        self.candidate = candidate
+        self.added = [digest for digest in candidate.counts if digest not in baseline.counts]
+        self.missing = [digest for digest in baseline.counts if digest not in candidate.counts]
+        self.changed = {digest: (count, candidate.counts[digest]) for digest, count in baseline.counts.items()
+                        if digest in candidate.counts and candidate.counts[digest] != count}
+
+    def __bool__(self):
+        return bool(self.added or self.missing or self.changed)
+
+    def closest(self, digest):
+        ''' The baseline signature most similar to an added one, or None.
+        '''
+        tokens = self.candidate.flows[digest]
+        best, best_ratio = None, 0.0
+        for baseline_digest, baseline_tokens in self.baseline.flows.items():
+            ratio = difflib.SequenceMatcher(None, baseline_tokens, tokens).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = baseline_digest, ratio
+        return best
+
+    def report(self):
+        lines = ['baseline {} calls, candidate {} calls'.format(self.baseline.total(), self.candidate.total())]
+        for digest in sorted(self.added, key=lambda digest: -self.candidate.counts[digest]):
+            lines.append('new {} x{} e.g. {}'.format(digest, self.candidate.counts[digest],
+                                                     ', '.join(map(str, self.candidate.call_ids[digest]))))
+            closest = self.closest(digest)
+            if closest is None:
+                lines.extend('  ' + token for token in self.candidate.flows[digest])
+            else:
+                lines.extend('  ' + line for line in difflib.unified_diff(
+                    self.baseline.flows[closest], self.candidate.flows[digest], closest, digest, lineterm='', n=1))
+        for digest in sorted(self.missing, key=lambda digest: -self.baseline.counts[digest]):
+            lines.append('missing {} x{} e.g. {}'.format(digest, self.baseline.counts[digest],
+                                                         ', '.join(map(str, self.baseline.call_ids[digest]))))
+            lines.extend('  ' + token for token in self.baseline.flows[digest])
+        for digest, (before, after) in sorted(self.changed.items()):
+            lines.append('changed {} x{} -> x{}'.format(digest, before, after))
+            lines.extend('  ' + token for token in self.baseline.flows[digest])
+        return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0].strip("' "))
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--header', action='append', default=[], help='header to include in the signature')
+    parser.add_argument('--idle-seconds', type=float, help='finish a call after this much log time without messages')
+    parser.add_argument('--local-address', action='append', default=[], help='local address of pcap captures')
+    args = parser.parse_args(argv)
+
+    signatures = FlowSignatures(args.header, args.idle_seconds)
+    baseline = SignatureHistogram.fromLogfile(args.baseline, signatures, local_addresses=args.local_address)
+    candidate = SignatureHistogram.fromLogfile(args.candidate, signatures, local_addresses=args.local_address)
+    diff = baseline.diff(candidate)
+    print(diff.report())
+    return 1 if diff else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
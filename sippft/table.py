@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+''' Column-oriented NumPy tables of messages and their SDP media.
+'''
+import hashlib
+
+from .parser import SIPpMessage
+
+try:
+    import numpy as np
+except ImportError:
+    # the tables need NumPy, importing the module does not
+    np = None
+
+def requireNumpy(name):
+    if np is None:
+        raise ImportError('{} needs the numpy package'.format(name))
+
+class MessageTable():
+    ''' Column-oriented view of parsed SIP messages.
+        Every column is a NumPy array with one row per message in log order,
+        so filters are boolean masks and statistics run without Python loops.
+    '''
+    directions = ('sent', 'received')
+    protocols = ('UDP', 'TCP', 'SCTP')
+    columns = ('timestamp', 'direction', 'protocol', 'method', 'status_code',
+               'length', 'call_id', 'cseq', 'cseq_method')
+
+    def __init__(self, columns, method_names, messages=None):
+        self.timestamp = columns['timestamp']
+        self.direction = columns['direction']
+        self.protocol = columns['protocol']
+        self.method = columns['method']
+        self.status_code = columns['status_code']
+        self.length = columns['length']
+        self.call_id = columns['call_id']
+        self.cseq = columns['cseq']
+        self.cseq_method = columns['cseq_method']
+        # method name -> code used in the method and cseq_method columns
+        self.method_names = method_names
+        self.messages = messages
+
+    @staticmethod
+    def callIdHash(call_id):
+        return int.from_bytes(hashlib.blake2b(call_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    @staticmethod
+    def fromMessages(messages, keep_messages=True):
+        requireNumpy('MessageTable')
+        method_names = {}
+        rows = {name: [] for name in MessageTable.columns}
+        kept = [] if keep_messages else None
+
+        def method_code(name):
+            return method_names.setdefault(name, len(method_names))
+
+        for msg in messages:
+            headers = msg.getHeaders()
+            status_code = msg.getStatusCode()
+            cseq = headers.getFirst('CSeq', '').split()
+            call_id = headers.getFirst('Call-ID')
+
+            rows['timestamp'].append(msg.datetime)
+            rows['direction'].append(MessageTable._code(MessageTable.directions, msg.direction))
+            rows['protocol'].append(MessageTable._code(MessageTable.protocols, msg.protocol))
+            rows['method'].append(-1 if status_code is not None else method_code(msg.getMethod()))
+            rows['status_code'].append(status_code or 0)
+            rows['length'].append(msg.length)
+            rows['call_id'].append(MessageTable.callIdHash(call_id) if call_id is not None else 0)
+            rows['cseq'].append(int(cseq[0]) if cseq and cseq[0].isdigit() else 0)
+            rows['cseq_method'].append(method_code(cseq[1]) if len(cseq) > 1 else -1)
+            if keep_messages:
+                kept.append(msg)
+
+        columns = {
+            'timestamp': np.array(rows['timestamp'], dtype='datetime64[us]'),
+            'direction': np.array(rows['direction'], dtype=np.int8),
+            'protocol': np.array(rows['protocol'], dtype=np.int8),
+            'method': np.array(rows['method'], dtype=np.int16),
+            'status_code': np.array(rows['status_code'], dtype=np.int16),
+            'length': np.array(rows['length'], dtype=np.int64),
+            'call_id': np.array(rows['call_id'], dtype=np.uint64),
+            'cseq': np.array(rows['cseq'], dtype=np.uint32),
+            'cseq_method': np.array(rows['cseq_method'], dtype=np.int16),
+        }
+        return MessageTable(columns, method_names, kept)
+
+    @staticmethod
+    def fromLogfile(filepath, keep_messages=False):
+        return MessageTable.fromMessages(SIPpMessage.iterMessagesFromLogfile(filepath),
+                                         keep_messages=keep_messages)
+
+    @staticmethod
+    def _code(names, name):
+        try:
+            return names.index(name)
+        except ValueError:
+            return -1
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def _methodCode(self, method):
+        # a method that never appeared gets a code no row has
+        return self.method_names.get(method, -2)
+
+    def mask(self, direction=None, method=None, status_code=None,
+             protocol=None, call_id=None, cseq_method=None):
+        ''' Boolean mask of the rows matching every given criterion.
+            status_code may be a code or a (low, high) half-open range.
+        '''
+        mask = np.ones(len(self), dtype=bool)
+        if direction is not None:
+            mask &= self.direction == self._code(self.directions, direction)
+        if protocol is not None:
+            mask &= self.protocol == self._code(self.protocols, protocol)
+        if method is not None:
+            mask &= self.method == self._methodCode(method)
+        if status_code is not None:
+            if isinstance(status_code, tuple):
+                mask &= (self.status_code >= status_code[0]) & (self.status_code < status_code[1])
+            else:
+                mask &= self.status_code == status_code
+        if call_id is not None:
+            mask &= self.call_id == np.uint64(self.callIdHash(call_id))
+        if cseq_method is not None:
+            mask &= self.cseq_method == self._methodCode(cseq_method)
+        return mask
+
+    def select(self, mask):
+        columns = {name: getattr(self, name)[mask] for name in self.columns}
+        messages = None
+        if self.messages is not None:
+            messages = [self.messages[i] for i in np.flatnonzero(mask)]
+        return MessageTable(columns, self.method_names, messages)
+
+    def filter(self, **kwargs):
+        return self.select(self.mask(**kwargs))
+
+    def groupByCallID(self):
+        ''' Returns the unique Call-ID hashes and, for each, the row indices
+            of its messages in log order.
+        '''
+        order = np.argsort(self.call_id, kind='stable')
+        call_ids, starts = np.unique(self.call_id[order], return_index=True)
+        return call_ids, np.split(order, starts[1:])
+
+    def _transactionKeys(self, rows):
+        # combine Call-ID hash and CSeq number into one key, wrapping on overflow
+        return self.call_id[rows] ^ (self.cseq[rows].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+    def responseTimes(self, method='INVITE', status_code=(200, 700),
+                      request_direction='sent', response_direction='received'):
+        ''' Milliseconds from the first request of each transaction to its first
+            response matching status_code.
+        '''
+        requests = np.flatnonzero(self.mask(direction=request_direction, method=method))
+        responses = np.flatnonzero(self.mask(direction=response_direction, status_code=status_code,
+                                             cseq_method=method))
+
+        # rows are in log order, so the first index of each key is the earliest message
+        request_keys, request_first = np.unique(self._transactionKeys(requests), return_index=True)
+        response_keys, response_first = np.unique(self._transactionKeys(responses), return_index=True)
+        _, request_match, response_match = np.intersect1d(request_keys, response_keys,
+                                                          assume_unique=True, return_indices=True)
+
+        sent = self.timestamp[requests[request_first[request_match]]]
+        answered = self.timestamp[responses[response_first[response_match]]]
+        return (answered - sent) / np.timedelta64(1, 'us') / 1000.0
+
+    def responseTimePercentiles(self, percentiles=(50, 90, 99), **kwargs):
+        response_times = self.responseTimes(**kwargs)
+        if len(response_times) == 0:
+            return None
+        return np.percentile(response_times, percentiles)
+
+class MediaTable():
+    ''' Column-oriented view of the SDP of a run: one row per message with
+        an SDP body that has the given media, in log order. Each row is
+        either an offer (a request) or an answer (a response).
+        codec is the code of the first format in codec_names and codec_mask
+        has the bit of every offered format set, so negotiation checks over
+        a whole run are array operations.
+    '''
+    columns = ('row', 'direction', 'is_request', 'status_code', 'call_id', 'cseq',
+               'port', 'payload_type', 'codec', 'codec_mask', 'format_count')
+
+    def __init__(self, columns, codec_names, addresses):
+        self.row = columns['row']
+        self.direction = columns['direction']
+        self.is_request = columns['is_request']
+        self.status_code = columns['status_code']
+        self.call_id = columns['call_id']
+        self.cseq = columns['cseq']
+        self.port = columns['port']
+        self.payload_type = columns['payload_type']
+        self.codec = columns['codec']
+        self.codec_mask = columns['codec_mask']
+        self.format_count = columns['format_count']
+        # codec name ('PCMU/8000') -> code; at most 64 distinct codecs fit in codec_mask
+        self.codec_names = codec_names
+        # the c= address of each row
+        self.addresses = addresses
+
+    def __len__(self):
+        return len(self.row)
+
+    @staticmethod
+    def fromMessages(messages, media='audio'):
+        requireNumpy('MediaTable')
+        codec_names = {}
+        rows = {name: [] for name in MediaTable.columns}
+        addresses = []
+
+        def codec_code(name):
+            code = codec_names.setdefault(name, len(codec_names))
+            return code if code < 64 else -1
+
+        for index, msg in enumerate(messages):
+            sdp = msg.getSDP()
+            section = sdp.getMedia(media) if sdp is not None else None
+            if section is None:
+                continue
+            status_code = msg.getStatusCode()
+            cseq = msg.getHeaders().getFirst('CSeq', '').split()
+            call_id = msg.getHeaders().getFirst('Call-ID')
+            codes = [codec_code(codec) for codec in section.getCodecs()]
+            mask = 0
+            for code in codes:
+                if code >= 0:
+                    mask |= 1 << code
+
+            rows['row'].append(index)
+            rows['direction'].append(MessageTable._code(MessageTable.directions, msg.direction))
+            rows['is_request'].append(status_code is None)
+            rows['status_code'].append(status_code or 0)
+            rows['call_id'].append(MessageTable.callIdHash(call_id) if call_id is not None else 0)
+            rows['cseq'].append(int(cseq[0]) if cseq and cseq[0].isdigit() else 0)
+            rows['port'].append(section.port if section.port is not None else -1)
+            rows['payload_type'].append(int(section.formats[0]) if section.formats and section.formats[0].isdigit()
+                                        else -1)
+            rows['codec'].append(codes[0] if codes else -1)
+            rows['codec_mask'].append(mask)
+            rows['format_count'].append(len(section.formats))
+            addresses.append(section.connection)
+
+        columns = {
+            'row': np.array(rows['row'], dtype=np.int64),
+            'direction': np.array(rows['direction'], dtype=np.int8),
+            'is_request': np.array(rows['is_request'], dtype=bool),
+            'status_code': np.array(rows['status_code'], dtype=np.int16),
+            'call_id': np.array(rows['call_id'], dtype=np.uint64),
+            'cseq': np.array(rows['cseq'], dtype=np.uint32),
+            'port': np.array(rows['port'], dtype=np.int32),
+            'payload_type': np.array(rows['payload_type'], dtype=np.int16),
+            'codec': np.array(rows['codec'], dtype=np.int16),
+            'codec_mask': np.array(rows['codec_mask'], dtype=np.uint64),
+            'format_count': np.array(rows['format_count'], dtype=np.int16),
+        }
+        return MediaTable(columns, codec_names, addresses)
+
+    @staticmethod
+    def fromLogfile(filepath, media='audio'):
+        return MediaTable.fromMessages(SIPpMessage.iterMessagesFromLogfile(filepath), media)
+
+    def _keys(self, rows, direction):
+        # Call-ID hash, CSeq number and the direction of the offer in one key
+        return (self.call_id[rows] ^ (self.cseq[rows].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+                ^ direction[rows].astype(np.uint64))
+
+    def offerAnswer(self, direction=None):
+        ''' Pairs every offer with the first 2xx answer of its transaction
+            that went the other way, and returns the (offers, answers) indices
+            into this table. direction limits the offers to 'sent' or 'received'.
+        '''
+        offers = np.flatnonzero(self.is_request)
+        if direction is not None:
+            offers = offers[self.direction[offers] == MessageTable._code(MessageTable.directions, direction)]
+        answers = np.flatnonzero(~self.is_request & (self.status_code >= 200) & (self.status_code < 300))
+
+        # an answer is keyed with the direction of its offer, i.e. the opposite of its own
+        offer_keys, offer_first = np.unique(self._keys(offers, self.direction), return_index=True)
+        answer_keys, answer_first = np.unique(self._keys(answers, 1 - self.direction), return_index=True)
+        _, offer_match, answer_match = np.intersect1d(offer_keys, answer_keys,
+                                                      assume_unique=True, return_indices=True)
+        order = np.argsort(offers[offer_first[offer_match]], kind='stable')
+        return offers[offer_first[offer_match]][order], answers[answer_first[answer_match]][order]
+
+    def codecMismatches(self, direction=None):
+        ''' Offers whose answer chose a codec that was not offered.
+        '''
+        offers, answers = self.offerAnswer(direction)
+        chosen = self.codec[answers]
+        offered = (self.codec_mask[offers] >> np.maximum(chosen, 0).astype(np.uint64)) & np.uint64(1)
+        return offers[(chosen < 0) | (offered == 0)]
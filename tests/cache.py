@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sippft.cache import ParsedLogCache
+from sippft.parser import SIPpMessage
+from sippft.table import np
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestParsedLogCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = ParsedLogCache(cache_dir=os.path.join(self.directory, 'cache'))
+        self.logfile = self.writeLogfile('sip_msg.log', 30)
+
+    def writeLogfile(self, name, count):
+        path_to_file = os.path.join(self.directory, name)
+        start = datetime(2019, 6, 29, 19, 42, 16)
+        with open(path_to_file, 'wb') as f:
+            for i in range(count):
+                msg = SIPpMessage()
+                msg.datetime = start + timedelta(milliseconds=i)
+                msg.protocol = 'UDP'
+                msg.direction = 'sent' if i % 2 else 'received'
+                if i % 2:
+                    msg.message = 'INVITE sip:bob@biloxi.com SIP/2.0\r\nCall-ID: {}\r\nCSeq: 1 INVITE\r\n\r\n'.format(i)
+                else:
+                    msg.message = 'SIP/2.0 200 OK\r\nCall-ID: {}\r\nCSeq: 1 INVITE\r\n\r\n'.format(i - 1)
+                f.write(msg.toLogEntry())
+        return path_to_file
+
+    def test_open(self):
+        self.assertEqual(self.cache.load(self.logfile), None)
+        with self.cache.open(self.logfile) as stored:
+            self.assertTrue(os.path.isfile(self.cache.entryPath(self.logfile)))
+            with self.cache.load(self.logfile) as loaded:
+                self.assertEqual(len(loaded), 30)
+                self.assertTrue((loaded.table.status_code == stored.table.status_code).all())
+                self.assertTrue((loaded.table.call_id == stored.table.call_id).all())
+                self.assertEqual(loaded.table.method_names, {'INVITE': 0})
+                self.assertEqual(loaded.table.mask(method='INVITE').sum(), 15)
+
+                expected = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+                self.assertEqual([(msg.datetime, msg.direction, msg.protocol, msg.message) for msg in loaded],
+                                 [(msg.datetime, msg.direction, msg.protocol, msg.message) for msg in expected])
+
+    def test_stale(self):
+        self.cache.open(self.logfile).close()
+        self.writeLogfile('sip_msg.log', 10)
+        self.assertEqual(self.cache.load(self.logfile), None)
+        self.assertFalse(os.path.isfile(self.cache.entryPath(self.logfile)))
+        with self.cache.open(self.logfile) as cached:
+            self.assertEqual(len(cached), 10)
+
+    def test_evict(self):
+        self.cache.open(self.logfile).close()
+        entry_size = os.path.getsize(self.cache.entryPath(self.logfile))
+        self.cache.max_bytes = entry_size * 2
+        others = [self.writeLogfile('other_{}.log'.format(i), 30) for i in range(3)]
+        os.utime(self.cache.entryPath(self.logfile), ns=(0, 0))
+        for i, path_to_file in enumerate(others):
+            self.cache.open(path_to_file).close()
+            # make the use order explicit instead of relying on the clock
+            os.utime(self.cache.entryPath(path_to_file), ns=((i + 1) * 10 ** 9, (i + 1) * 10 ** 9))
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 2)
+        self.assertFalse(os.path.isfile(self.cache.entryPath(self.logfile)))
+        self.assertFalse(os.path.isfile(self.cache.entryPath(others[0])))
+        self.assertTrue(os.path.isfile(self.cache.entryPath(others[-1])))
+
+    def test_default_cache_dir(self):
+        cache = ParsedLogCache()
+        self.assertEqual(os.path.dirname(cache.entryPath(self.logfile)),
+                         os.path.join(self.directory, '.sipp_cache'))
+        cache.open(self.logfile).close()
+        with cache.load(self.logfile) as cached:
+            self.assertEqual(len(cached), 30)
+        cache.clear(self.logfile)
+        self.assertFalse(os.path.isdir(os.path.join(self.directory, '.sipp_cache')))
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+import sys
+import unittest
+
+from sippft.capacity import CapacitySearch
+
+from .fixtures import createFakeSipp
+
+class TestCapacitySearch(unittest.TestCase):
+    def measureWithLimit(self, limit):
+        def measure(rate):
+            failed = 0 if rate <= limit else rate // 10
+            return {'rate': rate, 'failure_ratio': failed / rate, 'response_time_ms': rate / 10.0}
+        return measure
+
+    def test_search(self):
+        result = CapacitySearch(start_rate=10, precision=0.02).search(self.measureWithLimit(137))
+        self.assertLessEqual(result.max_rate, 137)
+        self.assertGreaterEqual(result.max_rate, 137 * 0.98 - 1)
+        rates = [point['rate'] for point in result.curve]
+        self.assertEqual(rates[:6], [10, 20, 40, 80, 160, 120])
+        self.assertEqual([point['sustainable'] for point in result.curve][:5], [True] * 4 + [False])
+
+    def test_search_response_time(self):
+        search = CapacitySearch(start_rate=10, max_response_time_ms=5.0, precision=0.0)
+        result = search.search(self.measureWithLimit(1000))
+        self.assertEqual(result.max_rate, 50)
+
+    def test_search_start_too_high(self):
+        result = CapacitySearch(start_rate=100).search(self.measureWithLimit(30))
+        self.assertEqual([point['rate'] for point in result.curve][:3], [100, 50, 25])
+        self.assertLessEqual(result.max_rate, 30)
+
+    def test_search_max_rate(self):
+        result = CapacitySearch(start_rate=10, max_rate=100).search(self.measureWithLimit(1000))
+        self.assertEqual(result.max_rate, 100)
+        self.assertEqual([point['rate'] for point in result.curve], [10, 20, 40, 80, 100])
+
+    def test_run(self):
+        # fails 20% of calls above 40 cps and follows 'cset rate' and 'q' on the control port
+        sipp_binary = createFakeSipp(self,
+            'import socket, sys, time\n'
+            'args = dict(zip(sys.argv, sys.argv[1:]))\n'
+            'rate = float(args["-r"])\n'
+            'control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)\n'
+            'control.bind(("127.0.0.1", int(args["-cp"])))\n'
+            'control.settimeout(float(args["-fd"]))\n'
+            'stat = open(args["-stf"], "w")\n'
+            'stat.write("CallRate(P);SuccessfulCall(P);FailedCall(P);\\n")\n'
+            'while True:\n'
+            '    try:\n'
+            '        command = control.recv(100).decode()\n'
+            '        if command == "q":\n'
+            '            break\n'
+            '        rate = float(command.split()[-1])\n'
+            '    except socket.timeout:\n'
+            '        failed = int(rate / 5) if rate > 40 else 0\n'
+            '        stat.write("{};{};{};\\n".format(rate, int(rate) - failed, failed))\n'
+            '        stat.flush()\n', interpreter=sys.executable)
+
+        search = CapacitySearch(start_rate=10, step_s=0.3, settle_s=0.05, precision=0.1,
+                                poll_interval_s=0.02)
+        result = search.run(sipp_binary=sipp_binary, stat_frequency_s=0.05)
+        self.assertEqual(result.load_result.ret.returncode, 0)
+        self.assertNotIn(' -m ', result.load_result.command)
+        self.assertEqual([point['rate'] for point in result.curve][:4], [10, 20, 40, 80])
+        self.assertLessEqual(result.max_rate, 40)
+        self.assertGreaterEqual(result.max_rate, 36)
+        self.assertEqual(result.curve[0]['calls_per_second'], 10.0)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import sippft
+from sippft.__main__ import main
+from sippft.dialog import DialogIndex
+from sippft.parser import SIPpMessage
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logfile = os.path.join(self.directory, 'sip_msg.log')
+        start = datetime(2019, 6, 29, 19, 42, 16)
+        with open(self.logfile, 'wb') as f:
+            for i in range(30):
+                msg = SIPpMessage()
+                msg.datetime = start + timedelta(milliseconds=i)
+                msg.protocol = 'UDP'
+                msg.direction = 'sent' if i % 2 == 0 else 'received'
+                start_line = 'INVITE sip:s@h SIP/2.0' if i % 2 == 0 else 'SIP/2.0 200 OK'
+                msg.message = '{}\r\nCall-ID: {}\r\nCSeq: 1 INVITE\r\n\r\n'.format(start_line, i // 2)
+                f.write(msg.toLogEntry())
+
+    def runMain(self, argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            returncode = main(argv)
+        return returncode, output.getvalue()
+
+    def test_parse(self):
+        returncode, output = self.runMain(['parse', self.logfile, '--direction', 'received', '--status-code', '200'])
+        self.assertEqual(returncode, 0)
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 15)
+        self.assertEqual(lines[0], '2019-06-29 19:42:16.001000 received UDP SIP/2.0 200 OK')
+
+    def test_stats(self):
+        returncode, output = self.runMain(['stats', self.logfile])
+        self.assertEqual(returncode, 0)
+        report = json.loads(output)
+        self.assertEqual(report['messages'], 30)
+        self.assertEqual(report['calls'], 15)
+        self.assertEqual(report['direction'], {'received': 15, 'sent': 15})
+        self.assertEqual(report['method'], {'INVITE': 15})
+        self.assertEqual(report['status_code'], {'200': 15})
+        self.assertEqual(report['last'], '2019-06-29 19:42:16.029000')
+
+        returncode, output = self.runMain(['stats', self.logfile, '--processes', '2'])
+        sharded = json.loads(output)
+        self.assertEqual(sorted(sharded), sorted(report))
+        self.assertEqual([sharded['calls'], sharded['first'], sharded['last']], [None, None, None])
+        self.assertEqual({name: sharded[name] for name in ('messages', 'direction', 'method', 'status_code')},
+                         {name: report[name] for name in ('messages', 'direction', 'method', 'status_code')})
+
+    def test_run(self):
+        returncode, output = self.runMain(['run', '--sipp-binary', '/bin/true', '--remote-host', 'sut:5060',
+                                           '--count', '5', '--call-rate', '10'])
+        self.assertEqual(returncode, 0)
+        self.assertEqual(output.strip(), '/bin/true -r 10 -m 5 sut:5060')
+
+    def test_lazy_exports(self):
+        self.assertIs(sippft.SIPpMessage, SIPpMessage)
+        self.assertIn('SIPp', dir(sippft))
+        self.assertIs(sippft.DialogIndex, DialogIndex)
+        with self.assertRaises(AttributeError):
+            sippft.NotThere
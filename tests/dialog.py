@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+import unittest
+from datetime import datetime
+
+from sippft.dialog import DialogIndex
+from sippft.parser import SIPpMessage
+
+class TestDialogIndex(unittest.TestCase):
+    def createNewMsg(self, direction, message):
+        msg = SIPpMessage()
+        msg.datetime = datetime.now()
+        msg.protocol = 'UDP'
+        msg.direction = direction
+        msg.message = message
+        msg.length = len(message.encode('utf-8'))
+        return msg
+
+    def createRequest(self, direction, method, call_id, branch, cseq):
+        return self.createNewMsg(direction, ('{} sip:bob@biloxi.com SIP/2.0\r\n'
+                                             'Via: SIP/2.0/UDP pc33.atlanta.com;branch={}\r\n'
+                                             'Call-ID: {}\r\n'
+                                             'CSeq: {} {}\r\n'
+                                             '\r\n').format(method, branch, call_id, cseq, method))
+
+    def createResponse(self, direction, status, method, call_id, branch, cseq):
+        return self.createNewMsg(direction, ('SIP/2.0 {}\r\n'
+                                             'Via: SIP/2.0/UDP pc33.atlanta.com;branch={}\r\n'
+                                             ' ;received=192.0.2.1\r\n'
+                                             'Call-ID: {}\r\n'
+                                             'CSeq: {} {}\r\n'
+                                             '\r\n').format(status, branch, call_id, cseq, method))
+
+    def setUp(self):
+        self.messages = [
+            self.createRequest('sent', 'INVITE', 'call-1', 'z9hG4bK1', 1),
+            self.createRequest('sent', 'INVITE', 'call-2', 'z9hG4bK2', 1),
+            self.createRequest('received', 'INVITE', 'call-1', 'z9hG4bK1', 1),
+            self.createResponse('sent', '180 Ringing', 'INVITE', 'call-1', 'z9hG4bK1', 1),
+            self.createResponse('received', '100 Trying', 'INVITE', 'call-2', 'z9hG4bK2', 1),
+            self.createResponse('received', '180 Ringing', 'INVITE', 'call-1', 'z9hG4bK1', 1),
+            self.createResponse('received', '486 Busy Here', 'INVITE', 'call-2', 'z9hG4bK2', 1),
+            self.createRequest('sent', 'ACK', 'call-2', 'z9hG4bK2', 1),
+            self.createResponse('received', '200 OK', 'INVITE', 'call-1', 'z9hG4bK1', 1),
+            self.createRequest('sent', 'ACK', 'call-1', 'z9hG4bK3', 1),
+            self.createRequest('sent', 'BYE', 'call-1', 'z9hG4bK4', 2),
+            self.createResponse('received', '200 OK', 'BYE', 'call-1', 'z9hG4bK4', 2),
+        ]
+        self.index = DialogIndex(iter(self.messages))
+
+    def test_dialogs(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertIn('call-1', self.index)
+        self.assertNotIn('call-3', self.index)
+        self.assertEqual(self.index.get('call-3'), None)
+        self.assertEqual([dialog.call_id for dialog in self.index], ['call-1', 'call-2'])
+        self.assertEqual(len(self.index['call-1'].messages), 8)
+
+    def test_transactions(self):
+        dialog = self.index['call-1']
+        self.assertEqual(len(dialog.transactions), 3)
+        invite = dialog.transactions[('z9hG4bK1', 1, 'INVITE')]
+        self.assertEqual(len(invite.requests), 2)
+        self.assertEqual([msg.getStatusCode() for msg in invite.responses], [180, 180, 200])
+        self.assertEqual(len(dialog.getTransactions('BYE')), 1)
+        self.assertEqual(len(self.index['call-2'].transactions), 2)
+
+    def test_firstRequest(self):
+        dialog = self.index['call-1']
+        self.assertIs(dialog.firstRequest('INVITE'), self.messages[0])
+        self.assertIs(dialog.firstRequest('INVITE', direction='received'), self.messages[2])
+        self.assertEqual(dialog.firstRequest('CANCEL'), None)
+
+    def test_firstResponse(self):
+        dialog = self.index['call-1']
+        self.assertIs(dialog.firstProvisionalResponse(), self.messages[3])
+        self.assertIs(dialog.firstProvisionalResponse(direction='received'), self.messages[5])
+        self.assertIs(dialog.firstResponse('INVITE', status_code=180, direction='received'), self.messages[5])
+        self.assertIs(dialog.firstFinalResponse(), self.messages[8])
+        self.assertIs(dialog.firstFinalResponse('BYE'), self.messages[11])
+        self.assertIs(self.index['call-2'].firstFinalResponse(), self.messages[6])
+        self.assertEqual(dialog.firstResponse('INVITE', status_code=183), None)
+
+    def test_firstFinalResponseAuthentication(self):
+        # 407 to the first INVITE, 200 to the INVITE retried with credentials
+        messages = [
+            self.createRequest('sent', 'INVITE', 'call-3', 'z9hG4bK5', 1),
+            self.createResponse('received', '407 Proxy Authentication Required', 'INVITE', 'call-3', 'z9hG4bK5', 1),
+            self.createRequest('sent', 'ACK', 'call-3', 'z9hG4bK5', 1),
+            self.createRequest('sent', 'INVITE', 'call-3', 'z9hG4bK6', 2),
+            self.createResponse('received', '200 OK', 'INVITE', 'call-3', 'z9hG4bK6', 2),
+        ]
+        dialog = DialogIndex(messages)['call-3']
+        self.assertIs(dialog.firstFinalResponse(), messages[1])
+        self.assertIs(dialog.firstFinalResponse(direction='received'), messages[1])
+        self.assertEqual(dialog.firstFinalResponse(direction='sent'), None)
+
+    def test_getResponses(self):
+        self.assertEqual(self.index['call-2'].getResponses(4), [self.messages[6]])
+        self.assertEqual(self.index['call-1'].getResponses(4), [])
+        self.assertEqual(len(self.index['call-1'].getResponses(2)), 2)
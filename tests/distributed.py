@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from sippft.distributed import SIPpAgent, SIPpCoordinator, iterInjectionPart
+from sippft.pool import SIPpPool
+
+from .fixtures import createFakeSipp
+
+class TestDistributed(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # a sipp that reports -m calls at -r cps and logs one message per injection row
+        self.sipp_binary = createFakeSipp(self,
+            'while [ $# -gt 0 ]; do\n'
+            '  case "$1" in -stf) stf="$2";; -r) r="$2";; -m) m="$2";; -inf) inf="$2";;'
+            ' -message_file) log="$2";; -p) p="$2";; esac\n'
+            '  shift\n'
+            'done\n'
+            'echo "CallRate(C);TotalCallCreated;SuccessfulCall(C);FailedCall(C);" > "$stf"\n'
+            'echo "$r;$m;$m;0;" >> "$stf"\n'
+            'echo "Date_ms;response_time_ms;rtd_no" > uac_$$_rtt.csv\n'
+            'echo "1561805000839.845;$p;1;" >> uac_$$_rtt.csv\n'
+            'n=0\n'
+            'tail -n +2 "$inf" | while IFS=";" read user rest; do\n'
+            '  n=$((n + 1))\n'
+            '  printf -- "----------------------------------------------- 2019-06-29 19:42:%02d.000000\\n'
+            'UDP message sent (%d bytes):\\n\\nOPTIONS sip:%s@h SIP/2.0\\r\\nCall-ID: %s\\r\\n\\r\\n\\n\\n"'
+            ' "$n" $((37 + 2 * ${#user})) "$user" "$user" >> "$log"\n'
+            'done\n')
+        self.injection_file = os.path.join(self.directory, 'users.csv')
+        with open(self.injection_file, 'w') as f:
+            f.write('SEQUENTIAL\n' + ''.join('user{};pass\n'.format(i) for i in range(10)))
+
+        self.agents = []
+        for i in range(3):
+            agent = SIPpAgent(sipp_binary=self.sipp_binary, poll_interval_s=0.01)
+            agent.start()
+            self.addCleanup(agent.stop)
+            self.agents.append((agent.addr, agent.port))
+
+    def test_createSpecs(self):
+        coordinator = SIPpCoordinator(self.agents)
+        specs = coordinator.createSpecs(call_rate=300, count=100, remote_host='sut')
+        self.assertEqual([spec['count'] for spec in specs], [34, 33, 33])
+        self.assertEqual([spec['call_rate'] for spec in specs], [100.0] * 3)
+        self.assertEqual(specs[0]['remote_host'], 'sut')
+
+    def test_iterInjectionPart(self):
+        parts = [b''.join(iterInjectionPart(self.injection_file, index, 3, chunk_size=8)) for index in range(3)]
+        self.assertEqual(parts[1], b'SEQUENTIAL\nuser1;pass\nuser4;pass\nuser7;pass\n')
+        self.assertEqual(sum(part.count(b'\n') for part in parts), 10 + 3)
+
+    def test_run(self):
+        logfile_dir = os.path.join(self.directory, 'logs')
+        os.mkdir(logfile_dir)
+        stats = []
+        result = SIPpCoordinator(self.agents, chunk_size=16).run(
+            call_rate=30, count=10, logfile_dir=logfile_dir, scenario_file='tests/scenarios/uac-uas.xml',
+            injection_file=self.injection_file, on_stat=lambda index, row: stats.append(index))
+        self.assertEqual(result.ret.returncode, 0)
+        self.assertEqual(len(result.results), 3)
+        self.assertEqual(sorted(stats), [0, 1, 2])
+        self.assertEqual(result.total_calls, 10)
+        self.assertEqual(result.successful_calls, 10)
+        self.assertEqual(result.calls_per_second, 30.0)
+        self.assertEqual(result.failed_calls, 0)
+        # each agent's fake sipp reports its own SIP port as the response time
+        self.assertEqual(len(set(result.getResponseTimes())), 3)
+        self.assertIn('-sf ', result.results[0].command)
+
+        messages = list(result.iterMessages())
+        self.assertEqual(sorted(msg.getHeaderValues('Call-ID')[0] for msg in messages),
+                         sorted('user{}'.format(i) for i in range(10)))
+        self.assertEqual([msg.datetime for msg in messages], sorted(msg.datetime for msg in messages))
+
+    def test_agent_process(self):
+        port = SIPpPool.findFreePort()
+        proc = subprocess.Popen([sys.executable, '-m', 'sippft.distributed', '--port', str(port),
+                                 '--sipp-binary', self.sipp_binary, '--poll-interval-s', '0.01'],
+                                stdout=subprocess.PIPE, text=True)
+        self.addCleanup(proc.wait)
+        self.addCleanup(proc.kill)
+        self.assertEqual(proc.stdout.readline().strip(), 'agent listening on 127.0.0.1:{}'.format(port))
+        proc.stdout.close()
+        result = SIPpCoordinator(self.agents[:1] + [('127.0.0.1', port)]).run(
+            call_rate=10, count=4, injection_file=self.injection_file)
+        self.assertEqual([agent_result.total_calls for agent_result in result.results], [2, 2])
+
+    def test_refused_kwargs(self):
+        with self.assertRaisesRegex(ValueError, 'refused kwargs: sipp_binary'):
+            SIPpCoordinator(self.agents[:1]).run(sipp_binary='/bin/sh')
+
+    def test_agent_error(self):
+        with self.assertRaisesRegex(ValueError, 'agent 127.0.0.1:{}: .*address'.format(self.agents[0][1])):
+            SIPpCoordinator(self.agents[:1]).run(bind_sip_addr='192.0.2.1')
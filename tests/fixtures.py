@@ -0,0 +1,26 @@
+#!/usr/bin/python3
+''' Fixtures shared by the test modules.
+'''
+import os
+import tempfile
+
+# writes a message to the -message_file like sipp -trace_msg does
+MESSAGE_LOG_SCRIPT = (
+    'while [ $# -gt 0 ]; do\n'
+    '  case "$1" in -message_file) log="$2";; esac\n'
+    '  shift\n'
+    'done\n'
+    'printf -- "----------------------------------------------- 2019-06-29 19:42:16.839845\\n'
+    'UDP message sent (21 bytes):\\n\\nOPTIONS sip:a SIP/2.0\\n\\n" > "$log"\n')
+
+def createFakeSipp(testcase, script, interpreter='/bin/sh'):
+    ''' Writes an executable that stands in for sipp and runs script with
+        interpreter. The file is removed when testcase is cleaned up.
+    '''
+    directory = tempfile.TemporaryDirectory()
+    testcase.addCleanup(directory.cleanup)
+    path_to_file = os.path.join(directory.name, 'sipp')
+    with open(path_to_file, 'w') as f:
+        f.write('#!{}\n'.format(interpreter) + script)
+    os.chmod(path_to_file, 0o755)
+    return path_to_file
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+import os
+import time
+import unittest
+import uuid
+
+from sippft.follow import MessageLogFollower
+
+from .fixtures import createFakeSipp
+
+class TestMessageLogFollower(unittest.TestCase):
+    def setUp(self):
+        self.logfile = './logs/{}'.format(str(uuid.uuid4()))
+        self.addCleanup(lambda: os.path.isfile(self.logfile) and os.remove(self.logfile))
+
+    def formatMessage(self, status):
+        message = ('SIP/2.0 {}\r\n'
+                   'Call-ID: a84b4c76e66710\r\n'
+                   'CSeq: 1 INVITE\r\n'
+                   '\r\n').format(status)
+        return ('----------------------------------------------- 2019-06-29 19:42:16.839845\n'
+                'UDP message received ({} bytes):\n\n{}\n\n').format(len(message), message)
+
+    def test_poll(self):
+        with MessageLogFollower(self.logfile) as follower:
+            self.assertEqual(follower.poll(), [])
+            log = self.formatMessage('180 Ringing') + self.formatMessage('200 OK')
+            with open(self.logfile, 'w') as f:
+                f.write(log[:len(log) // 3])
+                f.flush()
+                self.assertEqual(follower.poll(), [])
+                f.write(log[len(log) // 3:len(log) // 3 * 2])
+                f.flush()
+                self.assertEqual([msg.getStatusCode() for msg in follower.poll()], [180])
+                f.write(log[len(log) // 3 * 2:])
+                f.flush()
+                self.assertEqual([msg.getStatusCode() for msg in follower.poll()], [200])
+            self.assertEqual(follower.finish(), [])
+            self.assertEqual(follower.message_count, 2)
+
+    def test_offset(self):
+        log = self.formatMessage('180 Ringing') + self.formatMessage('200 OK')
+        with open(self.logfile, 'w') as f:
+            f.write(log)
+        with MessageLogFollower(self.logfile, offset=len(log) // 4) as follower:
+            self.assertEqual([msg.getStatusCode() for msg in follower.finish()], [200])
+
+    def test_checks(self):
+        with open(self.logfile, 'w') as f:
+            f.write(self.formatMessage('180 Ringing') + self.formatMessage('486 Busy Here'))
+
+        def no_error_response(msg):
+            self.assertLess(msg.getStatusCode(), 400, 'error response')
+
+        with MessageLogFollower(self.logfile) as follower:
+            follower.addCheck(no_error_response)
+            follower.addCheck(lambda msg: msg.getStatusCode() != 180, name='no ringing')
+            follower.finish()
+        self.assertEqual([name for name, msg, error in follower.failures], ['no ringing', 'no_error_response'])
+        self.assertRaisesRegex(AssertionError, 'no ringing', follower.assertPassed)
+
+    def test_run_stops_on_failure(self):
+        with open(self.logfile + '.src', 'w') as f:
+            f.write(self.formatMessage('486 Busy Here'))
+        self.addCleanup(os.remove, self.logfile + '.src')
+        # writes one message and would then keep running for 10 seconds
+        sipp_binary = createFakeSipp(self, 'while [ "$1" != "-message_file" ]; do shift; done\n'
+                                     'cat "$2.src" > "$2"\n'
+                                     'exec sleep 10\n')
+        with MessageLogFollower(self.logfile) as follower:
+            follower.addCheck(lambda msg: msg.getStatusCode() < 400, name='no error response')
+            started = time.monotonic()
+            ret, command = follower.run(sipp_binary=sipp_binary, timeout_s=20)
+            self.assertLess(time.monotonic() - started, 5)
+        self.assertNotEqual(ret.returncode, 0)
+        self.assertIn('-message_file {}'.format(self.logfile), command)
+        self.assertEqual(len(follower.failures), 1)
+
+    def test_run_log_compression(self):
+        with MessageLogFollower(self.logfile) as follower:
+            with self.assertRaises(ValueError):
+                follower.run(log_compression='gzip')
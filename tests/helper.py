@@ -1,218 +1,22 @@
 #!/usr/bin/python3
-import re
 import subprocess
-import csv
 import unittest
 import uuid
 import os
+import asyncio
+import gc
+import tempfile
+import io
+import gzip
+import bz2
+import lzma
+import shutil
 from datetime import datetime
 
-class SIPp():
-
-    @staticmethod
-    def helper_run_a_sipp(**kwargs):
-        timeout_s = kwargs.get('timeout_s', 10)
-        remote_host = kwargs.get('remote_host', 'localhost')
-        scenario_file = kwargs.get('scenario_file', None)
-        request_service = kwargs.get('request_service', None)
-        duration_msec = kwargs.get('duration_msec', None)
-        logfile_path = kwargs.get('logfile_path', None)
-        injection_file = kwargs.get('injection_file', None)
-        embedded_scenario = kwargs.get('embedded_scenario', None)
-        bind_sip_addr = kwargs.get('bind_sip_addr', None)
-        bind_sip_port = kwargs.get('bind_sip_port', None)
-        bind_media_addr = kwargs.get('bind_media_addr', None)
-        bind_media_port = kwargs.get('bind_media_port', None)
-        call_rate = kwargs.get('call_rate', None)
-        count = kwargs.get('count', 1)
-
-        # create sipp command line
-        command = ['sipp']
-        if scenario_file:
-            command.append('-sf')
-            command.append(str(scenario_file))
-        if injection_file:
-            command.append('-inf')
-            command.append(str(injection_file))
-        if request_service:
-            command.append('-s')
-            command.append(str(request_service))
-        if duration_msec:
-            command.append('-d')
-            command.append(str(duration_msec))
-        if bind_sip_addr:
-            command.append('-i')
-            command.append(str(bind_sip_addr))
-        if bind_sip_port:
-            command.append('-p')
-            command.append(str(bind_sip_port))
-        if bind_media_addr:
-            command.append('-mi')
-            command.append(str(bind_media_addr))
-        if bind_media_port:
-            command.append('-mp')
-            command.append(str(bind_media_port))
-        if logfile_path:
-            command.append('-trace_msg')
-            command.append('-message_file')
-            command.append(str(logfile_path))
-        if embedded_scenario:
-            command.append('-sn')
-            command.append(str(embedded_scenario))
-        if call_rate:
-            command.append('-r')
-            command.append(str(call_rate))
-        if count:
-            command.append('-m')
-            command.append(str(count))
-        command.append(str(remote_host))
-
-        # append in front timeout command
-        runnable = ['timeout', str(timeout_s)] + command
-        # execute sipp program with headless mode
-        ret = subprocess.run(runnable, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        # return value of subprocess results and executed command line
-        return ret, " ".join(command)
-
-    @staticmethod
-    def helper_create_injection(mode="SEQUENTIAL",
-                                printf=None, printfmultiple=None, printfoffset=None,
-                                content=None):
-        if not printf and (printfmultiple or printfoffset):
-            return None
-
-        return_str=str(mode)
-        if printf:
-            return_str+=',PRINTF={}'.format(str(printf))
-        if printfmultiple:
-            return_str+=',PRINTFMULTIPLE={}'.format(str(printfmultiple))
-        if printfoffset:
-            return_str+=',PRINTFOFFSET={}'.format(str(printfoffset))
-        return_str+="\n"
-        if content:
-            for a_line in content:
-                return_str+=";".join(a_line)+"\n"
-        return return_str.strip()
-
-    @staticmethod
-    def helper_write_injection_file(content_as_str, path_to_file):
-        with open(path_to_file, 'w') as f:
-            f.write(content_as_str)
-
-class SIPpMessage():
-    message = ''
-    datetime = None
-    direction = None
-    protocol = None
-    length = 0
-
-    def getStatusCode(self):
-        status_line = self.message.split('\n')[0].strip()
-        try:
-            return int(status_line.split(' ')[1])
-        except ValueError:
-            pass
-        return None
-
-    def getStatusPhrease(self):
-        status_line = self.message.split('\n')[0].strip()
-        return " ".join(status_line.split(' ')[2:])
-
-    def getMethod(self):
-        request_line = self.message.split('\n')[0].strip()
-        return request_line.split(' ')[0]
-
-    def getRequstURI(self):
-        request_line = self.message.split('\n')[0].strip()
-        return request_line.split(' ')[1]
-
-    def getHeaderValues(self, header_name):
-        header_values=[]
-
-        temp=[]
-        renew_msg = ''
-        for line in self.message.split('\n'):
-            if line.strip() == '':
-                break
-            if line[0] == ' ' or line[0] == '\t':
-                renew_msg=renew_msg.rstrip()
-            renew_msg+=line.strip()+'\r\n'
-
-        renew_msg = renew_msg.strip()
-        for line in renew_msg.split('\n'):
-            kv = line.split(':', 1)
-            kv.append('')
-
-            key = kv[0].strip().lower()
-            value = kv[1].strip()
-
-            if header_name.lower() == key:
-                header_values.append(value)
-
-        return header_values
-
-    def __str__(self):
-        msg=''
-        arrow = '<'
-        if self.direction == 'sent':
-            arrow = '>'
-        msg += '-- {}\n'.format(self.datetime)
-        for line in self.message.split('\n'):
-            msg+='{} {}\n'.format(arrow, line)
-        return msg
+from sippft.parser import SIPpMessage, SIPpMessageStore
+from sippft.runner import SIPp, SIPpLogPipe
 
-    @staticmethod
-    def parseMessagesFromLogfile(filepath):
-        #'----------------------------------------------- 2019-06-29 19:42:16.839845'
-        re_delim_and_timestamp=re.compile(r'^-[-]+ ([\d]{4}-[\d]{2}-[\d]{2}) '
-                                           '([\d]{2}:[\d]{2}:[\d]{2}\.[\d]{6}).*$')
-        #'UDP message sent (442 bytes):'
-        re_message_protocol=re.compile(r'^(UDP|TCP|SCTP) message (sent|received) '
-                                        '[^\d]*([\d]+)[^\d]*bytes.*$')
-
-        messages = []
-        pointer=None
-        # check sip messages
-        with open(filepath, 'r') as f:
-            for line in f.read().split('\n'):
-                match_deli = re_delim_and_timestamp.match(line)
-                match_prot = re_message_protocol.match(line)
-
-                if match_deli:
-                    date = match_deli.group(1)
-                    time = match_deli.group(2)
-                    obj = SIPpMessage()
-                    obj.datetime = datetime.strptime('{} {}'.format(date, time), 
-                                                     "%Y-%m-%d %H:%M:%S.%f")
-
-                    messages.append(obj)
-                    pointer=messages[-1]
-
-                elif match_prot:
-                    pointer.protocol = match_prot.group(1)
-                    pointer.direction = match_prot.group(2)
-                    pointer.length = int(match_prot.group(3))
-
-                else:
-                    pointer.message += line+'\n'
-                    pointer.message = pointer.message.lstrip()
-
-
-        for msg in messages:
-            msg.message = ((msg.message.lstrip().encode('utf-8'))[:msg.length]).decode('utf-8')
-
-        return messages
-
-    @staticmethod
-    def messagesFilter(messages, direction=None, method=None, status_code=None):
-        newmessages=[]
-        for msg in messages:
-            if direction != None and msg.direction == direction or \
-               method != None and msg.getMethod() == method or \
-               status_code != None and msg.getStatusCode() == status_code:
-                newmessages.append(msg)
-        return newmessages
+from .fixtures import MESSAGE_LOG_SCRIPT, createFakeSipp
 
 class TestSIPp(unittest.TestCase):
     def test_helper_run_a_sipp_no_options(self):
@@ -284,10 +88,133 @@ class TestSIPp(unittest.TestCase):
         ret, command = SIPp.helper_run_a_sipp(count=20)
         self.assertIn('-m 20 ', command)
 
+    def test_helper_run_a_sipp_statistics_options(self):
+        ret, command = SIPp.helper_run_a_sipp(stat_file='/dev/null', stat_frequency_s=1,
+                                              trace_rtt=True, rtt_frequency=10, error_file='/dev/null')
+        self.assertIn('-trace_stat -stf /dev/null ', command)
+        self.assertIn('-fd 1 ', command)
+        self.assertIn('-trace_rtt ', command)
+        self.assertIn('-rtt_freq 10 ', command)
+        self.assertIn('-trace_err -error_file /dev/null ', command)
+
+    def test_helper_run_a_sipp_cp_options(self):
+        ret, command = SIPp.helper_run_a_sipp(control_port=8889)
+        self.assertIn('-cp 8889 ', command)
+
     def test_helper_run_a_sipp_timeout(self):
         ret, command = SIPp.helper_run_a_sipp(timeout_s=0.000001)
         self.assertEqual(ret.returncode, 124)
 
+    def test_helper_create_command(self):
+        runnable, command = SIPp.helper_create_command(timeout_s=3, bind_sip_port=5062)
+        self.assertEqual(runnable[:2], ['timeout', '3'])
+        self.assertEqual(runnable[2:], command)
+        self.assertEqual(command, ['sipp', '-p', '5062', '-m', '1', 'localhost'])
+
+    def test_helper_create_command_sipp_binary(self):
+        runnable, command = SIPp.helper_create_command(sipp_binary='/opt/sipp/bin/sipp')
+        self.assertEqual(command[0], '/opt/sipp/bin/sipp')
+
+    def test_helper_run_a_sipp_log_compression(self):
+        sipp_binary = createFakeSipp(self, MESSAGE_LOG_SCRIPT)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for compression in ('gzip', 'xz'):
+            logfile_path = os.path.join(directory.name, 'sip_msg.log.' + compression)
+            ret, command = SIPp.helper_run_a_sipp(sipp_binary=sipp_binary, logfile_path=logfile_path,
+                                                  log_compression=compression)
+            self.assertEqual(ret.returncode, 0)
+            self.assertNotIn(logfile_path, command)
+            self.assertTrue(SIPpMessage.isCompressedLogfile(logfile_path))
+            messages = SIPpMessage.parseMessagesFromLogfile(logfile_path)
+            self.assertEqual([msg.getMethod() for msg in messages], ['OPTIONS'])
+        self.assertEqual(sorted(os.listdir(directory.name)), ['sip_msg.log.gzip', 'sip_msg.log.xz'])
+
+    def test_logPipeMissingCompressor(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        logfile_path = os.path.join(directory.name, 'sip_msg.log.zst')
+        log_pipe = SIPpLogPipe(logfile_path, compression='zstd')
+        log_pipe.compressors = {'zstd': [os.path.join(directory.name, 'zstd')]}
+        with self.assertRaises(OSError):
+            log_pipe.open()
+        self.assertEqual(os.listdir(directory.name), [])
+        self.assertFalse(os.path.exists(os.path.dirname(log_pipe.fifo_path)))
+        self.assertIsNone(log_pipe._writer)
+
+    def test_logPipeWithoutWriter(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        logfile_path = os.path.join(directory.name, 'sip_msg.log.gz')
+        with SIPpLogPipe(logfile_path) as log_pipe:
+            self.assertTrue(os.path.exists(log_pipe.fifo_path))
+        self.assertFalse(os.path.exists(log_pipe.fifo_path))
+        self.assertEqual(SIPpMessage.parseMessagesFromLogfile(logfile_path), [])
+
+    def test_helper_run_a_sipp_async(self):
+        sipp_binary = createFakeSipp(self, 'echo "$@"\necho error >&2\nexit 3\n')
+        stdout = []
+        stderr = []
+        ret, command = asyncio.run(SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary, bind_sip_port=5062,
+                                                                on_stdout=stdout.append,
+                                                                on_stderr=stderr.append))
+        self.assertEqual(ret.returncode, 3)
+        self.assertIn('-p 5062 ', command)
+        self.assertEqual(stdout, ['-p 5062 -m 1 localhost'])
+        self.assertEqual(stderr, ['error'])
+
+    def test_helper_run_a_sipp_async_timeout(self):
+        sipp_binary = createFakeSipp(self, 'exec sleep 10\n')
+        ret, command = asyncio.run(SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary, timeout_s=0.1))
+        self.assertEqual(ret.returncode, 124)
+
+    def test_helper_run_a_sipp_async_cancel(self):
+        sipp_binary = createFakeSipp(self, 'exec sleep 10\n')
+
+        errors = []
+
+        async def run_and_cancel():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            task = asyncio.ensure_future(SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # futures that were never retrieved are reported when they are collected
+            gc.collect()
+
+        asyncio.run(run_and_cancel())
+        self.assertEqual(errors, [])
+
+    def test_helper_run_a_sipp_async_callback_error(self):
+        sipp_binary = createFakeSipp(self, 'echo $$\nexec sleep 10\n')
+        pids = []
+
+        def on_stdout(line):
+            pids.append(int(line))
+            raise ValueError(line)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary, on_stdout=on_stdout))
+        # the process has been killed and reaped
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pids[0], 0)
+
+    def test_helper_run_a_sipp_async_gather(self):
+        sipp_binary = createFakeSipp(self, 'echo "$@"\n')
+        outputs = []
+
+        async def run_uas_and_uac():
+            return await asyncio.gather(
+                SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary, embedded_scenario='uas',
+                                             on_stdout=outputs.append),
+                SIPp.helper_run_a_sipp_async(sipp_binary=sipp_binary, embedded_scenario='uac',
+                                             on_stdout=outputs.append))
+
+        results = asyncio.run(run_uas_and_uac())
+        self.assertEqual([ret.returncode for ret, command in results], [0, 0])
+        self.assertEqual(sorted(outputs), ['-sn uac -m 1 localhost', '-sn uas -m 1 localhost'])
+
     def test_helper_create_injection_sequential(self):
         injection_content=[
             ["tst1234","example.com","192.168.0.1",
@@ -354,6 +281,37 @@ class TestSIPp(unittest.TestCase):
                                                        printfmultiple=10, printfoffset=10)
         self.assertEqual(None, filecontent_str)
 
+    def test_helper_create_injection_escape(self):
+        filecontent_str = SIPp.helper_create_injection(content=[['a;b', 'c']])
+        self.assertEqual(filecontent_str.split('\n')[1], 'a\\;b;c')
+
+    def test_helper_injection_range(self):
+        rows = SIPp.helper_injection_range(['user%04d', 'example.com', '%d'], 8, 11)
+        self.assertEqual(list(rows), [['user0008', 'example.com', '8'],
+                                      ['user0009', 'example.com', '9'],
+                                      ['user0010', 'example.com', '10']])
+
+    def test_helper_write_injection_rows(self):
+        path_to_file = './inputs/{}'.format(str(uuid.uuid4()))
+        try:
+            count = SIPp.helper_write_injection_rows(
+                (['user{}'.format(i), 'a;b'] for i in range(3)),
+                path_to_file=path_to_file, mode='RANDOM', printf=2, buffer_size=16)
+            self.assertEqual(count, 3)
+            with open(path_to_file) as f:
+                content = f.read()
+            self.assertEqual(content, 'RANDOM,PRINTF=2\nuser0;a\\;b\nuser1;a\\;b\nuser2;a\\;b\n')
+            self.assertEqual(content.strip(), SIPp.helper_create_injection(
+                mode='RANDOM', printf=2, content=[['user{}'.format(i), 'a;b'] for i in range(3)]))
+        finally:
+            if os.path.isfile(path_to_file):
+                os.remove(path_to_file)
+
+    def test_helper_write_injection_rows_invalid(self):
+        path_to_file = './inputs/{}'.format(str(uuid.uuid4()))
+        self.assertEqual(SIPp.helper_write_injection_rows([], path_to_file, printfoffset=10), None)
+        self.assertFalse(os.path.isfile(path_to_file))
+
     def test_helper_write_injection_file(self):
         content_as_str = 'ACCCDCCCVDYHJKOIHJJKJLK!@#$%12346'
         path_to_file = './inputs/{}'.format(str(uuid.uuid4()))
@@ -464,6 +422,95 @@ class TestSIPpMessage(unittest.TestCase):
                          'branch=z9hG4bKnashds8;received=192.0.2.1',
                          self.msg.getHeaderValues('Via')[2])
 
+    def test_getHeaderValuesCompactForm(self):
+        self.msg.message = ('SIP/2.0 200 OK\r\n'
+                            'v: SIP/2.0/UDP pc33.atlanta.com;branch=z9hG4bKnashds8\r\n'
+                            'f: Alice <sip:alice@atlanta.com>;tag=1928301774\r\n'
+                            't: Bob <sip:bob@biloxi.com>\r\n'
+                            '\t;tag=a6c85cf\r\n'
+                            'i: a84b4c76e66710\r\n'
+                            'm: <sip:bob@192.0.2.4>\r\n'
+                            'l: 0\r\n'
+                            '\r\n')
+        self.assertEqual(['Alice <sip:alice@atlanta.com>;tag=1928301774'], self.msg.getHeaderValues('From'))
+        self.assertEqual(['Bob <sip:bob@biloxi.com>;tag=a6c85cf'], self.msg.getHeaderValues('to'))
+        self.assertEqual(['a84b4c76e66710'], self.msg.getHeaderValues('Call-ID'))
+        self.assertEqual(['a84b4c76e66710'], self.msg.getHeaderValues('i'))
+        self.assertEqual(['<sip:bob@192.0.2.4>'], self.msg.getHeaderValues('Contact'))
+        self.assertEqual(['0'], self.msg.getHeaderValues('Content-Length'))
+        self.assertEqual(1, len(self.msg.getHeaderValues('Via')))
+
+    def test_getHeaders(self):
+        self.setResponseMessage(self.msg)
+        headers = self.msg.getHeaders()
+        self.assertIs(headers, self.msg.getHeaders())
+        self.assertIn('call-id', headers)
+        self.assertIn('i', headers)
+        self.assertNotIn('Route', headers)
+        self.assertEqual('a84b4c76e66710', headers['CALL-ID'])
+        self.assertEqual('314159 INVITE', headers.getFirst('cseq'))
+        self.assertEqual(None, headers.getFirst('route'))
+        self.assertRaises(KeyError, lambda: headers['route'])
+        self.assertEqual(9, len(headers))
+        self.assertEqual(('To', 'Bob <sip:bob@biloxi.com>;tag=a6c85cf'), list(headers)[3])
+
+    def test_getHeadersResetOnNewMessage(self):
+        self.setResponseMessage(self.msg)
+        self.assertEqual(181, self.msg.getStatusCode())
+        self.setRequestMessage(self.msg)
+        self.assertEqual('INVITE', self.msg.getMethod())
+        self.assertEqual(['Bob <bob@biloxi.com>'], self.msg.getHeaderValues('To'))
+
+    def test_getBody(self):
+        self.setRequestMessage(self.msg)
+        self.assertEqual('INVITE sip:bob@biloxi.com SIP/2.0', self.msg.getStartLine())
+        self.assertTrue(self.msg.getBody().startswith('v=0\r\n'))
+        self.assertTrue(self.msg.getBody().endswith('a=rtpmap:0 PCMU/8000'))
+        self.setResponseMessage(self.msg)
+        self.assertEqual('', self.msg.getBody())
+
+    def test_getSDP(self):
+        self.setRequestMessage(self.msg)
+        sdp = self.msg.getSDP()
+        self.assertIs(self.msg.getSDP(), sdp)
+        self.assertEqual(sdp.version, '0')
+        self.assertEqual(sdp.session_name, 'Session SDP')
+        self.assertEqual(sdp.connection, 'pc33.atlanta.com')
+        self.assertEqual(sdp.getDirection(), 'sendrecv')
+        audio = sdp.getMedia('audio')
+        self.assertEqual((audio.port, audio.proto, audio.formats), (49172, 'RTP/AVP', ['0']))
+        self.assertEqual(audio.connection, 'pc33.atlanta.com')
+        self.assertEqual(audio.getCodecs(), ['PCMU/8000'])
+        self.assertEqual(sdp.getMedia('video'), None)
+        self.setResponseMessage(self.msg)
+        self.assertEqual(self.msg.getSDP(), None)
+
+    def test_getSDPMediaSections(self):
+        self.msg.message = ('SIP/2.0 200 OK\r\n'
+                            'c: application/sdp\r\n'
+                            '\r\n'
+                            'v=0\r\n'
+                            'c=IN IP4 192.0.2.1\r\n'
+                            'a=sendonly\r\n'
+                            'm=audio 6000/2 RTP/AVP 8 96 18\r\n'
+                            'a=rtpmap:96 opus/48000/2\r\n'
+                            'a=fmtp:96 useinbandfec=1\r\n'
+                            'a=inactive\r\n'
+                            'm=video 6002 RTP/AVP 97\r\n'
+                            'c=IN IP4 192.0.2.2\r\n')
+        sdp = self.msg.getSDP()
+        self.assertEqual(sdp.getDirection(), 'sendonly')
+        audio, video = sdp.media
+        self.assertEqual(audio.port_count, 2)
+        self.assertEqual(audio.getCodecs(), ['PCMA/8000', 'opus/48000/2', 'G729/8000'])
+        self.assertEqual(audio.fmtp, {'96': 'useinbandfec=1'})
+        self.assertEqual(audio.getDirection(), 'inactive')
+        self.assertEqual(audio.connection, '192.0.2.1')
+        self.assertEqual(video.connection, '192.0.2.2')
+        self.assertEqual(video.getCodecs(), ['97'])
+        self.msg.message = 'SIP/2.0 200 OK\r\nContent-Type: text/plain\r\n\r\nv=0\r\n'
+        self.assertEqual(self.msg.getSDP(), None)
+
     def test_messagesFilter(self):
         msg1 = self.createNewMsg()
         msg1.direction = 'sent'
@@ -503,6 +550,198 @@ class TestSIPpMessage(unittest.TestCase):
         new_messages = SIPpMessage.messagesFilter(messages, status_code=180)
         self.assertEqual(len(new_messages), 0)
 
+        new_messages = SIPpMessage.messagesFilter(messages, direction='sent', status_code=181)
+        self.assertEqual(len(new_messages), 0)
+
+        new_messages = SIPpMessage.messagesFilter(messages, direction='received', status_code=181)
+        self.assertEqual(len(new_messages), 2)
+
+        new_messages = SIPpMessage.messagesFilter(messages)
+        self.assertEqual(len(new_messages), 3)
+
+    def writeLogfile(self, messages):
+        path_to_file = './logs/{}'.format(str(uuid.uuid4()))
+        self.addCleanup(lambda: os.path.isfile(path_to_file) and os.remove(path_to_file))
+        with open(path_to_file, 'wb') as f:
+            for timestamp, protocol, direction, message in messages:
+                raw = message.encode('utf-8')
+                f.write('----------------------------------------------- {}\n'
+                        '{} message {} ({} bytes):\n\n'.format(timestamp, protocol, direction, len(raw))
+                        .encode('utf-8'))
+                f.write(raw)
+                f.write(b'\n\n')
+        return path_to_file
+
+    def test_iterMessagesFromLogfile(self):
+        self.setRequestMessage(self.msg)
+        request = self.msg.message
+        self.setResponseMessage(self.msg)
+        response = self.msg.message.replace('Bob', 'B\u00f6b')
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', request),
+                                          ('2019-06-29 19:42:16.840001', 'TCP', 'received', response)])
+
+        iterator = SIPpMessage.iterMessagesFromLogfile(path_to_file, chunk_size=64)
+        first = next(iterator)
+        self.assertEqual(first.datetime, datetime(2019, 6, 29, 19, 42, 16, 839845))
+        self.assertEqual(first.protocol, 'UDP')
+        self.assertEqual(first.direction, 'sent')
+        self.assertEqual(first.length, len(request.encode('utf-8')))
+        self.assertEqual(first.message, request)
+        second = next(iterator)
+        self.assertEqual(second.protocol, 'TCP')
+        self.assertEqual(second.direction, 'received')
+        self.assertEqual(second.message, response)
+        self.assertEqual(second.getHeaderValues('To')[0], 'B\u00f6b <sip:bob@biloxi.com>;tag=a6c85cf')
+        self.assertRaises(StopIteration, next, iterator)
+
+    def test_iterMessagesFromLogfileTruncated(self):
+        self.setResponseMessage(self.msg)
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'received', self.msg.message)])
+        with open(path_to_file, 'rb+') as f:
+            f.truncate(os.path.getsize(path_to_file) - 40)
+
+        messages = list(SIPpMessage.iterMessagesFromLogfile(path_to_file))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].getStatusCode(), 181)
+
+    def test_iterMessagesFromLogfileOversizedCount(self):
+        self.setRequestMessage(self.msg)
+        request = self.msg.message
+        self.setResponseMessage(self.msg)
+        response = self.msg.message
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', request),
+                                          ('2019-06-29 19:42:16.840001', 'UDP', 'received', response),
+                                          ('2019-06-29 19:42:16.840002', 'UDP', 'sent', request)])
+        # the first count is 200 bytes too large
+        with open(path_to_file, 'rb') as f:
+            raw = f.read()
+        count = '({} bytes)'.format(len(request.encode('utf-8'))).encode('utf-8')
+        with open(path_to_file, 'wb') as f:
+            f.write(raw.replace(count, '({} bytes)'.format(len(request.encode('utf-8')) + 200).encode('utf-8'), 1))
+
+        messages = list(SIPpMessage.iterMessagesFromLogfile(path_to_file))
+        self.assertEqual([msg.direction for msg in messages], ['sent', 'received', 'sent'])
+        self.assertTrue(messages[0].message.startswith(request))
+        self.assertNotIn('SIP/2.0 181', messages[0].message)
+        self.assertEqual(messages[1].message, response)
+        self.assertEqual(messages[2].message, request)
+        with SIPpMessageStore(path_to_file) as store:
+            self.assertEqual([msg.message for msg in store], [msg.message for msg in messages])
+
+    def test_parseMessagesFromLogfile(self):
+        self.setRequestMessage(self.msg)
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', self.msg.message),
+                                          ('2019-06-29 19:42:16.840001', 'UDP', 'received', self.msg.message)])
+        messages = SIPpMessage.parseMessagesFromLogfile(path_to_file)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual([msg.direction for msg in messages], ['sent', 'received'])
+        self.assertEqual(messages[1].message, self.msg.message)
+
+    def test_iterMessagesFromCompressedLogfile(self):
+        self.setRequestMessage(self.msg)
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', self.msg.message),
+                                          ('2019-06-29 19:42:16.840001', 'UDP', 'received', self.msg.message)])
+        with open(path_to_file, 'rb') as f:
+            raw = f.read()
+        for compression, compress in (('gzip', gzip.compress), ('bz2', bz2.compress), ('xz', lzma.compress)):
+            compressed_path = '{}.{}'.format(path_to_file, compression)
+            self.addCleanup(os.remove, compressed_path)
+            with open(compressed_path, 'wb') as f:
+                f.write(compress(raw))
+            self.assertTrue(SIPpMessage.isCompressedLogfile(compressed_path))
+            messages = SIPpMessage.parseMessagesFromLogfile(compressed_path, processes=2)
+            self.assertEqual([msg.direction for msg in messages], ['sent', 'received'])
+            self.assertEqual(messages[1].message, self.msg.message)
+        self.assertFalse(SIPpMessage.isCompressedLogfile(path_to_file))
+
+    def test_iterMessagesFromZstdLogfile(self):
+        self.setRequestMessage(self.msg)
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', self.msg.message)])
+        compressed_path = path_to_file + '.zst'
+        self.addCleanup(lambda: os.path.isfile(compressed_path) and os.remove(compressed_path))
+        if not shutil.which('zstd'):
+            self.skipTest('zstd is not installed')
+        subprocess.run(['zstd', '-q', path_to_file, '-o', compressed_path], check=True)
+        try:
+            import zstandard
+        except ImportError:
+            self.assertRaises(ValueError, SIPpMessage.parseMessagesFromLogfile, compressed_path)
+            return
+        messages = SIPpMessage.parseMessagesFromLogfile(compressed_path)
+        self.assertEqual(messages[0].message, self.msg.message)
+
+    def test_iterMessagesFromFileObject(self):
+        self.setRequestMessage(self.msg)
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', self.msg.message)])
+        with open(path_to_file, 'rb') as f:
+            raw = f.read()
+
+        class ReadOnly():
+            # a stream without peek or seek, like a socket file
+            def __init__(self, data):
+                self._stream = io.BytesIO(data)
+
+            def read(self, size=-1):
+                return self._stream.read(min(size, 7))
+
+        for f in (io.BytesIO(raw), io.BytesIO(gzip.compress(raw)), ReadOnly(gzip.compress(raw)), ReadOnly(raw)):
+            messages = SIPpMessage.parseMessagesFromLogfile(f)
+            self.assertEqual(len(messages), 1)
+            self.assertEqual(messages[0].message, self.msg.message)
+
+    def test_slots(self):
+        self.assertRaises(AttributeError, setattr, self.msg, 'unknown', 1)
+
+    def test_setBuffer(self):
+        self.setResponseMessage(self.msg)
+        raw = self.msg.message.encode('utf-8')
+        msg = self.createNewMsg()
+        msg.length = len(raw)
+        msg.setBuffer(b'garbage' + raw + b'garbage', offset=7)
+        self.assertEqual(msg.getRawMessage(), raw)
+        self.assertEqual(msg.getStatusCode(), 181)
+        msg.message = 'BYE sip:bob@biloxi.com SIP/2.0\r\n'
+        self.assertEqual(msg.getMethod(), 'BYE')
+
+    def test_messageStore(self):
+        self.setRequestMessage(self.msg)
+        request = self.msg.message
+        self.setResponseMessage(self.msg)
+        response = self.msg.message
+        path_to_file = self.writeLogfile([('2019-06-29 19:42:16.839845', 'UDP', 'sent', request),
+                                          ('2019-06-29 19:42:16.840001', 'UDP', 'received', response)])
+
+        with SIPpMessageStore(path_to_file) as store:
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store[0].datetime, datetime(2019, 6, 29, 19, 42, 16, 839845))
+            self.assertEqual(store[0].direction, 'sent')
+            self.assertEqual(store[0].message, request)
+            self.assertEqual(store[1].direction, 'received')
+            self.assertEqual(store[1].getStatusCode(), 181)
+            self.assertEqual([msg.message for msg in store],
+                             [msg.message for msg in SIPpMessage.parseMessagesFromLogfile(path_to_file)])
+
+    def test_messageStoreEmpty(self):
+        path_to_file = self.writeLogfile([])
+        with SIPpMessageStore(path_to_file) as store:
+            self.assertEqual(len(store), 0)
+
+    def test_toLogEntry(self):
+        self.setResponseMessage(self.msg)
+        self.msg.datetime = datetime(2019, 6, 29, 19, 42, 16)
+        entry = self.msg.toLogEntry()
+        self.assertTrue(entry.startswith(b'----------------------------------------------- '
+                                         b'2019-06-29 19:42:16.000000\nUDP message received ['))
+        path_to_file = self.writeLogfile([])
+        with open(path_to_file, 'wb') as f:
+            f.write(entry)
+            self.msg.direction = 'sent'
+            f.write(self.msg.toLogEntry())
+        messages = SIPpMessage.parseMessagesFromLogfile(path_to_file)
+        self.assertEqual([msg.direction for msg in messages], ['received', 'sent'])
+        self.assertEqual(messages[0].message, self.msg.message)
+        self.assertEqual(messages[1].datetime, self.msg.datetime)
+
     def test_as_str(self):
         self.setRequestMessage(self.msg)
         dump = str(self.msg)
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+from datetime import datetime
+
+from sippft.instrument import Instrumentation, InstrumentedTestResult, JsonLinesSink, MemorySink, main
+from sippft.parser import SIPpMessage
+from sippft.runner import SIPp
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logfile = os.path.join(self.directory, 'sip_msg.log')
+        with open(self.logfile, 'wb') as f:
+            for direction, start_line in (('sent', 'INVITE sip:s@h SIP/2.0'), ('received', 'SIP/2.0 200 OK')):
+                msg = SIPpMessage()
+                msg.datetime = datetime(2019, 6, 29, 19, 42, 16)
+                msg.direction = direction
+                msg.protocol = 'UDP'
+                msg.message = '{}\r\nCall-ID: 1\r\n\r\n'.format(start_line)
+                f.write(msg.toLogEntry())
+
+    def test_install(self):
+        original = SIPpMessage.__dict__['parseMessagesFromLogfile']
+        sink = MemorySink()
+        with Instrumentation(sink) as instrumentation:
+            instrumentation.context = 'a test'
+            messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+            SIPpMessage.messagesFilter(messages, direction='received')
+            messages[1].getStatusCode()
+            messages[1].getHeaderValues('Call-ID')
+        self.assertIs(SIPpMessage.__dict__['parseMessagesFromLogfile'], original)
+
+        self.assertEqual([record['name'] for record in sink.records],
+                         ['SIPpMessage.parseMessagesFromLogfile', 'SIPpMessage.messagesFilter'])
+        parse = sink.records[0]
+        self.assertEqual(parse['messages'], 2)
+        self.assertEqual(parse['bytes'], os.path.getsize(self.logfile))
+        self.assertEqual(parse['test'], 'a test')
+        self.assertGreaterEqual(parse['cpu_s'], 0)
+        self.assertEqual(instrumentation.totals['SIPpMessage.getStatusCode']['calls'], 1)
+        self.assertIn('SIPpMessage.parseMessagesFromLogfile', instrumentation.summary())
+
+    def test_run_a_sipp(self):
+        sink_path = os.path.join(self.directory, 'profile.jsonl')
+        with Instrumentation(JsonLinesSink(sink_path), profile=True, trace_memory=True):
+            SIPp.helper_run_a_sipp(sipp_binary='/bin/true', logfile_path=self.logfile)
+            asyncio.run(SIPp.helper_run_a_sipp_async(sipp_binary='/bin/true'))
+        with open(sink_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['name'] for record in records],
+                         ['SIPp.helper_run_a_sipp', 'SIPp.helper_run_a_sipp_async'])
+        self.assertEqual(records[0]['returncode'], 0)
+        self.assertEqual(records[0]['bytes'], os.path.getsize(self.logfile))
+        self.assertIn('function calls', records[0]['profile'])
+        self.assertIn('memory_peak_bytes', records[1])
+
+    def test_testResult(self):
+        class Sample(unittest.TestCase):
+            def test_parse(inner):
+                SIPpMessage.parseMessagesFromLogfile(self.logfile)
+
+        instrumentation = Instrumentation()
+        result_class = type('Result', (InstrumentedTestResult,), {'instrumentation': instrumentation})
+        with instrumentation:
+            unittest.TextTestRunner(stream=io.StringIO(), resultclass=result_class).run(
+                unittest.defaultTestLoader.loadTestsFromTestCase(Sample))
+        records = instrumentation.sink.records
+        self.assertEqual([record['name'] for record in records], ['SIPpMessage.parseMessagesFromLogfile', 'test'])
+        self.assertTrue(records[0]['test'].endswith('Sample.test_parse'))
+        self.assertEqual(records[1]['outcome'], 'success')
+
+    def test_main_discovers_tests(self):
+        suites = []
+
+        class CollectingRunner():
+            # collects the suite instead of running it, which would run this test again
+            def __init__(self, **kwargs):
+                pass
+
+            def run(self, suite):
+                suites.append(suite)
+                return unittest.TestResult()
+
+        def flatten(suite):
+            for test in suite:
+                if isinstance(test, unittest.TestSuite):
+                    yield from flatten(test)
+                else:
+                    yield test
+
+        with unittest.mock.patch.object(unittest, 'TextTestRunner', CollectingRunner), \
+                contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main([]), 0)
+        ids = [test.id() for test in flatten(suites[0])]
+        self.assertEqual([test_id for test_id in ids if test_id.startswith('unittest.loader.')], [])
+        modules = set(test_id.split('.')[1] for test_id in ids)
+        self.assertLessEqual({'cache', 'distributed', 'helper', 'instrument', 'pcap', 'session'}, modules)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+import os
+import tempfile
+import unittest
+
+from sippft.load import CsvFollower, SIPpLoadRunner
+from sippft.parser import SIPpMessage
+
+from .fixtures import MESSAGE_LOG_SCRIPT, createFakeSipp
+
+class TestSIPpLoadRunner(unittest.TestCase):
+    def setUp(self):
+        # writes two statistics rows, four response times and an error like sipp does
+        self.sipp_binary = createFakeSipp(self,
+            'while [ $# -gt 0 ]; do\n'
+            '  case "$1" in -stf) stf="$2";; -error_file) err="$2";; esac\n'
+            '  shift\n'
+            'done\n'
+            'echo "TargetRate;CallRate(P);CallRate(C);TotalCallCreated;'
+            'SuccessfulCall(P);SuccessfulCall(C);FailedCall(P);FailedCall(C);" > "$stf"\n'
+            'echo "10;9.5;9.5;10;9;9;1;1;" >> "$stf"\n'
+            'echo "Date_ms;response_time_ms;rtd_no" > uac_$$_rtt.csv\n'
+            'for t in 12.5 8 40 160; do echo "1561805000839.845;$t;1;" >> uac_$$_rtt.csv; done\n'
+            'echo "10;10.5;10.0;20;10;19;0;1;" >> "$stf"\n'
+            'echo "2019-06-29 19:42:16.839845 Aborting call on unexpected message" > "$err"\n')
+
+    def test_run(self):
+        rows = []
+        runner = SIPpLoadRunner(poll_interval_s=0.01, on_stat=rows.append)
+        result = runner.run(sipp_binary=self.sipp_binary, scenario_file='tests/scenarios/uac-uas.xml',
+                            call_rate=10, count=20)
+        self.assertEqual(result.ret.returncode, 0)
+        self.assertIn('-trace_stat -stf ', result.command)
+        self.assertIn('-trace_rtt -rtt_freq 1 ', result.command)
+        self.assertIn('-sf {} '.format(os.path.abspath('tests/scenarios/uac-uas.xml')), result.command)
+        self.assertEqual(len(result.stats), 2)
+        self.assertEqual(rows, result.stats)
+        self.assertEqual(result.calls_per_second, 10.0)
+        self.assertEqual(result.total_calls, 20)
+        self.assertEqual(result.successful_calls, 19)
+        self.assertEqual(result.failed_calls, 1)
+        self.assertEqual(result.getResponseTimes(), [8.0, 12.5, 40.0, 160.0])
+        self.assertEqual(result.percentile(50), 12.5)
+        self.assertEqual(result.percentile(99), 160.0)
+        self.assertEqual(result.percentile(99, rtd=2), None)
+        self.assertEqual(result.histogram(), [1, 1, 0, 1, 0, 0, 0, 1, 0])
+        self.assertEqual(len(result.errors), 1)
+        self.assertIsNone(runner.output_dir)
+
+    def test_run_log_compression(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        logfile_path = os.path.join(directory.name, 'sip_msg.log.gz')
+        result = SIPpLoadRunner(poll_interval_s=0.01).run(sipp_binary=createFakeSipp(self, MESSAGE_LOG_SCRIPT),
+                                                          logfile_path=logfile_path, log_compression='gzip')
+        self.assertEqual(result.ret.returncode, 0)
+        self.assertTrue(SIPpMessage.isCompressedLogfile(logfile_path))
+        self.assertEqual([msg.getMethod() for msg in SIPpMessage.parseMessagesFromLogfile(logfile_path)],
+                         ['OPTIONS'])
+
+    def test_csvFollower(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path_to_file = os.path.join(directory.name, 'stat.csv')
+        follower = CsvFollower(path_to_file)
+        self.assertEqual(follower.poll(), [])
+        with open(path_to_file, 'w') as f:
+            f.write('A;B;\n1;2')
+            f.flush()
+            self.assertEqual(follower.poll(), [])
+            f.write(';\n3;4;\n')
+            f.flush()
+            self.assertEqual(follower.poll(), [{'A': '1', 'B': '2'}, {'A': '3', 'B': '4'}])
+        follower.close()
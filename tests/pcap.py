@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+import io
+import gzip
+import socket
+import struct
+import unittest
+import uuid
+import os
+from datetime import datetime, timedelta
+
+from sippft.dialog import DialogIndex
+from sippft.parser import SIPpMessage
+from sippft.pcap import LINKTYPE_ETHERNET, LINKTYPE_RAW, parseMessagesFromPcap
+
+class TestPcap(unittest.TestCase):
+    local = '192.0.2.1'
+    remote = '192.0.2.2'
+
+    def setUp(self):
+        self.start = datetime.fromtimestamp(1561805000) + timedelta(microseconds=839845)
+        body = 'v=0\r\nm=audio 49172 RTP/AVP 0\r\n'
+        self.invite = ('INVITE sip:bob@biloxi.com SIP/2.0\r\n'
+                       'Call-ID: a84b4c76e66710\r\n'
+                       'CSeq: 1 INVITE\r\n'
+                       'Content-Type: application/sdp\r\n'
+                       'Content-Length: {}\r\n'
+                       '\r\n'
+                       '{}').format(len(body), body).encode('utf-8')
+        self.ok = ('SIP/2.0 200 OK\r\n'
+                   'Call-ID: a84b4c76e66710\r\n'
+                   'CSeq: 1 INVITE\r\n'
+                   'l: 0\r\n'
+                   '\r\n').encode('utf-8')
+
+    @staticmethod
+    def ipv4(src, dst, protocol, payload, identification=1, offset=0, more_fragments=False):
+        flags_offset = (0x2000 if more_fragments else 0) | (offset // 8)
+        return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), identification, flags_offset, 64,
+                           protocol, 0, socket.inet_pton(socket.AF_INET, src),
+                           socket.inet_pton(socket.AF_INET, dst)) + payload
+
+    @staticmethod
+    def ipv6(src, dst, next_header, payload):
+        return struct.pack('!IHBB16s16s', 6 << 28, len(payload), next_header, 64,
+                           socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst)) + payload
+
+    @staticmethod
+    def udp(sport, dport, payload):
+        return struct.pack('!HHHH', sport, dport, 8 + len(payload), 0) + payload
+
+    @staticmethod
+    def tcp(sport, dport, seq, payload, flags=0x18):
+        return struct.pack('!HHIIBBHHH', sport, dport, seq, 0, 5 << 4, flags, 65535, 0, 0) + payload
+
+    @staticmethod
+    def ethernet(packet, ethertype=0x0800):
+        return b'\x00\x11\x22\x33\x44\x55' * 2 + struct.pack('!H', ethertype) + packet
+
+    def writePcap(self, frames, linktype=LINKTYPE_ETHERNET):
+        f = io.BytesIO()
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, linktype))
+        for i, frame in enumerate(frames):
+            timestamp = self.start + timedelta(milliseconds=i)
+            seconds = int(timestamp.timestamp())
+            f.write(struct.pack('<IIII', seconds, timestamp.microsecond, len(frame), len(frame)) + frame)
+        return f.getvalue()
+
+    def writePcapng(self, frames, linktype=LINKTYPE_ETHERNET):
+        def block(kind, body):
+            body += b'\x00' * (-len(body) % 4)
+            return struct.pack('<II', kind, len(body) + 12) + body + struct.pack('<I', len(body) + 12)
+        # nanosecond timestamps through if_tsresol
+        data = block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+        data += block(1, struct.pack('<HHI', linktype, 0, 65535) + struct.pack('<HHB3x', 9, 1, 9) + b'\x00' * 4)
+        for i, frame in enumerate(frames):
+            timestamp = self.start + timedelta(milliseconds=i)
+            nanoseconds = int(timestamp.timestamp()) * 10 ** 9 + timestamp.microsecond * 1000
+            data += block(6, struct.pack('<IIIII', 0, nanoseconds >> 32, nanoseconds & 0xffffffff,
+                                         len(frame), len(frame)) + frame)
+        return data
+
+    def test_udp(self):
+        frames = [self.ethernet(self.ipv4(self.local, self.remote, 17, self.udp(5060, 5062, self.invite))),
+                  self.ethernet(self.ipv4(self.remote, self.local, 17, self.udp(5062, 5060, self.ok))),
+                  # RTP is not SIP
+                  self.ethernet(self.ipv4(self.local, self.remote, 17, self.udp(6000, 6002, b'\x80' * 40)))]
+        for capture in (self.writePcap(frames), self.writePcapng(frames)):
+            messages = parseMessagesFromPcap(io.BytesIO(capture), local_addresses=[self.local])
+            self.assertEqual([(msg.direction, msg.protocol) for msg in messages],
+                             [('sent', 'UDP'), ('received', 'UDP')])
+            self.assertEqual(messages[0].datetime, self.start)
+            self.assertEqual(messages[1].datetime, self.start + timedelta(milliseconds=1))
+            self.assertEqual(messages[0].length, len(self.invite))
+            self.assertEqual(messages[0].getRawMessage(), self.invite)
+            self.assertEqual(messages[0].getSDP().getMedia('audio').port, 49172)
+            self.assertEqual(messages[1].getStatusCode(), 200)
+
+        dialog = DialogIndex(messages).getDialogs()[0]
+        self.assertIs(dialog.firstResponse('INVITE', status_code=200, direction='received'), messages[1])
+
+    def test_tcp(self):
+        both = self.invite + b'\r\n\r\n' + self.ok
+        frames = [self.tcp(5060, 5062, 999, b'', flags=0x02),
+                  # out of order, with a retransmitted segment
+                  self.tcp(5060, 5062, 1000 + 40, both[40:100]),
+                  self.tcp(5060, 5062, 1000, both[:40]),
+                  self.tcp(5060, 5062, 1000, both[:40]),
+                  self.tcp(5060, 5062, 1000 + 100, both[100:], flags=0x19)]
+        capture = self.writePcap([self.ipv4(self.local, self.remote, 6, frame) for frame in frames], LINKTYPE_RAW)
+        messages = parseMessagesFromPcap(io.BytesIO(capture), local_addresses=['192.0.2.1:5060'])
+        self.assertEqual([msg.getRawMessage() for msg in messages], [self.invite, self.ok])
+        self.assertEqual([msg.direction for msg in messages], ['sent', 'sent'])
+        self.assertEqual(messages[0].protocol, 'TCP')
+        self.assertEqual(messages[0].datetime, self.start + timedelta(milliseconds=4))
+
+    def test_tcp_midstream(self):
+        frames = [self.tcp(5060, 5062, 5000, b'tail of an earlier message\r\n' + self.ok[:10]),
+                  self.tcp(5060, 5062, 5000 + 38, self.ok[10:])]
+        capture = self.writePcap([self.ipv4(self.local, self.remote, 6, frame) for frame in frames], LINKTYPE_RAW)
+        self.assertEqual([msg.getRawMessage() for msg in parseMessagesFromPcap(io.BytesIO(capture))], [self.ok])
+
+    def test_ipv4_fragments(self):
+        datagram = self.udp(5062, 5060, self.invite)
+        fragments = [self.ipv4(self.remote, self.local, 17, datagram[:48], identification=7, more_fragments=True),
+                     self.ipv4(self.remote, self.local, 17, datagram[96:], identification=7, offset=96),
+                     self.ipv4(self.remote, self.local, 17, datagram[48:96], identification=7, offset=48,
+                               more_fragments=True)]
+        capture = self.writePcap([self.ethernet(fragment) for fragment in fragments])
+        messages = parseMessagesFromPcap(io.BytesIO(capture), local_addresses=[self.local])
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].getRawMessage(), self.invite)
+        self.assertEqual(messages[0].direction, 'received')
+        self.assertEqual(messages[0].datetime, self.start + timedelta(milliseconds=2))
+
+    def test_ipv6(self):
+        datagram = self.udp(5060, 5062, self.ok)
+        fragment_header = struct.pack('!BBHI', 17, 0, 0 | 1, 9)
+        last_header = struct.pack('!BBHI', 17, 0, 32, 9)
+        frames = [self.ethernet(self.ipv6('2001:db8::1', '2001:db8::2', 17, datagram), 0x86dd),
+                  self.ethernet(self.ipv6('2001:db8::2', '2001:db8::1', 44, fragment_header + datagram[:32]), 0x86dd),
+                  self.ethernet(self.ipv6('2001:db8::2', '2001:db8::1', 44, last_header + datagram[32:]), 0x86dd)]
+        messages = parseMessagesFromPcap(io.BytesIO(self.writePcap(frames)),
+                                         local_addresses=['[2001:db8::1]:5060'])
+        self.assertEqual([msg.direction for msg in messages], ['sent', None])
+        self.assertEqual([msg.getRawMessage() for msg in messages], [self.ok, self.ok])
+
+    def test_parseMessagesFromLogfile(self):
+        frames = [self.ethernet(self.ipv4(self.local, self.remote, 17, self.udp(5060, 5062, self.invite)))]
+        path_to_file = './logs/{}.pcap.gz'.format(uuid.uuid4())
+        self.addCleanup(os.remove, path_to_file)
+        with gzip.open(path_to_file, 'wb') as f:
+            f.write(self.writePcap(frames))
+        messages = SIPpMessage.parseMessagesFromLogfile(path_to_file, local_addresses=[self.local])
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].direction, 'sent')
+        self.assertEqual(SIPpMessage.messagesFilter(messages, method='INVITE'), messages)
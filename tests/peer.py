@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+import asyncio
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from sippft.dialog import DialogIndex
+from sippft.load import SIPpLoadRunner
+from sippft.parser import SIPpMessage
+from sippft.peer import SIPPeer, createPeerBinary, parseArguments
+from sippft.pool import SIPpPool
+from sippft.runner import SIPp
+
+class TestSIPPeer(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logfile = os.path.join(self.directory, 'sip_msg.log')
+
+    def test_loopback(self):
+        async def run():
+            async with SIPPeer(bind_sip_port=0, logfile_path=self.logfile) as peer:
+                result = await peer.runCalls('127.0.0.1:{}'.format(peer.bind_sip_port), count=3, rate=100,
+                                             service='0312341234', rows=[('user1', 'Joe')])
+            return result
+        self.assertEqual(asyncio.run(run()), (3, 0))
+
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        # every message of the loopback is logged once sent and once received
+        self.assertEqual(len(messages), 3 * 12)
+        self.assertEqual([msg.direction for msg in messages[:2]], ['sent', 'received'])
+        self.assertEqual(messages[0].getRawMessage(), messages[1].getRawMessage())
+
+        dialogs = DialogIndex(messages).getDialogs()
+        self.assertEqual(len(dialogs), 3)
+        invite = dialogs[0].firstRequest('INVITE', direction='sent')
+        ringing = dialogs[0].firstResponse('INVITE', status_code=180, direction='received')
+        self.assertEqual(invite.getHeaderValues('From'), ringing.getHeaderValues('From'))
+        self.assertNotIn(';tag=', invite.getHeaderValues('To')[0])
+        self.assertIn(';tag=', ringing.getHeaderValues('To')[0])
+        self.assertIn('m=audio 6000 RTP/AVP 0', invite.getBody())
+        received = SIPpMessage.messagesFilter(messages, direction='received')
+        self.assertEqual(received[-1].getStatusCode(), 200)
+
+    def test_busy(self):
+        async def run():
+            async with SIPPeer(bind_sip_port=0, final_code=486) as uas, \
+                       SIPPeer(bind_sip_port=0, logfile_path=self.logfile) as uac:
+                result = await uac.call('127.0.0.1:{}'.format(uas.bind_sip_port))
+            return result, uas.answered
+        self.assertEqual(asyncio.run(run()), (False, 1))
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        self.assertEqual([(msg.direction, msg.getStatusCode() or msg.getMethod()) for msg in messages],
+                         [('sent', 'INVITE'), ('received', 180), ('received', 486), ('sent', 'ACK')])
+        self.assertEqual(messages[0].getHeaderValues('Via'), messages[-1].getHeaderValues('Via'))
+
+    def test_retransmission(self):
+        async def run():
+            async with SIPPeer(bind_sip_port=0, logfile_path=self.logfile) as uac:
+                uac.T1_S = 0.01
+                uac.transaction_timeout_s = 0.1
+                # nothing listens on the port of a closed peer
+                async with SIPPeer(bind_sip_port=0) as gone:
+                    remote_host = '127.0.0.1:{}'.format(gone.bind_sip_port)
+                return await uac.call(remote_host)
+        self.assertFalse(asyncio.run(run()))
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        self.assertGreater(len(messages), 1)
+        self.assertEqual(set(msg.getMethod() for msg in messages), {'INVITE'})
+
+    def test_peer_binary(self):
+        sipp_binary = createPeerBinary(os.path.join(self.directory, 'sipp'))
+        injection_file = os.path.join(self.directory, 'inf.csv')
+        SIPp.helper_write_injection_file(SIPp.helper_create_injection(content=[['user1', 'Joe']]),
+                                         path_to_file=injection_file)
+        ret, command = SIPp.helper_run_a_sipp(sipp_binary=sipp_binary, remote_host='localhost:15062',
+                                              scenario_file='tests/scenarios/uac-uas.xml',
+                                              request_service='0312341234', injection_file=injection_file,
+                                              bind_sip_addr='127.0.0.1', bind_sip_port=15062,
+                                              logfile_path=self.logfile, count=2, call_rate=50)
+        self.assertEqual(ret.returncode, 0)
+        messages = SIPpMessage.messagesFilter(SIPpMessage.parseMessagesFromLogfile(self.logfile),
+                                              direction='received')
+        self.assertEqual(len(messages), 2 * 6)
+        self.assertEqual(messages[-1].getStatusCode(), 200)
+        self.assertIn('Joe <sip:user1@127.0.0.1:15062>', messages[0].getHeaderValues('From')[0])
+
+    def test_parseArguments(self):
+        # the options written by SIPpLoadRunner take values that are not the remote host
+        runnable, command = SIPp.helper_create_command(remote_host='localhost:15062', bind_media_addr='127.0.0.1',
+                                                       stat_file='stat.csv', stat_frequency_s=1, trace_rtt=True,
+                                                       rtt_frequency=1, error_file='errors.log', control_port=8888)
+        args = parseArguments(command[1:])
+        self.assertEqual(args.remote_host, 'localhost:15062')
+        self.assertEqual(args.m, 1)
+        with self.assertRaises(SystemExit), open(os.devnull, 'w') as devnull, \
+                unittest.mock.patch('sys.stderr', devnull):
+            # abbreviations of the options are not taken
+            parseArguments(['-trace', 'localhost'])
+
+    def test_load_runner_peer_binary(self):
+        sipp_binary = createPeerBinary(os.path.join(self.directory, 'sipp'))
+        port = SIPpPool.findFreePort()
+        result = SIPpLoadRunner(output_dir=self.directory, poll_interval_s=0.1).run(
+            sipp_binary=sipp_binary, remote_host='localhost:{}'.format(port), bind_sip_addr='127.0.0.1',
+            bind_sip_port=port, logfile_path=self.logfile, count=2, call_rate=50)
+        self.assertEqual(result.ret.returncode, 0)
+        self.assertIn(' -stf ', result.command)
+        received = SIPpMessage.messagesFilter(SIPpMessage.parseMessagesFromLogfile(self.logfile), direction='received')
+        self.assertEqual(len(received), 2 * 6)
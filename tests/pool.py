@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+import os
+import socket
+import tempfile
+import unittest
+import unittest.mock
+
+from sippft.parser import SIPpMessage
+from sippft.pool import SIPpPool
+
+from .fixtures import MESSAGE_LOG_SCRIPT, createFakeSipp
+
+class TestSIPpPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = SIPpPool(max_workers=4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_findFreePort(self):
+        port = SIPpPool.findFreePort()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+            udp.bind(('127.0.0.1', port))
+
+    def test_allocatePort(self):
+        ports = [self.pool.allocatePort(span=4) for i in range(10)]
+        reserved = set()
+        for port in ports:
+            self.assertFalse(set(range(port, port + 4)) & reserved)
+            reserved |= set(range(port, port + 4))
+        for port in ports:
+            self.pool.releasePort(port, span=4)
+        self.assertEqual(self.pool._reserved, set())
+
+    def test_allocatePortBusySpan(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as busy:
+            busy.bind(('127.0.0.1', 0))
+            # the first candidate is free itself but the port after it is taken
+            candidate = busy.getsockname()[1] - 1
+            other = SIPpPool.findFreePort()
+            with unittest.mock.patch.object(SIPpPool, 'findFreePort', side_effect=[candidate, other]):
+                self.assertEqual(self.pool.allocatePort(span=4), other)
+        self.assertEqual(self.pool._reserved, set(range(other, other + 4)))
+
+    def test_submit(self):
+        ret, command = self.pool.submit(timeout_s=0.000001, remote_host=SIPpPool.LOOPBACK).result()
+        self.assertEqual(ret.returncode, 124)
+        self.assertRegex(command, r'^sipp')
+        self.assertRegex(command, r'-i 127\.0\.0\.1 -p (\d+) -mp \d+ .*127\.0\.0\.1:\1$')
+        self.assertEqual(self.pool._reserved, set())
+
+    def test_submit_given_ports(self):
+        ret, command = self.pool.submit(timeout_s=0.000001, bind_sip_port=5062,
+                                        bind_media_port=60600).result()
+        self.assertIn('-p 5062 ', command)
+        self.assertIn('-mp 60600 ', command)
+        self.assertRegex(command, r' localhost$')
+
+    def test_submit_log_compression(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        logfile_path = os.path.join(directory.name, 'sip_msg.log.gz')
+        ret, command = self.pool.submit(sipp_binary=createFakeSipp(self, MESSAGE_LOG_SCRIPT),
+                                        logfile_path=logfile_path, log_compression='gzip').result()
+        self.assertEqual(ret.returncode, 0)
+        self.assertNotIn(logfile_path, command)
+        self.assertTrue(SIPpMessage.isCompressedLogfile(logfile_path))
+        self.assertEqual([msg.getMethod() for msg in SIPpMessage.parseMessagesFromLogfile(logfile_path)],
+                         ['OPTIONS'])
+
+    def test_map(self):
+        results = self.pool.map([{'timeout_s': 0.000001, 'request_service': str(i)} for i in range(8)])
+        self.assertEqual(len(results), 8)
+        for i, (ret, command) in enumerate(results):
+            self.assertEqual(ret.returncode, 124)
+            self.assertIn('-s {} '.format(i), command)
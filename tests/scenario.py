@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+import os
+import tempfile
+import unittest
+
+from sippft.parser import SIPpMessage
+from sippft.runner import SIPp
+from sippft.scenario import Scenario
+
+class TestScenario(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.scenario = Scenario.load('tests/scenarios/uac-uas.xml')
+
+    def writeFile(self, name, content):
+        path_to_file = os.path.join(self.directory, name)
+        with open(path_to_file, 'w') as f:
+            f.write(content)
+        return path_to_file
+
+    def writeMessages(self, flow, call_id='1'):
+        messages = []
+        for direction, start_line in flow:
+            msg = SIPpMessage()
+            msg.direction = direction
+            msg.message = '{}\r\nCall-ID: {}\r\n\r\n'.format(start_line, call_id)
+            messages.append(msg)
+        return messages
+
+    def test_load(self):
+        self.assertIs(Scenario.load('tests/scenarios/uac-uas.xml'), self.scenario)
+        self.assertEqual(self.scenario.name, 'Basic Sipstone UAC')
+        self.assertEqual(self.scenario.fieldCount(), 2)
+        self.assertIn('last_Via:', self.scenario.keywords)
+        self.assertEqual(self.scenario.validate(), [])
+        self.assertEqual([repr(step) for step in self.scenario.expectedFlow()][:5],
+                         ['send INVITE', 'recv INVITE', 'send 180', 'recv 100 (optional)', 'recv 180'])
+        self.assertEqual([step.kind for step in self.scenario.steps].count('pause'), 1)
+        invite = self.scenario.steps[0]
+        self.assertTrue(invite.message.startswith('INVITE sip:[service]@[remote_ip]:[remote_port] SIP/2.0\nVia:'))
+
+    def test_reload(self):
+        path_to_file = self.writeFile('s.xml', '<scenario><send><![CDATA[\n  OPTIONS sip:a SIP/2.0\n]]></send></scenario>')
+        self.assertEqual(Scenario.load(path_to_file).expectedFlow()[0].method, 'OPTIONS')
+        self.writeFile('s.xml', '<scenario><recv response="200"/><recv request="BYE"/></scenario>')
+        self.assertEqual([repr(step) for step in Scenario.load(path_to_file).expectedFlow()],
+                         ['recv 200', 'recv BYE'])
+
+    def test_validate(self):
+        path_to_file = self.writeFile('bad.xml', '<scenario><send><![CDATA[\n  [srvice]\n]]></send>'
+                                                 '<recv repsonse="200"/></scenario>')
+        problems = Scenario.load(path_to_file).validate()
+        self.assertEqual(problems, ['step 0: send has no SIP start line',
+                                    'step 1: recv needs a request or a numeric response',
+                                    'step 0: unknown keyword [srvice]'])
+        with self.assertRaises(ValueError):
+            Scenario.load(self.writeFile('broken.xml', '<scenario><send></scenario>'))
+
+    def test_validate_injection(self):
+        good = self.writeFile('good.csv', SIPp.helper_create_injection(content=[['user1', 'Joe']]))
+        short = self.writeFile('short.csv', SIPp.helper_create_injection(content=[['user1', 'Joe'], ['user2']]))
+        self.assertEqual(self.scenario.validate(good), [])
+        self.assertEqual(self.scenario.validate(short), ['{} line 3: 1 fields, the scenario uses 2'.format(short)])
+        with self.assertRaises(ValueError):
+            SIPp.helper_create_command(scenario_file='tests/scenarios/uac-uas.xml', injection_file=short,
+                                       validate_scenario=True)
+        # validation is opt-in
+        runnable, command = SIPp.helper_create_command(scenario_file='tests/scenarios/uac-uas.xml',
+                                                       injection_file=short)
+        self.assertIn('-inf', command)
+
+    def test_validate_addresses(self):
+        path_to_file = self.writeFile('ipv6.xml', '<scenario><send><![CDATA[\n'
+                                                  '  OPTIONS sip:[service]@[::1] SIP/2.0\n'
+                                                  '  Via: SIP/2.0/UDP [2001:db8::1]:5060;branch=[branch]\n'
+                                                  '  Contact: <sip:[fe80:0:0:0:0:0:0:1]:5060>\n'
+                                                  '  X-Index: [msg_index]\n'
+                                                  ']]></send></scenario>')
+        scenario = Scenario.load(path_to_file)
+        self.assertEqual(list(scenario.keywords), ['service', 'branch', 'msg_index'])
+        self.assertEqual(scenario.validate(), [])
+
+    def test_checkFlow(self):
+        loopback = []
+        for start_line in ('INVITE sip:s@h SIP/2.0', 'SIP/2.0 180 Ringing', 'SIP/2.0 200 OK',
+                           'ACK sip:s@h SIP/2.0', 'BYE sip:s@h SIP/2.0', 'SIP/2.0 200 OK'):
+            loopback += [('sent', start_line), ('received', start_line)]
+        self.assertEqual(self.scenario.checkFlow(self.writeMessages(loopback)), [])
+        # a retransmitted 200 OK
+        retransmitted = loopback[:6] + loopback[4:6] + loopback[6:]
+        self.scenario.assertFlow(self.writeMessages(retransmitted, '2'))
+
+        problems = self.scenario.checkFlow(self.writeMessages(loopback[:4] + loopback[6:], '3'))
+        self.assertEqual(problems, ['3: sent ACK where send 200 was expected'])
+        problems = self.scenario.checkFlow(self.writeMessages(loopback[:-1], '4'))
+        self.assertEqual(problems, ['4: missing recv 200'])
+        with self.assertRaises(AssertionError):
+            self.scenario.assertFlow(self.writeMessages(loopback[:-1]))
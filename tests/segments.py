@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sippft.parser import SIPpMessage
+from sippft.segments import LogSegmentIndex, RotatedMessageLog, findLogSegments
+
+class TestRotatedMessageLog(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logfile = os.path.join(self.directory, 'sip_msg.log')
+        self.start = datetime(2019, 6, 29, 19, 42, 16)
+        # three rotated segments of 40 messages and the live log with 20, one message per second
+        number = 0
+        for name, count in (('sip_msg.log_4242_1561805000', 40), ('sip_msg.log_4242_1561805040', 40),
+                            ('sip_msg.log_4242_1561805080', 40), ('sip_msg.log', 20)):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                for i in range(count):
+                    f.write(self.createMessage(number).toLogEntry())
+                    number += 1
+        with open(os.path.join(self.directory, 'other.log_1'), 'w') as f:
+            f.write('not a segment of this log')
+
+    def createMessage(self, number):
+        msg = SIPpMessage()
+        msg.datetime = self.start + timedelta(seconds=number)
+        msg.protocol = 'UDP'
+        msg.direction = 'sent'
+        msg.message = 'OPTIONS sip:{}@h SIP/2.0\r\nCall-ID: {}\r\n\r\n'.format(number, number)
+        return msg
+
+    def numbers(self, messages):
+        return [int(msg.getHeaderValues('Call-ID')[0]) for msg in messages]
+
+    def test_findLogSegments(self):
+        self.assertEqual(sorted(os.path.basename(path) for path in findLogSegments(self.logfile)),
+                         ['sip_msg.log', 'sip_msg.log_4242_1561805000', 'sip_msg.log_4242_1561805040',
+                          'sip_msg.log_4242_1561805080'])
+
+    def test_index(self):
+        index = LogSegmentIndex(self.logfile, interval_bytes=200)
+        self.assertEqual(index.first, self.start + timedelta(seconds=120))
+        self.assertEqual(index.last, self.start + timedelta(seconds=139))
+        self.assertGreater(len(index.offsets), 5)
+        self.assertLess(len(index.offsets), 20)
+        self.assertEqual(index.offsets[0], 0)
+        self.assertEqual(index.timestamps, sorted(index.timestamps))
+
+    def test_between(self):
+        log = RotatedMessageLog(self.logfile, interval_bytes=200)
+        messages = list(log.between(self.start + timedelta(seconds=35), self.start + timedelta(seconds=45)))
+        self.assertEqual(self.numbers(messages), list(range(35, 46)))
+        messages = list(log.between(self.start + timedelta(seconds=118.5), self.start + timedelta(hours=1)))
+        self.assertEqual(self.numbers(messages), list(range(119, 140)))
+        self.assertEqual(list(log.between(self.start - timedelta(hours=1), self.start - timedelta(seconds=1))), [])
+
+    def test_last(self):
+        log = RotatedMessageLog(self.logfile, interval_bytes=200)
+        self.assertEqual(self.numbers(log.last(5)), list(range(135, 140)))
+        self.assertEqual(self.numbers(log.last(30)), list(range(110, 140)))
+        self.assertEqual(self.numbers(log.last(1000)), list(range(140)))
+        self.assertEqual(self.numbers(log), list(range(140)))
+
+    def test_live_log(self):
+        log = RotatedMessageLog(self.logfile, interval_bytes=200)
+        self.assertEqual(self.numbers(log.last(1)), [139])
+        with open(self.logfile, 'ab') as f:
+            f.write(self.createMessage(140).toLogEntry())
+        self.assertEqual(self.numbers(log.last(1)), [140])
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from sippft.capacity import SIPpControl
+from sippft.pool import SIPpPool
+from sippft.session import SIPpSession
+
+from .fixtures import createFakeSipp
+
+class TestSIPpSession(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logfile = os.path.join(self.directory, 'sip_msg.log')
+        # places one INVITE/200/BYE/200 call per "rate" unit and second, like a loopback uac
+        self.sipp_binary = createFakeSipp(self,
+            'import socket, sys, time, datetime\n'
+            'args = dict(zip(sys.argv, sys.argv[1:]))\n'
+            'rate = float(args["-r"])\n'
+            'control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)\n'
+            'control.bind(("127.0.0.1", int(args["-cp"])))\n'
+            'control.settimeout(0.01)\n'
+            'log = open(args["-message_file"], "w")\n'
+            'call = 0\n'
+            'def write(direction, message):\n'
+            '    message = message.replace("\\n", "\\r\\n")\n'
+            '    log.write("----------------------------------------------- {}\\n"\n'
+            '              "UDP message {} ({} bytes):\\n\\n{}\\n\\n".format(\n'
+            '              datetime.datetime.now().isoformat(" ", "microseconds"), direction, len(message), message))\n'
+            '    log.flush()\n'
+            'while True:\n'
+            '    try:\n'
+            '        command = control.recv(100).decode()\n'
+            '        if not command:\n'
+            '            continue\n'
+            '        if command == "q":\n'
+            '            break\n'
+            '        rate = float(command.split()[-1])\n'
+            '    except socket.timeout:\n'
+            '        pass\n'
+            '    if rate:\n'
+            '        call += 1\n'
+            '        for direction, line, cseq in (("sent", "INVITE sip:s@h SIP/2.0", "1 INVITE"),\n'
+            '                                      ("received", "SIP/2.0 200 OK", "1 INVITE"),\n'
+            '                                      ("sent", "BYE sip:s@h SIP/2.0", "2 BYE"),\n'
+            '                                      ("received", "SIP/2.0 200 OK", "2 BYE")):\n'
+            '            write(direction, "{}\\nCall-ID: {}\\nCSeq: {}\\n\\n".format(line, call, cseq))\n'
+            '        time.sleep(1 / rate)\n', interpreter=sys.executable)
+
+    def test_waitControlPort(self):
+        session = SIPpSession(grace_s=0.2)
+        session.proc = subprocess.Popen(['sleep', '5'])
+        self.addCleanup(session.proc.wait)
+        self.addCleanup(session.proc.kill)
+        session.control = SIPpControl(SIPpPool.findFreePort())
+        self.addCleanup(session.control.close)
+        self.assertFalse(session._waitControlPort())
+        # the probe leaves the port to the process that binds it
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listener:
+            listener.bind(('127.0.0.1', session.control.port))
+            self.assertTrue(session._waitControlPort())
+            self.assertEqual(listener.recv(100), b'')
+
+    def test_runCalls(self):
+        with SIPpSession(sipp_binary=self.sipp_binary, logfile_path=self.logfile) as session:
+            self.assertIn('-r 0 ', session.command)
+            self.assertNotIn(' -m ', session.command)
+            messages = session.runCalls(count=2, rate=50, timeout_s=5)
+            call_ids = set(msg.getHeaderValues('Call-ID')[0] for msg in messages)
+            self.assertGreaterEqual(len(call_ids), 2)
+            self.assertEqual(len(messages) % 4, 0)
+
+            messages = session.runCalls(count=1, rate=50, timeout_s=5)
+            self.assertFalse(call_ids & set(msg.getHeaderValues('Call-ID')[0] for msg in messages))
+            self.assertTrue(session.isRunning())
+        self.assertFalse(session.isRunning())
+
+    def test_log_compression(self):
+        with self.assertRaises(ValueError):
+            SIPpSession(sipp_binary=self.sipp_binary, logfile_path=self.logfile, log_compression='gzip')
+
+    def test_mark(self):
+        with SIPpSession(sipp_binary=self.sipp_binary, logfile_path=self.logfile) as session:
+            session.runCalls(count=1, rate=50, timeout_s=5)
+            self.assertGreater(len(session.getMessages()), 0)
+            session.mark()
+            self.assertEqual(session.getMessages(), [])
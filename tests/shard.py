@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+import os
+import unittest
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sippft.parser import SIPpMessage
+from sippft.shard import aggregateMessagesInShards, findShardRanges, parseMessagesInShards, re_delim_line
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.logfile = './logs/{}'.format(str(uuid.uuid4()))
+        self.addCleanup(lambda: os.path.isfile(self.logfile) and os.remove(self.logfile))
+        start = datetime(2019, 6, 29, 19, 42, 16)
+        with open(self.logfile, 'wb') as f:
+            for i in range(200):
+                if i % 3 == 0:
+                    message = 'INVITE sip:bob@biloxi.com SIP/2.0\r\nCall-ID: {}\r\n\r\n'.format(i)
+                else:
+                    message = 'SIP/2.0 {} État\r\nCall-ID: {}\r\n\r\n'.format(180 if i % 3 == 1 else 200, i)
+                raw = message.encode('utf-8')
+                timestamp = (start + timedelta(milliseconds=i)).isoformat(' ', 'microseconds')
+                f.write('----------------------------------------------- {}\n'
+                        'UDP message {} ({} bytes):\n\n'.format(timestamp, 'sent' if i % 2 else 'received',
+                                                               len(raw)).encode('utf-8'))
+                f.write(raw + b'\n\n')
+
+    def test_findShardRanges(self):
+        ranges = findShardRanges(self.logfile, 7, chunk_size=16)
+        self.assertEqual(len(ranges), 7)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.logfile))
+        with open(self.logfile, 'rb') as f:
+            data = f.read()
+        for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertTrue(re_delim_line.match(data, next_start))
+
+    def test_findShardRangesSmallFile(self):
+        self.assertEqual(len(findShardRanges(self.logfile, 10000)), 200)
+
+    def test_parseMessagesInShards(self):
+        expected = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        messages = parseMessagesInShards(self.logfile, processes=2, shards=7)
+        self.assertEqual(len(messages), 200)
+        self.assertEqual([(msg.datetime, msg.direction, msg.message) for msg in messages],
+                         [(msg.datetime, msg.direction, msg.message) for msg in expected])
+
+    def test_parseMessagesFromLogfileWithProcesses(self):
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile, processes=2)
+        self.assertEqual(len(messages), 200)
+        self.assertEqual(messages[-1].getHeaderValues('Call-ID'), ['199'])
+
+    def test_aggregateMessagesInShards(self):
+        aggregate = aggregateMessagesInShards(self.logfile, processes=2, shards=5)
+        self.assertEqual(aggregate['direction'], Counter({'sent': 100, 'received': 100}))
+        self.assertEqual(aggregate['method'], Counter({'INVITE': 67}))
+        self.assertEqual(aggregate['status_code'], Counter({180: 67, 200: 66}))
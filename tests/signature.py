@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+import sys
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sippft.parser import SIPpMessage
+from sippft.signature import FlowSignatures, SignatureHistogram, main
+
+class TestFlowSignatures(unittest.TestCase):
+    def createCall(self, call_id, start, flow, to_tag='as1'):
+        messages = []
+        for i, (direction, start_line, cseq_method) in enumerate(flow):
+            msg = SIPpMessage()
+            msg.datetime = start + timedelta(milliseconds=10 * i)
+            msg.direction = direction
+            msg.protocol = 'UDP'
+            msg.message = ('{}\r\n'
+                           'Via: SIP/2.0/UDP 127.0.0.1:5060;branch=z9hG4bK-{}-{}\r\n'
+                           'To: <sip:s@h>;tag={}\r\n'
+                           'Call-ID: {}\r\n'
+                           'CSeq: 1 {}\r\n'
+                           'Contact: <sip:{}@127.0.0.1>\r\n'
+                           '\r\n').format(start_line, call_id, i, to_tag, call_id, cseq_method, call_id)
+            messages.append(msg)
+        return messages
+
+    def setUp(self):
+        self.start = datetime(2019, 6, 29, 19, 42, 16)
+        self.ok_flow = [('sent', 'INVITE sip:s@h SIP/2.0', 'INVITE'), ('received', 'SIP/2.0 180 Ringing', 'INVITE'),
+                        ('received', 'SIP/2.0 200 OK', 'INVITE'), ('sent', 'ACK sip:s@h SIP/2.0', 'ACK')]
+        self.busy_flow = [('sent', 'INVITE sip:s@h SIP/2.0', 'INVITE'), ('received', 'SIP/2.0 486 Busy Here', 'INVITE'),
+                          ('sent', 'ACK sip:s@h SIP/2.0', 'ACK')]
+
+    def run_messages(self, flows):
+        messages = []
+        for i, flow in enumerate(flows):
+            messages += self.createCall('{}@h'.format(i), self.start + timedelta(seconds=i), flow,
+                                        to_tag='tag{}'.format(i))
+        messages.sort(key=lambda msg: msg.datetime)
+        return messages
+
+    def test_masking(self):
+        signatures = FlowSignatures(headers=('Via', 'To', 'Contact'))
+        flows = list(signatures.iterFlows(self.createCall('a@h', self.start, self.ok_flow, 'x')
+                                          + self.createCall('b@h', self.start, self.ok_flow, 'y')))
+        self.assertEqual(len(flows), 2)
+        self.assertEqual(flows[0][1], flows[1][1])
+        self.assertEqual(flows[0][2][0], '> INVITE INVITE Via: SIP/2.0/UDP 127.0.0.1:5060;branch=* '
+                                         'To: <sip:s@h>;tag=* Contact: <sip:*@127.0.0.1>')
+
+    def test_retransmission(self):
+        flow = [self.ok_flow[0], self.ok_flow[0]] + self.ok_flow[1:]
+        signatures = FlowSignatures()
+        (_, digest, tokens), = signatures.iterFlows(self.createCall('a@h', self.start, flow))
+        (_, expected, _), = signatures.iterFlows(self.createCall('b@h', self.start, self.ok_flow))
+        self.assertEqual(digest, expected)
+        self.assertEqual(len(tokens), 4)
+
+    def test_idle_seconds(self):
+        messages = self.run_messages([self.ok_flow] * 5)
+        flows = FlowSignatures(idle_seconds=0.5).iterFlows(iter(messages))
+        call_id, _, _ = next(flows)
+        # the first call is finished once the messages of the third call arrive
+        self.assertEqual(call_id, messages[0].getHeaders().getFirst('Call-ID'))
+        self.assertEqual(len(list(flows)), 4)
+
+    def test_diff(self):
+        baseline = SignatureHistogram.fromMessages(self.run_messages([self.ok_flow] * 8 + [self.busy_flow] * 2))
+        self.assertEqual(sorted(baseline.counts.values()), [2, 8])
+        self.assertFalse(baseline.diff(baseline))
+
+        # a provisional response is gone from some calls and the busy calls doubled
+        no_ringing = [self.ok_flow[0]] + self.ok_flow[2:]
+        candidate = SignatureHistogram.fromMessages(
+            self.run_messages([self.ok_flow] * 4 + [no_ringing] * 2 + [self.busy_flow] * 4))
+        diff = baseline.diff(candidate)
+        self.assertTrue(diff)
+        self.assertEqual(len(diff.added), 1)
+        self.assertEqual(diff.missing, [])
+        self.assertEqual(sorted(diff.changed.values()), [(2, 4), (8, 4)])
+        ok_digest = [digest for digest in baseline.counts if baseline.counts[digest] == 8][0]
+        self.assertEqual(diff.closest(diff.added[0]), ok_digest)
+        report = diff.report()
+        self.assertIn('new {} x2'.format(diff.added[0]), report)
+        self.assertIn('changed', report)
+
+        only_candidate = SignatureHistogram.fromMessages(self.run_messages([no_ringing] * 3))
+        diff = baseline.diff(only_candidate)
+        self.assertEqual(len(diff.missing), 2)
+        self.assertEqual(diff.closest(diff.added[0]), ok_digest)
+        self.assertIn('  -< 180 INVITE', diff.report())
+
+    def test_main(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = []
+        for name, flows in (('baseline.log', [self.ok_flow] * 3), ('candidate.log', [self.ok_flow, self.busy_flow])):
+            paths.append(os.path.join(directory.name, name))
+            with open(paths[-1], 'wb') as f:
+                for msg in self.run_messages(flows):
+                    f.write(msg.toLogEntry())
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                self.assertEqual(main([paths[0], paths[0]]), 0)
+                self.assertEqual(main([paths[0], paths[1], '--header', 'Contact']), 1)
+            finally:
+                sys.stdout = stdout
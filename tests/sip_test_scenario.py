@@ -2,7 +2,11 @@
 import os
 import unittest
 import inspect
-from .helper import SIPpMessage, SIPp
+
+from sippft.dialog import DialogIndex
+from sippft.parser import SIPpMessage
+from sippft.runner import SIPp
+from sippft.scenario import Scenario
 
 class MyAbstractBaseTestcase(unittest.TestCase):
     ''' The class to share the tearDown process
@@ -41,8 +45,11 @@ class TestCase1SipBasicTest(MyAbstractBaseTestcase):
         self.helper_run_sipp_test_case_1()
 
         # check sip message
-        messages = SIPpMessage.messagesFilter(SIPpMessage.parseMessagesFromLogfile(self.logfile), direction='received')
-        self.assertEqual(messages[-1].getStatusCode(), 200, 'Last Status code should be 200')
+        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
+        received = SIPpMessage.messagesFilter(messages, direction='received')
+        self.assertEqual(received[-1].getStatusCode(), 200, 'Last Status code should be 200')
+        # every call follows the send/recv steps of the scenario
+        Scenario.load('tests/scenarios/uac-uas.xml').assertFlow(messages)
 
     def test_case_1_2_sip_header_from_between_invite_and_180(self):
         # define a SIP message log path
@@ -55,14 +62,12 @@ class TestCase1SipBasicTest(MyAbstractBaseTestcase):
         self.helper_run_sipp_test_case_1()
 
         # check sip message
-        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
-        # separate message by recived and sent
-        messages_r = SIPpMessage.messagesFilter(messages, direction='received')
-        messages_s = SIPpMessage.messagesFilter(messages, direction='sent')
+        # index the messages of the call by Call-ID and transaction
+        dialog = DialogIndex(SIPpMessage.iterMessagesFromLogfile(self.logfile)).getDialogs()[0]
 
         # get first invite message and recived 180 Ringing message
-        first_invite = SIPpMessage.messagesFilter(messages_s, method='INVITE')[0]
-        ringing_msg = SIPpMessage.messagesFilter(messages_r, status_code=180)[0]
+        first_invite = dialog.firstRequest('INVITE', direction='sent')
+        ringing_msg = dialog.firstResponse('INVITE', status_code=180, direction='received')
         # get from header values from invite and ringing message
         from_header_sent = first_invite.getHeaderValues('from')[0]
         from_header_recv = ringing_msg.getHeaderValues('from')[0]
@@ -81,14 +86,12 @@ class TestCase1SipBasicTest(MyAbstractBaseTestcase):
         self.helper_run_sipp_test_case_1()
 
         # check sip message
-        messages = SIPpMessage.parseMessagesFromLogfile(self.logfile)
-        # separate message by recived and sent
-        messages_r = SIPpMessage.messagesFilter(messages, direction='received')
-        messages_s = SIPpMessage.messagesFilter(messages, direction='sent')
+        # index the messages of the call by Call-ID and transaction
+        dialog = DialogIndex(SIPpMessage.iterMessagesFromLogfile(self.logfile)).getDialogs()[0]
 
         # get first invite message and recived 180 Ringing message
-        first_invite = SIPpMessage.messagesFilter(messages_s, method='INVITE')[0]
-        ringing_msg = SIPpMessage.messagesFilter(messages_r, status_code=180)[0]
+        first_invite = dialog.firstRequest('INVITE', direction='sent')
+        ringing_msg = dialog.firstResponse('INVITE', status_code=180, direction='received')
         # get to header values from invite and ringing message
         to_header_sent = first_invite.getHeaderValues('to')[0]
         to_header_recv = ringing_msg.getHeaderValues('to')[0]
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+import unittest
+from datetime import datetime, timedelta
+
+from sippft.parser import SIPpMessage
+from sippft.table import MediaTable, MessageTable, np
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestMessageTable(unittest.TestCase):
+    def createNewMsg(self, timestamp, direction, message):
+        msg = SIPpMessage()
+        msg.datetime = timestamp
+        msg.protocol = 'UDP'
+        msg.direction = direction
+        msg.message = message
+        msg.length = len(message.encode('utf-8'))
+        return msg
+
+    def createCall(self, call_id, start, invite_to_180_ms, invite_to_200_ms):
+        invite = ('INVITE sip:bob@biloxi.com SIP/2.0\r\n'
+                  'Call-ID: {}\r\n'
+                  'CSeq: 1 INVITE\r\n'
+                  '\r\n').format(call_id)
+        response = ('SIP/2.0 {} {}\r\n'
+                    'Call-ID: {}\r\n'
+                    'CSeq: 1 INVITE\r\n'
+                    '\r\n')
+        bye = ('BYE sip:bob@biloxi.com SIP/2.0\r\n'
+               'Call-ID: {}\r\n'
+               'CSeq: 2 BYE\r\n'
+               '\r\n').format(call_id)
+        return [
+            self.createNewMsg(start, 'sent', invite),
+            self.createNewMsg(start + timedelta(milliseconds=invite_to_180_ms), 'received',
+                              response.format(180, 'Ringing', call_id)),
+            self.createNewMsg(start + timedelta(milliseconds=invite_to_200_ms), 'received',
+                              response.format(200, 'OK', call_id)),
+            self.createNewMsg(start + timedelta(milliseconds=invite_to_200_ms + 1), 'sent', bye),
+            self.createNewMsg(start + timedelta(milliseconds=invite_to_200_ms + 2), 'received',
+                              response.format(200, 'OK', call_id).replace('1 INVITE', '2 BYE')),
+        ]
+
+    def setUp(self):
+        start = datetime(2019, 6, 29, 19, 42, 16)
+        self.messages = []
+        for i in range(10):
+            self.messages += self.createCall('call-{}'.format(i), start + timedelta(seconds=i),
+                                             invite_to_180_ms=5, invite_to_200_ms=10 * (i + 1))
+        self.table = MessageTable.fromMessages(self.messages)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 50)
+        self.assertEqual(self.table.timestamp.dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(self.table.status_code[1], 180)
+        self.assertEqual(self.table.method[1], -1)
+        self.assertEqual(self.table.cseq[3], 2)
+        self.assertEqual(self.table.call_id[0], MessageTable.callIdHash('call-0'))
+
+    def test_mask(self):
+        self.assertEqual(self.table.mask(method='INVITE').sum(), 10)
+        self.assertEqual(self.table.mask(method='OPTIONS').sum(), 0)
+        self.assertEqual(self.table.mask(direction='received').sum(), 30)
+        self.assertEqual(self.table.mask(direction='sent', status_code=200).sum(), 0)
+        self.assertEqual(self.table.mask(status_code=200, cseq_method='BYE').sum(), 10)
+        self.assertEqual(self.table.mask(status_code=(100, 200)).sum(), 10)
+        self.assertEqual(self.table.mask(call_id='call-3').sum(), 5)
+
+    def test_filter(self):
+        ringing = self.table.filter(direction='received', status_code=180)
+        self.assertEqual(len(ringing), 10)
+        self.assertEqual([msg.getStatusCode() for msg in ringing.messages], [180] * 10)
+
+    def test_groupByCallID(self):
+        call_ids, groups = self.table.groupByCallID()
+        self.assertEqual(len(call_ids), 10)
+        for call_id, rows in zip(call_ids, groups):
+            self.assertEqual(len(rows), 5)
+            self.assertTrue((self.table.call_id[rows] == call_id).all())
+            self.assertTrue((np.diff(rows) > 0).all())
+
+    def test_responseTimes(self):
+        self.assertEqual(sorted(self.table.responseTimes()), [10.0 * (i + 1) for i in range(10)])
+        self.assertEqual(list(self.table.responseTimes(status_code=180)), [5.0] * 10)
+        self.assertEqual(len(self.table.responseTimes(method='OPTIONS')), 0)
+        percentiles = self.table.responseTimePercentiles(percentiles=(0, 100))
+        self.assertEqual(list(percentiles), [10.0, 100.0])
+        self.assertEqual(self.table.responseTimePercentiles(method='OPTIONS'), None)
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestMediaTable(unittest.TestCase):
+    def createNewMsg(self, direction, start_line, call_id, formats, port=6000):
+        body = ('v=0\r\n'
+                'o=user1 53655765 2353687637 IN IP4 127.0.0.1\r\n'
+                's=-\r\n'
+                'c=IN IP4 127.0.0.1\r\n'
+                't=0 0\r\n'
+                'm=audio {} RTP/AVP {}\r\n'
+                'a=rtpmap:101 telephone-event/8000\r\n').format(port, ' '.join(formats))
+        msg = SIPpMessage()
+        msg.direction = direction
+        msg.message = ('{}\r\nCall-ID: {}\r\nCSeq: 1 INVITE\r\nContent-Type: application/sdp\r\n'
+                       'Content-Length: {}\r\n\r\n{}').format(start_line, call_id, len(body), body)
+        return msg
+
+    def setUp(self):
+        self.messages = []
+        for i in range(10):
+            call_id = 'call-{}'.format(i)
+            answer = ['8'] if i == 7 else ['0']
+            self.messages += [self.createNewMsg('sent', 'INVITE sip:s@h SIP/2.0', call_id, ['0', '18', '101'], 6000 + i),
+                              self.createNewMsg('received', 'SIP/2.0 200 OK', call_id, answer, 7000 + i)]
+        self.messages.insert(3, SIPpMessage())
+        self.messages[3].direction = 'received'
+        self.messages[3].message = 'SIP/2.0 180 Ringing\r\nCall-ID: call-1\r\nCSeq: 1 INVITE\r\n\r\n'
+        self.table = MediaTable.fromMessages(self.messages)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 20)
+        self.assertEqual(list(self.table.row[:4]), [0, 1, 2, 4])
+        self.assertEqual(list(self.table.port[:2]), [6000, 7000])
+        self.assertEqual(self.table.codec_names, {'PCMU/8000': 0, 'G729/8000': 1, 'telephone-event/8000': 2,
+                                                  'PCMA/8000': 3})
+        self.assertEqual(self.table.codec_mask[0], 0b111)
+        self.assertEqual(list(self.table.payload_type[:2]), [0, 0])
+        self.assertEqual(self.table.addresses[0], '127.0.0.1')
+
+    def test_offerAnswer(self):
+        offers, answers = self.table.offerAnswer()
+        self.assertEqual(len(offers), 10)
+        self.assertTrue((self.table.call_id[offers] == self.table.call_id[answers]).all())
+        self.assertTrue((self.table.port[answers] - self.table.port[offers] == 1000).all())
+        self.assertEqual(len(self.table.offerAnswer(direction='received')[0]), 0)
+
+    def test_codecMismatches(self):
+        mismatches = self.table.codecMismatches()
+        self.assertEqual([self.messages[row].getHeaderValues('Call-ID')[0] for row in self.table.row[mismatches]],
+                         ['call-7'])